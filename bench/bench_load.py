@@ -0,0 +1,342 @@
+"""
+端到端压测
+
+在本地启动模拟的 Bot API（bench/fake_bot_api.py），机器人通过 TELEGRAM_API_URL 连接它，
+N 个并发的虚拟用户按脚本走完以下流程，每个流程最后确认发布：
+  - quick：/start → 快速投稿 → 发送带说明的图片 → 确认
+  - step： /start → 分步投稿 → 名称/描述/链接/大小/标签 → 封面图片 → 确认
+  - edit： 快速投稿 → 编辑 → 编辑名称 → 输入新名称 → 确认
+每一步记录从投递 update 到收到机器人回复的耗时；confirm 计到发布结果通知为止。
+输出各步骤耗时的 p50/p90/p99 和频道发送速率（sends/sec），全程不访问网络。
+
+用法:
+  python bench/bench_load.py                                   # 50 个用户，每人 3 个流程，轮询模式
+  python bench/bench_load.py --mode webhook --users 200        # webhook 投递
+  python bench/bench_load.py --retry-after-rate 0.05 --timeout-rate 0.02  # 注入 RetryAfter 和超时
+  python bench/bench_load.py --rate-limits --publish-tokens 3  # 频道消息由 3 个发布机器人分摊
+  python bench/bench_load.py --save bench/load_baseline.json   # 保存为基线
+  python bench/bench_load.py --compare bench/load_baseline.json  # 与基线对比，退化时返回 1
+
+默认解除机器人的主动限速（RATE_LIMIT_*），测的是处理能力而不是限速配置；--rate-limits 保留限速。
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_bot_api import FakeBotAPI  # noqa: E402
+
+TOKEN = "123456:load"
+FLOWS = ('quick', 'step', 'edit')
+
+# 所有流程都确认成功时的结果通知
+PUBLISHED_TEXT = "您的投稿已成功发布到所有频道"
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class VirtualUser:
+    """
+    一个模拟用户，按顺序发送 update 并等待机器人回复
+    """
+
+    def __init__(self, api, user_id, latencies, step_timeout):
+        self.api = api
+        self.user_id = user_id
+        self.latencies = latencies
+        self.step_timeout = step_timeout
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'}
+        self.chat = {'id': user_id, 'type': 'private'}
+        self.round = 0
+
+    def _message(self, **fields):
+        return {'message_id': self.api.next_message_id(), 'date': int(time.time()), 'chat': self.chat,
+                'from': self.user, **fields}
+
+    def text(self, text):
+        message = self._message(text=text)
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return {'message': message}
+
+    def photo(self, caption=None):
+        photo = [{'file_id': f'cover-{self.user_id}-{self.round}', 'file_unique_id': 'c', 'width': 1, 'height': 1}]
+        fields = {'photo': photo}
+        if caption:
+            fields['caption'] = caption
+        return {'message': self._message(**fields)}
+
+    def press(self, message, data):
+        return {'callback_query': {
+            'id': self.api.next_callback_id(), 'from': self.user, 'chat_instance': str(self.user_id),
+            'data': data, 'message': message,
+        }}
+
+    def fields(self):
+        """
+        本轮投稿的字段，链接每轮不同，不会触发重复链接提示
+        """
+        key = f"{self.user_id:x}{self.round:04x}"
+        return {
+            'name': f"压测资源{self.user_id}-{self.round}",
+            'description': "压测用的资源描述",
+            'links': f"https://pan.quark.cn/s/q{key}\nhttps://pan.baidu.com/s/1b{key}?pwd=test",
+            'size': "1G",
+            'tags': "#压测 #测试",
+        }
+
+    def caption(self):
+        fields = self.fields()
+        links = "\n".join(f"链接：{link}" for link in fields['links'].split("\n"))
+        return (f"名称：{fields['name']}\n描述：{fields['description']}\n{links}\n"
+                f"📁 大小：{fields['size']}\n🏷 标签：{fields['tags']}")
+
+    async def step(self, name, update, method, text_prefix):
+        """
+        投递 update 并等待回复，返回机器人发出的 Message
+        """
+        start = time.perf_counter()
+        await self.api.deliver(update)
+        event = await self.api.expect(self.user_id, method, text_prefix, self.step_timeout)
+        self.latencies[name].append(event.time - start)
+        return event.message
+
+    async def confirm(self, preview):
+        start = time.perf_counter()
+        await self.step('confirm_ack', self.press(preview, 'confirm_post'), 'editMessageText', "正在发布")
+        event = await self.api.expect(self.user_id, 'editMessageText', "您的投稿", self.step_timeout)
+        self.latencies['confirm'].append(event.time - start)
+        if not event.text.startswith(PUBLISHED_TEXT):
+            raise RuntimeError(f"publish incomplete: {event.text!r}")
+
+    async def quick_flow(self):
+        menu = await self.step('start', self.text('/start'), 'sendMessage', "欢迎使用")
+        await self.step('quick_post', self.press(menu, 'quick_post'), 'editMessageText', "请按照以下格式")
+        return await self.step('submit', self.photo(self.caption()), 'sendMessage', "感谢您的投稿")
+
+    async def run_quick(self):
+        await self.confirm(await self.quick_flow())
+
+    async def run_step(self):
+        menu = await self.step('start', self.text('/start'), 'sendMessage', "欢迎使用")
+        await self.step('step_post', self.press(menu, 'step_post'), 'editMessageText', "开始分步投稿")
+        fields = self.fields()
+        for field in ('name', 'description', 'links', 'size'):
+            await self.step('step_text', self.text(fields[field]), 'sendMessage', f"已记录{field}")
+        await self.step('step_text', self.text(fields['tags']), 'sendMessage', "请发送封面图片")
+        preview = await self.step('step_photo', self.photo(), 'sendMessage', "感谢您的投稿")
+        await self.confirm(preview)
+
+    async def run_edit(self):
+        preview = await self.quick_flow()
+        menu = await self.step('edit_menu', self.press(preview, 'edit_post'), 'editMessageText', "请选择要编辑的字段")
+        await self.step('edit_field', self.press(menu, 'edit_name'), 'editMessageText', "当前名称")
+        # 预览消息原地更新
+        preview = await self.step('edit_value', self.text(f"改名后的资源{self.user_id}-{self.round}"),
+                                  'editMessageText', "感谢您的投稿")
+        await self.confirm(preview)
+
+    async def run(self, flows, iterations):
+        for i in range(iterations):
+            self.round = i
+            await getattr(self, f"run_{flows[(self.user_id + i) % len(flows)]}")()
+
+
+async def start_bot(api, args):
+    """
+    导入 new_contribute 并按 --mode 启动，返回 (模块, 停止函数)
+    """
+    import new_contribute
+
+    # 注入超时后尽快重试，不按生产环境的退避时间等待
+    new_contribute.publisher.base_delay = args.base_delay
+
+    if args.mode == 'webhook':
+        from webserver import start_http_server
+
+        server = await start_http_server(new_contribute.webhook_routes, "127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()[:2]
+        application = await new_contribute.get_application()
+        await application.bot.set_webhook(f"http://{host}:{port}{new_contribute.WEBHOOK_PATH}",
+                                          secret_token=new_contribute.WEBHOOK_SECRET)
+
+        async def stop():
+            server.close()
+            await new_contribute.shutdown_application()
+        return new_contribute, stop
+
+    application = new_contribute.build_application()
+    await application.initialize()
+    await application.updater.start_polling(poll_interval=0, timeout=5)
+    await application.start()
+
+    async def stop():
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await new_contribute.close_services(application)
+    return new_contribute, stop
+
+
+async def run(args):
+    publish_tokens = [f"{200000 + i}:publish" for i in range(args.publish_tokens)]
+    api = FakeBotAPI(
+        TOKEN,
+        retry_after_rate=args.retry_after_rate,
+        timeout_rate=args.timeout_rate,
+        retry_after=args.retry_after,
+        stall=args.read_timeout * 2,
+        fault_methods=args.fault_methods.split(','),
+        latency=args.api_latency_ms / 1e3,
+        seed=args.seed,
+        extra_tokens=publish_tokens,
+    )
+    api_url = await api.start()
+    os.environ.update({
+        'TOKEN': TOKEN,
+        'BOT_MODE': args.mode,
+        'TELEGRAM_API_URL': api_url,
+        'TELEGRAM_READ_TIMEOUT': str(args.read_timeout),
+        'STORAGE_BACKEND': 'memory',
+        'PORT': '0',
+        'LINK_CHECK_ENABLED': '0',
+        'PUBLISH_TOKENS': ','.join(publish_tokens),
+    })
+    if not args.rate_limits:
+        os.environ.update({
+            'RATE_LIMIT_GLOBAL_PER_SEC': '1000000',
+            'RATE_LIMIT_CHANNEL_PER_MIN': '1000000000',
+            'RATE_LIMIT_CHANNEL_BURST': '1000000',
+        })
+
+    _, stop = await start_bot(api, args)
+    latencies = defaultdict(list)
+    users = [VirtualUser(api, 10000 + i, latencies, args.step_timeout) for i in range(args.users)]
+    flows = args.flows.split(',')
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(user.run(flows, args.iterations) for user in users),
+                                       return_exceptions=True)
+        elapsed = time.perf_counter() - start
+    finally:
+        await stop()
+        await api.close()
+
+    errors = [f"{type(e).__name__}: {e}" for e in results if isinstance(e, BaseException)]
+    return {
+        'elapsed_s': elapsed,
+        'sends': api.sent['sendPhoto'],
+        'sends_per_sec': api.sent['sendPhoto'] / elapsed,
+        'api_calls_per_sec': sum(api.calls.values()) / elapsed,
+        'faults': {f"{method}:{kind}": count for (method, kind), count in sorted(api.faults.items())},
+        'bot_sends': {str(bot_id): count for (bot_id, method), count in sorted(api.bot_sent.items())
+                      if method == 'sendPhoto'},
+        'errors': errors,
+        'steps': {
+            name: {
+                'count': len(values),
+                'p50_ms': percentile(values, 0.5) * 1e3,
+                'p90_ms': percentile(values, 0.9) * 1e3,
+                'p99_ms': percentile(values, 0.99) * 1e3,
+                'max_ms': max(values) * 1e3,
+            }
+            for name, values in sorted(latencies.items())
+        },
+    }
+
+
+def print_results(results, baseline=None):
+    print(f"{'step':<14} {'count':>7} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+          + (f" {'p50 vs base':>12}" if baseline else ""))
+    for name, step in results['steps'].items():
+        line = (f"{name:<14} {step['count']:>7} {step['p50_ms']:>9.1f} {step['p90_ms']:>9.1f} "
+                f"{step['p99_ms']:>9.1f} {step['max_ms']:>9.1f}")
+        if baseline and name in baseline['steps']:
+            line += f" {step['p50_ms'] / baseline['steps'][name]['p50_ms'] - 1:>+11.0%}"
+        print(line)
+
+    line = f"\n频道发送 {results['sends']} 条，{results['sends_per_sec']:.1f} sends/sec"
+    if baseline:
+        line += f"（基线 {baseline['sends_per_sec']:.1f}）"
+    print(line)
+    print(f"Bot API 调用 {results['api_calls_per_sec']:.1f} 次/秒，用时 {results['elapsed_s']:.2f}s")
+    if len(results.get('bot_sends', {})) > 1:
+        print("各机器人的频道发送: " + ", ".join(f"{bot}={count}" for bot, count in results['bot_sends'].items()))
+    if results['faults']:
+        print("注入的故障: " + ", ".join(f"{key}={count}" for key, count in results['faults'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="polling", help="update 投递方式")
+    parser.add_argument("--users", type=int, default=50, help="并发用户数")
+    parser.add_argument("--iterations", type=int, default=3, help="每个用户走完的流程数")
+    parser.add_argument("--flows", default=",".join(FLOWS), help="轮流使用的流程，逗号分隔")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="返回 RetryAfter 的概率")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="请求超时的概率")
+    parser.add_argument("--retry-after", type=int, default=1, help="RetryAfter 要求等待的秒数")
+    parser.add_argument("--fault-methods", default="sendPhoto", help="注入故障的 Bot API 方法，逗号分隔")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="模拟的 Bot API 延迟")
+    parser.add_argument("--read-timeout", type=float, default=0.5, help="机器人请求 Bot API 的读取超时（秒）")
+    parser.add_argument("--base-delay", type=float, default=0.05, help="发布失败后退避的初始时间（秒）")
+    parser.add_argument("--rate-limits", action="store_true", help="保留机器人的主动限速配置")
+    parser.add_argument("--publish-tokens", type=int, default=0, help="发布机器人池中的机器人数量")
+    parser.add_argument("--step-timeout", type=float, default=60, help="每一步最多等待回复的时间（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="PATH", help="与基线对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 变慢或 sends/sec 下降超过该比例视为退化")
+    args = parser.parse_args()
+
+    unknown = set(args.flows.split(',')) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+
+    # 只保留错误日志，注入故障时的重试警告不刷屏
+    logging.basicConfig(level=logging.ERROR)
+    random.seed(args.seed)
+    results = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    failed = False
+    if results['errors']:
+        failed = True
+        print(f"\n{len(results['errors'])} 个用户未能完成流程，例如: {results['errors'][0]}")
+
+    if baseline:
+        regressions = [
+            name for name, step in results['steps'].items()
+            if name in baseline['steps'] and step['p50_ms'] > baseline['steps'][name]['p50_ms'] * (1 + args.threshold)
+        ]
+        if results['sends_per_sec'] < baseline['sends_per_sec'] * (1 - args.threshold):
+            regressions.append('sends_per_sec')
+        if regressions:
+            failed = True
+            print(f"\n以下指标比基线差 {args.threshold:.0%} 以上: {', '.join(regressions)}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.save}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+投稿内容解析基准测试
+统计 strict_mode_parse / auto_fix_message 在 1 KB 和 64 KB 投稿内容上的单次耗时
+
+用法: python bench/bench_parse.py [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from new_contribute import auto_fix_message, post_manager  # noqa: E402
+
+
+def make_caption(target_bytes):
+    """
+    生成大约 target_bytes 字节的投稿内容，描述和链接按比例增长
+    """
+    head = "名称：我在顶峰等你(2025)\n描述：上一世，顾雪茭曾因恋爱脑而高考失利。"
+    tail = "📁 大小：NG\n🏷 标签：#国剧 #剧情 #爱情 #奇幻"
+    desc_line = "重生归来，她决定远离渣男，一心向学，在顶峰等你。\n"
+    link_lines = []
+    body = []
+    i = 0
+    while len((head + ''.join(body) + '\n'.join(link_lines) + tail).encode()) < target_bytes:
+        if i % 4 == 0:
+            link_lines.append(f"链接：https://pan.quark.cn/s/{i:012x}")
+        else:
+            body.append(desc_line)
+        i += 1
+    return f"{head}\n{''.join(body)}{chr(10).join(link_lines)}\n{tail}"
+
+
+def bench(label, func, caption, number):
+    seconds = timeit.timeit(lambda: func(caption), number=number)
+    per_call_us = seconds / number * 1e6
+    print(f"{label:<28} {len(caption.encode()) / 1024:>6.1f} KB  {per_call_us:>10.1f} us/caption")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=200, help="每项重复次数")
+    args = parser.parse_args()
+
+    for size in (1024, 64 * 1024):
+        caption = make_caption(size)
+        number = args.number if size <= 1024 else max(1, args.number // 20)
+        bench("strict_mode_parse", post_manager.strict_mode_parse, caption, number)
+        bench("auto_fix_message", auto_fix_message, caption, number)
+
+
+if __name__ == '__main__':
+    main()
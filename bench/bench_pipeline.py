@@ -0,0 +1,183 @@
+"""
+PostManager 处理流程基准测试
+
+对合成语料（bench/corpus.py）逐项计时，输出 ops/sec 以及单次耗时的 p50/p99。
+
+用法:
+  python bench/bench_pipeline.py                          # 运行并打印结果
+  python bench/bench_pipeline.py --save bench/baseline.json   # 保存为基线
+  python bench/bench_pipeline.py --compare bench/baseline.json  # 与基线对比，p50 变慢超过阈值时返回 1
+
+仓库中的 bench/baseline.json 是在开发机上保存的基线；换了机器对比前先在该机器的旧版本上重新 --save。
+基线同时记录 --corpus-size / --rounds / --seed，参数不同时拒绝对比并返回 2。
+每一轮开始前清空 classify_link 的缓存，重复的语料不会只测到缓存命中（实际投稿的链接几乎都不重复）。
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random  # noqa: E402
+
+from corpus import build_corpus, sized_caption  # noqa: E402
+from new_contribute import auto_fix_message, classify_link, post_manager  # noqa: E402
+
+# 基线中需要与本次运行一致的参数
+BASELINE_PARAMS = ('corpus_size', 'rounds', 'seed')
+
+
+def _create_post_caption(post_data):
+    try:
+        return post_manager.create_post_caption(post_data)
+    except ValueError:
+        return None
+
+
+def build_cases(corpus):
+    """
+    返回 [(名称, 函数, 输入列表), ...]
+    """
+    all_captions = [caption for captions in corpus.values() for caption in captions]
+    well_formed = corpus['standard'] + corpus['many_links'] + corpus['long_cjk']
+    parsed = [post_manager.strict_mode_parse(caption) for caption in well_formed]
+
+    cases = []
+    for category, captions in corpus.items():
+        cases.append((f"strict_mode_parse[{category}]", post_manager.strict_mode_parse, captions))
+    cases.append(("auto_fix_message[malformed]", auto_fix_message, corpus['malformed']))
+    cases.append(("auto_fix_message[standard]", auto_fix_message, corpus['standard']))
+    cases.append(("create_post_caption", _create_post_caption, parsed))
+    cases.append(("remove_duplicate_links[many_links]", post_manager.remove_duplicate_links, corpus['many_links']))
+    cases.append(("detect_ad_content[all]", post_manager.detect_ad_content, all_captions))
+    cases.append(("detect_ad_content[ads]", post_manager.detect_ad_content, corpus['ads']))
+    cases.append((
+        "create_channel_specific_caption",
+        lambda caption: post_manager.create_channel_specific_caption(caption, 'quark'),
+        well_formed
+    ))
+    cases.append(("plan_publish", post_manager.plan_publish, well_formed))
+    return cases
+
+
+def measure(func, inputs, rounds):
+    """
+    逐次计时，返回 {ops, p50_us, p99_us}
+    每一轮（包括预热）开始前清空 classify_link 的缓存
+    """
+    # 预热
+    classify_link.cache_clear()
+    for item in inputs:
+        func(item)
+
+    timings = []
+    clock = time.perf_counter_ns
+    # 计时期间关闭 GC，避免回收停顿混入个别样本
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            classify_link.cache_clear()
+            for item in inputs:
+                start = clock()
+                func(item)
+                timings.append(clock() - start)
+    finally:
+        gc.enable()
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'ops': len(timings) / (total / 1e9) if total else float('inf'),
+        'p50_us': timings[len(timings) // 2] / 1e3,
+        'p99_us': timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1e3,
+    }
+
+
+def measure_scaling(rounds):
+    """
+    比较 1 KB 和 64 KB 投稿的每 KB 耗时，比值明显大于 1 说明有超线性的处理
+    """
+    rng = random.Random(1)
+    small = [sized_caption(rng, 1024) for _ in range(20)]
+    large = [sized_caption(rng, 64 * 1024) for _ in range(2)]
+    functions = {
+        'strict_mode_parse': post_manager.strict_mode_parse,
+        'auto_fix_message': auto_fix_message,
+        'remove_duplicate_links': post_manager.remove_duplicate_links,
+        'detect_ad_content': post_manager.detect_ad_content,
+        'create_channel_specific_caption': lambda caption: post_manager.create_channel_specific_caption(caption, 'quark'),
+    }
+    ratios = {}
+    for name, func in functions.items():
+        small_us = measure(func, small, rounds)['p50_us'] / (sum(len(c.encode()) for c in small) / len(small) / 1024)
+        large_us = measure(func, large, max(1, rounds // 4))['p50_us'] / (sum(len(c.encode()) for c in large) / len(large) / 1024)
+        ratios[name] = large_us / small_us if small_us else 0.0
+    return ratios
+
+
+def print_results(results, baseline=None):
+    print(f"{'case':<40} {'ops/sec':>12} {'p50 us':>10} {'p99 us':>10}" + (f" {'p50 vs base':>12}" if baseline else ""))
+    for name, result in results.items():
+        line = f"{name:<40} {result['ops']:>12.0f} {result['p50_us']:>10.1f} {result['p99_us']:>10.1f}"
+        if baseline and name in baseline:
+            line += f" {result['p50_us'] / baseline[name]['p50_us'] - 1:>+11.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PostManager 处理流程基准测试")
+    parser.add_argument("--rounds", type=int, default=5, help="每条语料重复次数")
+    parser.add_argument("--corpus-size", type=int, default=200, help="每个分类的语料条数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="把结果保存为基线")
+    parser.add_argument("--compare", metavar="PATH", help="与基线对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 变慢超过该比例视为退化")
+    parser.add_argument("--max-scaling", type=float, default=3.0, help="64 KB 与 1 KB 每 KB 耗时之比的上限")
+    args = parser.parse_args()
+    params = {name: getattr(args, name) for name in BASELINE_PARAMS}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('params') != params:
+            print(f"基线 {args.compare} 的参数 {saved.get('params')} 与本次运行 {params} 不同，"
+                  f"结果不可比较；请使用相同参数运行或重新 --save", file=sys.stderr)
+            return 2
+        baseline = saved['results']
+
+    corpus = build_corpus(args.seed, args.corpus_size)
+    results = {name: measure(func, inputs, args.rounds) for name, func, inputs in build_cases(corpus)}
+    print_results(results, baseline)
+
+    failed = False
+    print("\n每 KB 耗时（64 KB / 1 KB）:")
+    for name, ratio in measure_scaling(args.rounds).items():
+        flag = "  <-- 超线性" if ratio > args.max_scaling else ""
+        failed = failed or bool(flag)
+        print(f"  {name:<38} {ratio:>6.2f}x{flag}")
+
+    if baseline:
+        regressions = [
+            name for name, result in results.items()
+            if name in baseline and result['p50_us'] > baseline[name]['p50_us'] * (1 + args.threshold)
+        ]
+        if regressions:
+            failed = True
+            print(f"\n以下用例 p50 比基线慢 {args.threshold:.0%} 以上: {', '.join(regressions)}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'params': params, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.save}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+冷启动基准测试
+
+每轮启动一个新的 Python 进程，模拟 Serverless 冷启动：
+  - import：导入 new_contribute 的耗时
+  - first_update：导入后第一个 webhook 请求（/start）从收到到返回的耗时，包括创建并初始化 Application
+Bot API 请求发给子进程内的本地模拟服务器，不访问网络。
+
+用法:
+  python bench/bench_startup.py                                   # 运行并打印中位数
+  python bench/bench_startup.py --runs 20 --budget-import-ms 300  # 超出预算时返回 1
+  python bench/bench_startup.py --no-bot-info                     # 不设置 BOT_USERNAME，初始化时请求 getMe
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:bench"
+
+START_UPDATE = {
+    'update_id': 1,
+    'message': {
+        'message_id': 1,
+        'date': 0,
+        'chat': {'id': 1000, 'type': 'private'},
+        'from': {'id': 1000, 'is_bot': False, 'first_name': 'bench'},
+        'text': '/start',
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+    },
+}
+
+
+def _stub_routes(calls):
+    """
+    模拟 Bot API：getMe 返回机器人信息，sendMessage 返回一条消息，记录每次调用的方法名
+    """
+    def reply(method, result):
+        async def handler(headers, body):
+            calls.append(method)
+            return 200, 'application/json', json.dumps({'ok': True, 'result': result}).encode()
+        return handler
+
+    bot = {'id': 123456, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+    message = {'message_id': 2, 'date': 0, 'chat': {'id': 1000, 'type': 'private'}, 'text': 'ok'}
+    return {
+        ('POST', f'/bot{TOKEN}/getMe'): reply('getMe', bot),
+        ('POST', f'/bot{TOKEN}/sendMessage'): reply('sendMessage', message),
+    }
+
+
+async def _child(bot_info):
+    # 在导入前启动模拟服务器并设置环境变量，导入只计入 new_contribute 自身
+    sys.path.insert(0, ROOT)
+    from webserver import start_http_server
+
+    calls = []
+    server = await start_http_server(_stub_routes(calls), "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    os.environ.update({
+        'TOKEN': TOKEN,
+        'BOT_MODE': 'webhook',
+        'STORAGE_BACKEND': 'memory',
+        'PORT': '0',
+        'LINK_CHECK_ENABLED': '0',
+        'TELEGRAM_API_URL': f'http://127.0.0.1:{port}',
+    })
+    if bot_info:
+        os.environ['BOT_USERNAME'] = 'bench_bot'
+    else:
+        os.environ.pop('BOT_USERNAME', None)
+
+    start = time.perf_counter()
+    import new_contribute
+    imported = time.perf_counter()
+    status, _, _ = await new_contribute.webhook_processor.handle({}, json.dumps(START_UPDATE).encode())
+    handled = time.perf_counter()
+
+    # 热启动：同一进程中的第二个请求
+    await new_contribute.webhook_processor.handle({}, json.dumps({**START_UPDATE, 'update_id': 2}).encode())
+    warm = time.perf_counter()
+
+    await new_contribute.shutdown_application()
+    server.close()
+    return {
+        'status': status,
+        'calls': calls,
+        'import_ms': (imported - start) * 1e3,
+        'first_update_ms': (handled - imported) * 1e3,
+        'warm_update_ms': (warm - handled) * 1e3,
+    }
+
+
+def run_child(bot_info):
+    """
+    在新进程中运行一轮，返回子进程输出的结果
+    """
+    command = [sys.executable, os.path.abspath(__file__), "--child"]
+    if not bot_info:
+        command.append("--no-bot-info")
+    output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="启动进程的次数")
+    parser.add_argument("--no-bot-info", action="store_true", help="不设置 BOT_USERNAME")
+    parser.add_argument("--budget-import-ms", type=float, default=400, help="导入耗时中位数的预算")
+    parser.add_argument("--budget-first-update-ms", type=float, default=300, help="第一个请求耗时中位数的预算")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(_child(not args.no_bot_info))))
+        return 0
+
+    results = [run_child(not args.no_bot_info) for _ in range(args.runs)]
+    failed = [result for result in results if result['status'] != 200]
+    if failed:
+        print(f"{len(failed)} 轮 webhook 请求失败: {failed[0]}")
+        return 1
+
+    print(f"Bot API 调用: {', '.join(results[0]['calls'])}")
+    print(f"{'metric':<20} {'median ms':>10} {'max ms':>10} {'budget ms':>10}")
+    budgets = {
+        'import_ms': args.budget_import_ms,
+        'first_update_ms': args.budget_first_update_ms,
+        'warm_update_ms': None,
+    }
+    over = []
+    for metric, budget in budgets.items():
+        values = [result[metric] for result in results]
+        median = statistics.median(values)
+        flag = ""
+        if budget is not None and median > budget:
+            over.append(metric)
+            flag = "  <-- 超出预算"
+        budget_text = f"{budget:>10.0f}" if budget is not None else f"{'-':>10}"
+        print(f"{metric:<20} {median:>10.1f} {max(values):>10.1f} {budget_text}{flag}")
+
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
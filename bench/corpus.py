@@ -0,0 +1,118 @@
+"""
+基准测试用的合成投稿语料
+
+同一个 seed 总是生成相同的语料，便于和基线对比。
+"""
+import random
+
+PROVIDER_URLS = (
+    "https://pan.quark.cn/s/{id}",
+    "https://pan.baidu.com/s/1{id}?pwd={pwd}",
+    "https://drive.uc.cn/s/{id}",
+    "https://pan.xunlei.com/s/V{id}?pwd={pwd}",
+)
+AD_LINKS = (
+    "https://item.taobao.com/item.htm?id={id}",
+    "https://weixin.wx.qq.com/{id}",
+    "https://www.jd.com/{id}.html",
+)
+CJK_SENTENCES = (
+    "上一世，顾雪茭曾因恋爱脑而高考失利，这一世她决定远离渣男。",
+    "重生归来，她一心向学，在顶峰等你。",
+    "本片讲述了一个普通家庭在时代洪流中的悲欢离合。",
+    "画质清晰，中文字幕，全集打包下载。",
+    "豆瓣评分 8.9，年度口碑之作，值得一看。",
+)
+AD_PHRASES = ("高薪兼职日结", "招聘刷单员", "游戏代练上分", "刷钻加微信")
+
+
+def _share_id(rng):
+    return ''.join(rng.choice('0123456789abcdefghijklmnopqrstuvwxyz') for _ in range(12))
+
+
+def make_links(rng, count, duplicates=0):
+    links = []
+    for _ in range(count):
+        template = rng.choice(PROVIDER_URLS)
+        links.append(template.format(id=_share_id(rng), pwd=_share_id(rng)[:4]))
+    for _ in range(duplicates):
+        if links:
+            links.append(rng.choice(links))
+    return links
+
+
+def make_description(rng, chars):
+    parts = []
+    length = 0
+    while length < chars:
+        sentence = rng.choice(CJK_SENTENCES)
+        parts.append(sentence)
+        length += len(sentence)
+    return ''.join(parts)
+
+
+def standard_caption(rng, link_count=2, desc_chars=40, duplicates=0):
+    """
+    标准格式的投稿内容
+    """
+    links = '\n'.join(f"链接：{link}" for link in make_links(rng, link_count, duplicates))
+    return (
+        f"名称：测试资源{rng.randint(1, 9999)}(2025)\n\n"
+        f"描述：{make_description(rng, desc_chars)}\n\n"
+        f"{links}\n\n"
+        f"📁 大小：{rng.randint(1, 200)}G\n"
+        f"🏷 标签：#国剧 #剧情 #爱情"
+    )
+
+
+def malformed_caption(rng, link_count=2, desc_chars=40):
+    """
+    格式不规范的投稿内容，会进入 auto_fix_message
+    """
+    lines = [f"资源标题: 测试资源{rng.randint(1, 9999)}", f"简介:{make_description(rng, desc_chars)}"]
+    labels = ("夸克：", "百度：", "UC：", "迅雷：", "")
+    for link in make_links(rng, link_count):
+        lines.append(f"{rng.choice(labels)}{link}")
+    lines.append(f"大小:{rng.randint(1, 200)}G")
+    rng.shuffle(lines[2:])
+    return '\n'.join(lines)
+
+
+def ad_caption(rng, link_count=2, desc_chars=40):
+    """
+    带广告内容的投稿：描述中有广告词，或夹带电商/微信链接
+    """
+    description = make_description(rng, desc_chars) + rng.choice(AD_PHRASES)
+    links = make_links(rng, link_count) + [rng.choice(AD_LINKS).format(id=_share_id(rng))]
+    links_text = '\n'.join(f"链接：{link}" for link in links)
+    return (
+        f"名称：测试资源{rng.randint(1, 9999)}\n\n"
+        f"描述：{description}\n\n"
+        f"{links_text}\n\n"
+        f"📁 大小：NG\n"
+        f"🏷 标签：#网盘资源"
+    )
+
+
+def sized_caption(rng, target_bytes):
+    """
+    生成约 target_bytes 字节的标准投稿，用于检查耗时是否随长度线性增长
+    """
+    link_count = max(1, target_bytes // 1024)
+    caption = standard_caption(rng, link_count=link_count, desc_chars=10)
+    desc_chars = max(10, (target_bytes - len(caption.encode())) // 3)
+    return standard_caption(rng, link_count=link_count, desc_chars=desc_chars)
+
+
+def build_corpus(seed=0, size=200):
+    """
+    返回 {分类: [投稿内容, ...]}
+    """
+    rng = random.Random(seed)
+    return {
+        'standard': [standard_caption(rng, rng.randint(1, 4)) for _ in range(size)],
+        'many_links': [standard_caption(rng, rng.randint(10, 30), duplicates=rng.randint(0, 5)) for _ in range(size)],
+        'long_cjk': [standard_caption(rng, 2, desc_chars=rng.randint(500, 2000)) for _ in range(size)],
+        'malformed': [malformed_caption(rng, rng.randint(1, 6)) for _ in range(size)],
+        'ads': [ad_caption(rng, rng.randint(1, 4)) for _ in range(size)],
+    }
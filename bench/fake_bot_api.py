@@ -0,0 +1,296 @@
+"""
+本地模拟的 Telegram Bot API 服务器
+
+Application 通过 TELEGRAM_API_URL（base_url）指向这里，不访问真实的 Telegram：
+  - update 投递：调用 deliver()，设置过 webhook 时 POST 给机器人，否则放入 getUpdates 队列
+  - 支持 getMe、getUpdates、setWebhook、deleteWebhook、sendMessage、sendPhoto、
+    editMessageText、answerCallbackQuery
+  - 对 fault_methods 中的方法按比例注入 RetryAfter（429）或超时（等待 stall 秒后才响应）
+  - extra_tokens 为发布机器人池中的其他机器人，revoke() 之后该 token 的请求都返回 401
+
+机器人发往每个会话的消息按顺序放入该会话的事件队列，模拟用户通过 expect() 等待回复。
+只支持不含文件上传的请求（图片使用 file_id）。
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl
+
+import httpx
+
+from webserver import start_http_server
+
+# 表单中按 JSON 编码的参数，其余参数保持字符串
+_JSON_FIELDS = frozenset((
+    'chat_id', 'message_id', 'reply_markup', 'offset', 'limit', 'timeout', 'allowed_updates',
+    'drop_pending_updates', 'show_alert', 'cache_time',
+))
+
+
+class BotEvent:
+    """
+    机器人发出的一次调用
+    method: Bot API 方法名
+    params: 请求参数
+    message: 返回给机器人的 Message（没有时为 None）
+    """
+    __slots__ = ('method', 'params', 'message', 'time')
+
+    def __init__(self, method, params, message):
+        self.method = method
+        self.params = params
+        self.message = message
+        self.time = time.perf_counter()
+
+    @property
+    def text(self):
+        return self.params.get('text') or self.params.get('caption') or ''
+
+
+def _parse_params(headers, body):
+    content_type = headers.get('content-type', '')
+    if content_type.startswith('application/json'):
+        return json.loads(body or b'{}')
+    if content_type.startswith('multipart/'):
+        raise ValueError("file uploads are not supported")
+    params = {}
+    for key, value in parse_qsl(body.decode('utf-8'), keep_blank_values=True):
+        if key in _JSON_FIELDS:
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[key] = value
+    return params
+
+
+def _reply(result):
+    return 200, 'application/json', json.dumps({'ok': True, 'result': result}, ensure_ascii=False).encode()
+
+
+def _error(code, description, parameters=None):
+    body = {'ok': False, 'error_code': code, 'description': description}
+    if parameters:
+        body['parameters'] = parameters
+    return code, 'application/json', json.dumps(body).encode()
+
+
+class FakeBotAPI:
+    """
+    token: 机器人 token，只接受发往 /bot<token>/ 的请求
+    retry_after_rate / timeout_rate: fault_methods 中每次调用返回 429 / 超时的概率
+    retry_after: 429 响应中要求等待的秒数
+    stall: 注入超时时等待的秒数，应大于机器人的读取超时
+    latency: 每次调用的模拟网络延迟（秒）
+    extra_tokens: 同样接受请求的其他机器人 token
+    """
+
+    def __init__(self, token, retry_after_rate=0.0, timeout_rate=0.0, retry_after=1, stall=1.0,
+                 fault_methods=('sendPhoto',), latency=0.0, seed=0, extra_tokens=()):
+        self.token = token
+        self.tokens = [token, *extra_tokens]
+        self.retry_after_rate = retry_after_rate
+        self.timeout_rate = timeout_rate
+        self.retry_after = retry_after
+        self.stall = stall
+        self.fault_methods = frozenset(fault_methods)
+        self.latency = latency
+        self.calls = Counter()          # 每个方法收到的请求数
+        self.bot_sent = Counter()       # 每个机器人成功发出的消息数，键为 (机器人 ID, 方法名)
+        self.revoked = set()
+        self.faults = Counter()         # 注入的故障数，键为 (方法, 'retry_after' / 'timeout')
+        self.sent = Counter()           # 成功发出的消息数，键为方法名
+        self.webhook_url = None
+        self.webhook_secret = None
+
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1)
+        self._update_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+        self._updates = []
+        self._closing = False
+        self._updates_changed = asyncio.Condition()
+        self._events = defaultdict(asyncio.Queue)
+        self._server = None
+        self._client = None
+
+    # 服务器
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        开始监听，返回 Bot API 地址（用作 TELEGRAM_API_URL）
+        """
+        handlers = {
+            'getMe': self._get_me,
+            'getUpdates': self._get_updates,
+            'setWebhook': self._set_webhook,
+            'deleteWebhook': self._delete_webhook,
+            'sendMessage': self._send_message,
+            'sendPhoto': self._send_photo,
+            'editMessageText': self._edit_message_text,
+            'answerCallbackQuery': self._answer_callback_query,
+        }
+        routes = {('POST', f'/bot{token}/{method}'): self._wrap(token, method, handler)
+                  for token in self.tokens for method, handler in handlers.items()}
+        self._server = await start_http_server(routes, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        # 先让挂起的 getUpdates 返回，再关闭服务器
+        async with self._updates_changed:
+            self._closing = True
+            self._updates_changed.notify_all()
+        await asyncio.sleep(0.01)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def revoke(self, token):
+        """
+        模拟 token 被重置：之后该机器人的所有请求返回 401
+        """
+        self.revoked.add(token)
+
+    def _wrap(self, token, method, handler):
+        bot_id = int(token.split(':', 1)[0])
+
+        async def route(headers, body):
+            self.calls[method] += 1
+            if token in self.revoked:
+                return _error(401, "Unauthorized")
+            try:
+                params = _parse_params(headers, body)
+            except ValueError as e:
+                return _error(400, f"Bad Request: {e}")
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if method in self.fault_methods:
+                roll = self._random.random()
+                if roll < self.retry_after_rate:
+                    self.faults[method, 'retry_after'] += 1
+                    return _error(429, f"Too Many Requests: retry after {self.retry_after}",
+                                  {'retry_after': self.retry_after})
+                if roll < self.retry_after_rate + self.timeout_rate:
+                    # 机器人先超时断开；Telegram 这时可能已经处理了请求，这里同样照常处理
+                    self.faults[method, 'timeout'] += 1
+                    await asyncio.sleep(self.stall)
+            if method == 'getMe':
+                params['bot_id'] = bot_id
+            response = await handler(params)
+            if response[0] == 200 and method in ('sendMessage', 'sendPhoto'):
+                self.bot_sent[bot_id, method] += 1
+            return response
+        return route
+
+    # update 投递
+
+    def next_message_id(self):
+        return next(self._message_ids)
+
+    def next_callback_id(self):
+        return str(next(self._callback_ids))
+
+    async def deliver(self, update):
+        """
+        投递一个 update（update_id 在这里按投递顺序分配）；webhook 模式下等机器人处理完才返回
+        """
+        update = {'update_id': next(self._update_ids), **update}
+        if self.webhook_url is None:
+            async with self._updates_changed:
+                self._updates.append(update)
+                self._updates_changed.notify_all()
+            return
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None))
+        headers = {}
+        if self.webhook_secret:
+            headers['X-Telegram-Bot-Api-Secret-Token'] = self.webhook_secret
+        response = await self._client.post(self.webhook_url, json=update, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"webhook returned {response.status_code}")
+
+    async def _get_updates(self, params):
+        offset = params.get('offset') or 0
+        limit = params.get('limit') or 100
+        timeout = params.get('timeout') or 0
+        async with self._updates_changed:
+            self._updates = [update for update in self._updates if update['update_id'] >= offset]
+            if not self._updates and timeout and not self._closing:
+                try:
+                    await asyncio.wait_for(self._updates_changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return _reply(self._updates[:limit])
+
+    async def _set_webhook(self, params):
+        self.webhook_url = params['url']
+        self.webhook_secret = params.get('secret_token')
+        return _reply(True)
+
+    async def _delete_webhook(self, params):
+        self.webhook_url = self.webhook_secret = None
+        return _reply(True)
+
+    async def _get_me(self, params):
+        bot_id = params['bot_id']
+        return _reply({'id': bot_id, 'is_bot': True, 'first_name': 'fake', 'username': f'fake_{bot_id}_bot'})
+
+    # 机器人发出的消息
+
+    def _record(self, method, params, message):
+        self.sent[method] += 1
+        self._events[params.get('chat_id')].put_nowait(BotEvent(method, params, message))
+
+    def _message(self, params, **fields):
+        chat_id = params['chat_id']
+        chat = {'id': chat_id, 'type': 'private'} if isinstance(chat_id, int) else \
+            {'id': -100, 'type': 'channel', 'username': str(chat_id).lstrip('@')}
+        message = {'message_id': next(self._message_ids), 'date': int(time.time()), 'chat': chat, **fields}
+        if 'reply_markup' in params:
+            message['reply_markup'] = params['reply_markup']
+        return message
+
+    async def _send_message(self, params):
+        message = self._message(params, text=params.get('text', ''))
+        self._record('sendMessage', params, message)
+        return _reply(message)
+
+    async def _send_photo(self, params):
+        photo = [{'file_id': str(params.get('photo')), 'file_unique_id': 'p', 'width': 1, 'height': 1}]
+        message = self._message(params, photo=photo, caption=params.get('caption', ''))
+        self._record('sendPhoto', params, message)
+        return _reply(message)
+
+    async def _edit_message_text(self, params):
+        if 'inline_message_id' in params:
+            return _reply(True)
+        message = self._message(params, text=params.get('text', ''))
+        message['message_id'] = params['message_id']
+        self._record('editMessageText', params, message)
+        return _reply(message)
+
+    async def _answer_callback_query(self, params):
+        return _reply(True)
+
+    async def expect(self, chat_id, method, text_prefix='', timeout=30):
+        """
+        等待机器人向 chat_id 发出的下一个匹配的调用，跳过之前不匹配的调用，返回 BotEvent
+        """
+        events = self._events[chat_id]
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"no {method} '{text_prefix}' to {chat_id} within {timeout}s")
+            event = await asyncio.wait_for(events.get(), remaining)
+            if event.method == method and event.text.startswith(text_prefix):
+                return event
@@ -0,0 +1,129 @@
+"""
+频道发布机器人池
+
+Telegram 按机器人限制全局发送速率（每秒约 30 条），只用一个机器人发布时所有频道共用这个上限。
+配置多个机器人（都是目标频道的管理员）后，频道发送分摊到各个机器人：
+  - 每个频道按最高随机权重哈希（rendezvous hashing）得到机器人的固定顺序，平时总由第一个发送，
+    增减机器人时只有少数频道换机器人
+  - 每个机器人有自己的 RateLimiter，分别按该机器人的全局和频道限制计数
+  - 某个机器人在该频道被限流（RetryAfter 暂停中）时由顺序中的下一个发送；
+    token 失效（401）后不再使用该机器人，没有频道权限（403）时只对该频道跳过
+
+与用户交互的仍然是主机器人，池中的机器人只用于发送到频道。所有机器人都不可用时返回 None，
+由调用方退回到主机器人。
+"""
+import hashlib
+import logging
+
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+POOL_SENDS = Counter('bot_pool_send_results', 'Channel send outcomes per publishing bot', ('bot', 'outcome'))
+
+
+class BotShard:
+    """
+    池中的一个机器人
+    name: 机器人 ID（token 冒号前的部分），用于日志和指标，不包含 token 密钥
+    bot 在第一次使用时由 make_bot(token) 创建，未用到的机器人不创建连接池
+    """
+    __slots__ = ('name', 'token', 'rate_limiter', 'revoked', 'forbidden', '_make_bot', '_bot')
+
+    def __init__(self, token, make_bot, rate_limiter):
+        self.name = token.split(':', 1)[0]
+        self.token = token
+        self.rate_limiter = rate_limiter
+        self.revoked = False
+        self.forbidden = set()
+        self._make_bot = make_bot
+        self._bot = None
+
+    @property
+    def bot(self):
+        if self._bot is None:
+            self._bot = self._make_bot(self.token)
+        return self._bot
+
+    def available(self, channel_id):
+        return not self.revoked and channel_id not in self.forbidden
+
+
+class BotPool:
+    """
+    tokens: 用于发布的机器人 token
+    make_bot: 根据 token 创建 telegram.Bot
+    make_rate_limiter: 为每个机器人创建 RateLimiter
+    """
+
+    def __init__(self, tokens, make_bot, make_rate_limiter):
+        self.shards = [BotShard(token, make_bot, make_rate_limiter()) for token in dict.fromkeys(tokens)]
+        self._rankings = {}
+
+    def __len__(self):
+        return len(self.shards)
+
+    def ranked(self, channel_id):
+        """
+        该频道使用机器人的固定顺序
+        """
+        ranking = self._rankings.get(channel_id)
+        if ranking is None:
+            ranking = self._rankings[channel_id] = sorted(
+                self.shards,
+                key=lambda shard: hashlib.blake2b(f"{shard.name}:{channel_id}".encode('utf-8'),
+                                                  digest_size=8).digest(),
+                reverse=True
+            )
+        return ranking
+
+    def select(self, channel_id):
+        """
+        选择发送到该频道的机器人：顺序中第一个可用且没有被限流的，都被限流时选第一个可用的，
+        都不可用时返回 None
+        """
+        first = None
+        for shard in self.ranked(channel_id):
+            if not shard.available(channel_id):
+                continue
+            if not shard.rate_limiter.paused(channel_id):
+                return shard
+            if first is None:
+                first = shard
+        return first
+
+    def on_success(self, shard, channel_id):
+        shard.rate_limiter.on_success(channel_id)
+        POOL_SENDS.labels(shard.name, 'success').inc()
+
+    def on_retry_after(self, shard, channel_id, retry_after):
+        shard.rate_limiter.on_retry_after(channel_id, retry_after)
+        POOL_SENDS.labels(shard.name, 'retry_after').inc()
+
+    def on_forbidden(self, shard, channel_id):
+        """
+        该机器人没有频道的发送权限，之后这个频道跳过它
+        """
+        if channel_id in shard.forbidden:
+            return
+        shard.forbidden.add(channel_id)
+        POOL_SENDS.labels(shard.name, 'forbidden').inc()
+        logger.error(f"Publishing bot {shard.name} is not allowed to post in {channel_id}, skipping it")
+
+    def on_revoked(self, shard):
+        """
+        token 被拒绝（机器人被删除或 token 被重置），之后不再使用这个机器人
+        """
+        if shard.revoked:
+            return
+        shard.revoked = True
+        POOL_SENDS.labels(shard.name, 'revoked').inc()
+        logger.error(f"Token of publishing bot {shard.name} was rejected, removing it from the pool")
+
+    async def shutdown(self):
+        """
+        关闭已创建的机器人的连接池
+        """
+        for shard in self.shards:
+            if shard._bot is not None:
+                await shard._bot.request.shutdown()
@@ -0,0 +1,168 @@
+"""
+批量导入
+
+管理员上传 JSONL 或 CSV 文件，每行一个资源：name, description, links, size, tags, cover
+（cover 为图片的 file_id 或 URL，也可以写作 image）。
+
+文件逐行读取，按 chunk_size 行一组交给线程池校验，同时最多 max_pending 组在校验中；
+需要异步查询的检查（如重复链接）由 check 按行号顺序逐行执行，可以拒绝该行或在报告中附加提示；
+校验通过的行依次交给 on_accepted（由调用方控制发布速率，它等待时读取也会暂停）。
+每行的结果直接写入报告文件，内存占用与文件大小无关。
+"""
+import asyncio
+import csv
+import json
+import re
+
+FORMATS = ('jsonl', 'csv')
+
+# links 字段中多个链接的分隔符：换行、空白、| 或 ;
+_LINK_SPLIT_RE = re.compile(r"[\s|;]+")
+
+REPORT_HEADER = ('row', 'status', 'name', 'detail')
+
+
+def detect_format(file_name, mime_type=None):
+    """
+    按文件名或 MIME 类型判断格式，无法判断时返回 None
+    """
+    name = (file_name or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    if mime_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if mime_type in ('application/x-ndjson', 'application/jsonl', 'application/json'):
+        return 'jsonl'
+    return None
+
+
+def normalize_row(raw):
+    """
+    把一行原始数据整理成 {name, description, links, size, tags, cover}，缺少必需字段时抛出 ValueError
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("不是对象")
+
+    def text(key):
+        value = raw.get(key)
+        return '' if value is None else str(value).strip()
+
+    links = raw.get('links') or ''
+    if isinstance(links, str):
+        links = _LINK_SPLIT_RE.split(links)
+    links = [str(link).strip() for link in links if str(link).strip()]
+
+    row = {
+        'name': text('name'),
+        'description': text('description'),
+        'links': links,
+        'size': text('size') or 'NG',
+        'tags': text('tags'),
+        'cover': text('cover') or text('image'),
+    }
+    missing = [field for field in ('name', 'description', 'links', 'cover') if not row[field]]
+    if missing:
+        raise ValueError(f"缺少字段: {', '.join(missing)}")
+    return row
+
+
+def iter_rows(file, fmt):
+    """
+    逐行读取已打开的文本文件，生成 (行号, 整理后的数据或 None, 错误信息或 None)
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(file)
+        for raw in reader:
+            try:
+                yield reader.line_num, normalize_row(raw), None
+            except ValueError as e:
+                yield reader.line_num, None, str(e)
+        return
+
+    for line_no, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, normalize_row(json.loads(line)), None
+        except ValueError as e:
+            # json.JSONDecodeError 也是 ValueError
+            yield line_no, None, str(e)
+
+
+class ImportSummary:
+    """
+    导入结果统计
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    def __str__(self):
+        return f"共{self.total}行，通过{self.accepted}行，拒绝{self.rejected}行"
+
+
+def _validate_chunk(validate, rows):
+    results = []
+    for line_no, row, error in rows:
+        if error is None:
+            try:
+                results.append((line_no, row, validate(row), None))
+                continue
+            except ValueError as e:
+                error = str(e)
+        results.append((line_no, row, None, error))
+    return results
+
+
+async def run_import(file, fmt, validate, on_accepted, report, executor, chunk_size=100, max_pending=4,
+                     check=None):
+    """
+    执行导入
+    file: 已打开的文本文件
+    validate: 同步函数，参数为整理后的行，返回发布所需的数据，不通过时抛出 ValueError，在 executor 中执行
+    on_accepted: 协程函数，参数为 (行号, 整理后的行, validate 的返回值)
+    report: csv.writer，每行写入一条结果
+    check: 可选的协程函数，参数同 on_accepted，在 validate 通过后执行；
+           不通过时抛出 ValueError，返回的字符串写入报告的 detail 列
+    """
+    loop = asyncio.get_running_loop()
+    summary = ImportSummary()
+    pending = []
+    report.writerow(REPORT_HEADER)
+
+    async def drain_one():
+        for line_no, row, result, error in await pending.pop(0):
+            summary.total += 1
+            name = row['name'] if row else ''
+            detail = ''
+            if error is None and check is not None:
+                try:
+                    detail = await check(line_no, row, result) or ''
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                summary.rejected += 1
+                report.writerow((line_no, 'rejected', name, error))
+                continue
+            summary.accepted += 1
+            report.writerow((line_no, 'accepted', name, detail))
+            await on_accepted(line_no, row, result)
+
+    chunk = []
+    for item in iter_rows(file, fmt):
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            pending.append(loop.run_in_executor(executor, _validate_chunk, validate, chunk))
+            chunk = []
+            if len(pending) >= max_pending:
+                await drain_one()
+    if chunk:
+        pending.append(loop.run_in_executor(executor, _validate_chunk, validate, chunk))
+    while pending:
+        await drain_one()
+    return summary
@@ -0,0 +1,119 @@
+"""
+按用户排序的并发 update 处理
+
+不同用户的 update 并发处理，同一个用户的消息和按钮回调严格按到达顺序逐个处理。
+每个正在处理中的用户有一个待处理队列：第一个 update 在当前任务中处理，并顺带处理
+排在它后面的 update；后到的 update 只入队，不等待，也不占用并发名额。
+队列处理完后立即删除，空闲用户不占内存。
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import nullcontext
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from log_pipeline import log_context
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update):
+    """
+    排序所用的键：用户 ID，没有用户时使用聊天 ID，都没有时返回 None（不排序）
+    """
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return update.effective_user.id
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    return None
+
+
+async def _with_log_context(update, key, coroutine):
+    # 在协程内部设置日志上下文，由同一用户的其他任务执行时也不会串
+    with log_context(update_id=getattr(update, 'update_id', None), user_id=key):
+        await coroutine
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    max_concurrent_updates: 同时处理的用户数上限
+    """
+    __slots__ = ('_queues',)
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._queues = {}
+
+    @property
+    def active_users(self):
+        """
+        当前有 update 正在处理的用户数
+        """
+        return len(self._queues)
+
+    async def run(self, update, coroutine, wait=False, semaphore=None):
+        """
+        按用户顺序执行 coroutine
+        wait: 排在其他 update 后面时是否等待自己处理完成（webhook 需要在响应前处理完）
+        semaphore: 实际处理 update 期间占用的并发名额，只入队的 update 不占用；
+                   经 process_update 调用时名额已在外面取得，为 None
+        """
+        key = update_key(update)
+        if key is None:
+            async with semaphore or nullcontext():
+                await _with_log_context(update, key, coroutine)
+            return
+
+        queue = self._queues.get(key)
+        if queue is not None:
+            future = asyncio.get_running_loop().create_future() if wait else None
+            queue.append((update, coroutine, future))
+            if future is not None:
+                await future
+            return
+
+        queue = self._queues[key] = deque()
+        try:
+            async with semaphore or nullcontext():
+                await self._run_one(key, update, coroutine, None)
+                while queue:
+                    await self._run_one(key, *queue.popleft())
+        finally:
+            del self._queues[key]
+            # 处理任务被取消时，剩下的 update 不再处理
+            while queue:
+                _, coroutine, future = queue.popleft()
+                coroutine.close()
+                if future is not None and not future.done():
+                    future.cancel()
+
+    @staticmethod
+    async def _run_one(key, update, coroutine, future):
+        try:
+            await _with_log_context(update, key, coroutine)
+        except Exception as e:
+            # 一个 update 出错不影响同一用户后面的 update
+            logger.error(f"Error while processing update: {e}")
+        finally:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    async def do_process_update(self, update, coroutine):
+        await self.run(update, coroutine)
+
+    async def process_update_and_wait(self, update, coroutine):
+        """
+        webhook 使用：与 process_update 一样受 max_concurrent_updates 限制，
+        并且排在同一用户其他 update 后面时等自己处理完再返回
+        """
+        await self.run(update, coroutine, wait=True, semaphore=self._semaphore)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
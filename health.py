@@ -0,0 +1,87 @@
+"""
+健康检查
+
+/healthz（存活）：轮询模式下最近一次成功的 getUpdates 没有超过 poll_stale_after 秒。
+/readyz（就绪）：存活，Application 和轮询已启动，发布队列积压不超过 max_queue_depth。
+两个接口都返回 JSON，正常时状态码 200，否则 503 并列出原因。
+"""
+import json
+import time
+
+from telegram.request import HTTPXRequest
+
+
+class PollingMonitor(HTTPXRequest):
+    """
+    用作 getUpdates 的请求对象，记录最近一次成功的时间
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_success = None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        code, payload = await super().do_request(url, method, request_data, **kwargs)
+        if code == 200:
+            self.last_success = time.monotonic()
+        return code, payload
+
+
+class HealthCheck:
+    """
+    publisher: 用于读取发布队列深度
+    max_queue_depth: 队列积压超过该值时不再就绪
+    poll_stale_after: 超过该秒数没有成功的 getUpdates 视为轮询已停止
+    """
+
+    def __init__(self, publisher, max_queue_depth=1000, poll_stale_after=60):
+        self.publisher = publisher
+        self.max_queue_depth = max_queue_depth
+        self.poll_stale_after = poll_stale_after
+        self.application = None
+        self.poll_monitor = None
+        self._attached_at = None
+
+    def attach(self, application, poll_monitor=None):
+        """
+        轮询模式启动时调用，之后按 application 和 poll_monitor 判断状态
+        """
+        self.application = application
+        self.poll_monitor = poll_monitor
+        self._attached_at = time.monotonic()
+
+    def liveness_problems(self):
+        if self.application is None or self.poll_monitor is None:
+            # webhook 模式：能响应请求即视为存活
+            return []
+        # 轮询停止或一直失败时都不会再有成功的 getUpdates
+        last_success = self.poll_monitor.last_success or self._attached_at
+        idle = time.monotonic() - last_success
+        if idle > self.poll_stale_after:
+            return [f"no successful getUpdates for {int(idle)}s"]
+        return []
+
+    def readiness_problems(self):
+        problems = self.liveness_problems()
+        if self.poll_monitor is not None:
+            if not self.application.running:
+                problems.append("application not running")
+            elif self.application.updater is not None and not self.application.updater.running:
+                problems.append("polling stopped")
+        if self.publisher.queue_size > self.max_queue_depth:
+            problems.append(f"publish queue depth {self.publisher.queue_size} > {self.max_queue_depth}")
+        return problems
+
+    def _respond(self, problems):
+        body = {
+            'status': 'fail' if problems else 'ok',
+            'problems': problems,
+            'queue_depth': self.publisher.queue_size,
+        }
+        return 503 if problems else 200, 'application/json', json.dumps(body).encode()
+
+    async def healthz(self, headers, body):
+        return self._respond(self.liveness_problems())
+
+    async def readyz(self, headers, body):
+        return self._respond(self.readiness_problems())
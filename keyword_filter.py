@@ -0,0 +1,138 @@
+"""
+关键词过滤引擎（Aho-Corasick 多模式匹配）
+
+所有关键词在启动时编译成一个自动机，过滤时对文本只做一次线性扫描，
+耗时与关键词数量无关。
+"""
+import json
+import logging
+from collections import deque
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# 关键词分类
+AD_KEYWORDS = 'ad'                  # 描述中的广告关键词
+SUSPICIOUS_LINK = 'suspicious_link'  # 非网盘链接中的可疑域名/关键词
+COPYRIGHT = 'copyright'             # 名称和描述中的版权相关关键词
+
+DEFAULT_KEYWORDS = {
+    AD_KEYWORDS: ['兼职', '招聘', '游戏代练', '刷单', '刷钻'],
+    SUSPICIOUS_LINK: ['taobao.com', 'tmall.com', 'jd.com', 'wechat', 'wx.qq.com', 'alipay.com'],
+    COPYRIGHT: ['⚠️ 版权：', '版权反馈/DMCA', '📢 频道 👥群组🔍投稿/搜索', '版权', '版权反馈', 'DMCA', '频道',
+                '群组', '投稿', '搜索'],
+}
+
+
+class KeywordMatch(NamedTuple):
+    """
+    一次关键词命中
+    start/end: 关键词在文本中的位置，text[start:end] == keyword
+    """
+    keyword: str
+    category: str
+    start: int
+    end: int
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick 自动机
+    keywords: {分类: [关键词, ...]}
+    """
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self.size = 0
+
+        for category, words in keywords.items():
+            for word in words:
+                if word:
+                    self._add(word, category)
+        self._build_fail_links()
+
+    def _add(self, word, category):
+        state = 0
+        for ch in word:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        if (word, category) not in self._output[state]:
+            self._output[state] += ((word, category),)
+            self.size += 1
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(ch, 0)
+                # 合并失败链上的输出，扫描时不再需要沿失败链查找
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def iter_matches(self, text, categories=None):
+        """
+        按结束位置顺序返回所有命中
+        categories: 只返回这些分类的命中，为 None 时返回全部
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for word, category in output[state]:
+                    if categories is None or category in categories:
+                        yield KeywordMatch(word, category, i + 1 - len(word), i + 1)
+
+    def find_first(self, text, categories=None):
+        """
+        返回第一个命中，没有命中时返回 None
+        """
+        return next(self.iter_matches(text, categories), None)
+
+
+def load_keywords(path=None):
+    """
+    读取关键词配置，与默认关键词合并
+    配置文件为 JSON：{"ad": [...], "suspicious_link": [...], "copyright": [...]}
+    文件不存在或无法读取时只使用默认关键词；不是合法 JSON 或内容格式错误时抛出 ValueError
+    """
+    keywords = {category: list(words) for category, words in DEFAULT_KEYWORDS.items()}
+    if not path:
+        return keywords
+
+    try:
+        with open(path, encoding='utf-8') as f:
+            extra = json.load(f)
+    except FileNotFoundError:
+        logger.error(f"关键词配置文件不存在: {path}")
+        return keywords
+    except OSError as e:
+        logger.error(f"读取关键词配置文件失败 {path}: {e}")
+        return keywords
+    except ValueError as e:
+        # json.JSONDecodeError 也是 ValueError
+        raise ValueError(f"关键词配置文件格式错误 {path}: {e}") from e
+
+    if not isinstance(extra, dict):
+        raise ValueError("关键词配置应为 JSON 对象")
+    for category, words in extra.items():
+        if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+            raise ValueError(f"关键词分类 {category} 应为字符串列表")
+        keywords.setdefault(category, []).extend(word.strip() for word in words if word.strip())
+    return keywords
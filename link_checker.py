@@ -0,0 +1,177 @@
+"""
+分享链接有效性检查
+
+确认发布前并发请求每个网盘分享页，判断链接是否已失效：
+  - 所有请求共用一个 httpx.AsyncClient（连接池），每个域名同时最多 per_host_limit 个请求
+  - 结果按规范化 URL 缓存 ttl 秒，同一个链接同时只发一次请求
+  - 整次检查最多等待 deadline 秒，超时、网络错误或无法判断时视为 UNKNOWN，不阻止发布
+
+判断规则：状态码 404/410、跳转到错误页，或页面前 max_body 字节中出现该网盘的失效提示。
+base_urls（环境变量 LINK_CHECK_BASE_URLS）可以把某个网盘的请求改发到其他地址（如本地模拟服务器），便于测试。
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+ALIVE = 'alive'
+DEAD = 'dead'
+UNKNOWN = 'unknown'
+
+# 各网盘分享页的失效提示
+DEFAULT_DEAD_MARKERS = {
+    'quark': ('分享不存在', '文件已被分享者删除', '该分享已取消', '分享已失效'),
+    'baidu': ('链接不存在', '分享的文件已经被取消', '分享的文件已经被删除', '啊哦，你来晚了', '此链接分享内容可能因为涉及侵权'),
+    'uc': ('分享已失效', '分享不存在', '文件已被删除'),
+    'xunlei': ('链接已失效', '分享已过期', '分享不存在'),
+}
+
+# 跳转后地址中出现这些片段时视为失效
+_ERROR_PATH_MARKERS = ('/error', '/share/error')
+
+_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+)
+
+
+class LinkChecker:
+    """
+    dead_markers: {网盘类型: 失效提示列表}，没有配置的网盘不检查
+    timeout: 单个请求的超时时间（秒）
+    deadline: 一次 check() 最多等待的时间（秒）
+    per_host_limit: 每个域名的并发请求数
+    ttl / cache_size: 结果缓存的有效期（秒）和条数
+    base_urls: {网盘类型: 替代的 scheme://host}，用于测试
+    """
+
+    def __init__(self, dead_markers=None, timeout=2.0, deadline=0.8, per_host_limit=4, ttl=600,
+                 cache_size=10000, max_body=64 * 1024, base_urls=None, client=None):
+        self.dead_markers = DEFAULT_DEAD_MARKERS if dead_markers is None else dead_markers
+        self.timeout = timeout
+        self.deadline = deadline
+        self.per_host_limit = per_host_limit
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.max_body = max_body
+        self.base_urls = base_urls or {}
+        self._client = client
+        self._owns_client = client is None
+        self._host_limits = {}
+        self._cache = OrderedDict()
+        self._inflight = {}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={'User-Agent': _USER_AGENT},
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._client
+
+    def _cached(self, url, now):
+        entry = self._cache.get(url)
+        if entry is None:
+            return None
+        status, expires = entry
+        if expires < now:
+            del self._cache[url]
+            return None
+        return status
+
+    def _remember(self, url, status):
+        self._cache[url] = (status, time.monotonic() + self.ttl)
+        self._cache.move_to_end(url)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _request_url(self, link):
+        base = self.base_urls.get(link.provider)
+        if base is None:
+            return link.url
+        parts = urlsplit(link.url)
+        return base.rstrip('/') + parts.path + (f"?{parts.query}" if parts.query else '')
+
+    async def _fetch(self, link):
+        url = self._request_url(link)
+        host = urlsplit(url).hostname
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+
+        markers = self.dead_markers[link.provider]
+        async with limit:
+            try:
+                async with self._get_client().stream('GET', url) as response:
+                    if response.status_code in (404, 410):
+                        return DEAD
+                    if any(marker in response.url.path for marker in _ERROR_PATH_MARKERS):
+                        return DEAD
+                    if response.status_code != 200:
+                        return UNKNOWN
+                    body = b''
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) >= self.max_body:
+                            break
+            except httpx.HTTPError as e:
+                logger.warning(f"Link check failed for {link.url}: {type(e).__name__}: {e}")
+                return UNKNOWN
+
+        text = body[:self.max_body].decode(response.encoding or 'utf-8', errors='replace')
+        return DEAD if any(marker in text for marker in markers) else ALIVE
+
+    async def _check_one(self, link):
+        try:
+            status = await self._fetch(link)
+        finally:
+            self._inflight.pop(link.url, None)
+        if status != UNKNOWN:
+            self._remember(link.url, status)
+        return status
+
+    async def check(self, links):
+        """
+        检查一组 PanLink，返回 {规范化 URL: ALIVE / DEAD / UNKNOWN}
+        未配置失效提示的网盘不检查
+        """
+        now = time.monotonic()
+        results = {}
+        pending = {}
+        loop = asyncio.get_running_loop()
+        for link in links:
+            if link.provider not in self.dead_markers or link.url in results or link.url in pending:
+                continue
+            status = self._cached(link.url, now)
+            if status is not None:
+                results[link.url] = status
+                continue
+            task = self._inflight.get(link.url)
+            if task is None:
+                task = self._inflight[link.url] = loop.create_task(self._check_one(link))
+            pending[link.url] = task
+
+        if pending:
+            # 超过 deadline 的请求继续在后台完成并写入缓存，本次按 UNKNOWN 处理
+            done, _ = await asyncio.wait(set(pending.values()), timeout=self.deadline)
+            for url, task in pending.items():
+                if task in done and not task.cancelled() and task.exception() is None:
+                    results[url] = task.result()
+                else:
+                    results[url] = UNKNOWN
+        return results
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        self._inflight.clear()
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
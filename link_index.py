@@ -0,0 +1,192 @@
+"""
+已发布链接索引
+
+记录所有发布过的网盘分享链接（规范化后的 URL，去掉提取码和统计参数），用于发现重复投稿。
+精确集合保存在 SQLite 中，内存里只保留一个布隆过滤器：
+  - 过滤器判断"不存在"时直接返回，绝大多数新链接不需要按 URL 查询数据库
+  - 判断"可能存在"时再按主键查询一次
+过滤器记录已经合并进来的最大 rowid（last_rowid），查询前先补上 rowid 更大的行，
+同一个数据库文件被多个进程（多个副本）写入时，其他进程新增的链接也会在下一次查询前合并，不会漏判。
+过滤器在关闭时连同 last_rowid 一起保存；启动时只读取这个快照，再补上之后新增的行，
+不需要读取全部历史。快照缺失或参数变化时，逐行扫描重建（不会一次性载入内存）。
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import sqlite3
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 快照头：位数、哈希函数个数、已合并进过滤器的最大 rowid
+_SNAPSHOT_HEADER = struct.Struct('<QIQ')
+
+
+class BloomFilter:
+    """
+    布隆过滤器
+    capacity: 预计元素数量，超过后误判率上升，但不会漏判
+    error_rate: 元素数量不超过 capacity 时的误判率
+    """
+    __slots__ = ('size', 'hashes', 'bits')
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class LinkIndex:
+    """
+    path: SQLite 数据库文件，":memory:" 表示不持久化
+    capacity / error_rate: 布隆过滤器参数
+    """
+
+    def __init__(self, path, capacity=1_000_000, error_rate=0.001):
+        self.path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # 单线程执行器保证所有数据库操作串行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="link_index")
+        self._conn = None
+        self._bloom = None
+        self._last_rowid = 0
+        self._open_lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS published_links ("
+            "url TEXT PRIMARY KEY, published_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS link_index_meta (name TEXT PRIMARY KEY, value BLOB NOT NULL)")
+        conn.commit()
+        return conn
+
+    def _load_bloom(self):
+        """
+        读取快照并补上之后新增的链接，没有可用快照时全量重建
+        """
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        row = self._conn.execute("SELECT value FROM link_index_meta WHERE name = 'bloom'").fetchone()
+        self._last_rowid = 0
+        if row is not None:
+            size, hashes, snapshot_rowid = _SNAPSHOT_HEADER.unpack_from(row[0])
+            if size == bloom.size and hashes == bloom.hashes:
+                bloom.bits[:] = row[0][_SNAPSHOT_HEADER.size:]
+                self._last_rowid = snapshot_rowid
+            else:
+                logger.error("Link index bloom filter parameters changed, rebuilding")
+        self._catch_up(bloom)
+        return bloom
+
+    def _catch_up(self, bloom):
+        """
+        把 rowid 大于 last_rowid 的行（包括其他进程写入的）合并进过滤器
+        """
+        # 游标逐行读取，内存占用与历史数量无关
+        for rowid, url in self._conn.execute(
+            "SELECT rowid, url FROM published_links WHERE rowid > ? ORDER BY rowid", (self._last_rowid,)
+        ):
+            bloom.add(url)
+            self._last_rowid = rowid
+
+    def _open(self):
+        self._conn = self._connect()
+        return self._load_bloom()
+
+    async def open(self):
+        """
+        打开数据库并加载布隆过滤器，第一次使用时自动调用
+        """
+        async with self._open_lock:
+            if self._bloom is None:
+                self._bloom = await self._run(self._open)
+
+    def _find(self, urls):
+        # 先合并其他进程新增的行（按 rowid 范围查询，通常没有结果），再用过滤器排除
+        self._catch_up(self._bloom)
+        candidates = [url for url in urls if url in self._bloom]
+        if not candidates:
+            return set()
+        placeholders = ','.join('?' * len(candidates))
+        rows = self._conn.execute(f"SELECT url FROM published_links WHERE url IN ({placeholders})", candidates)
+        return {url for (url,) in rows}
+
+    async def find_existing(self, urls):
+        """
+        返回 urls 中已经发布过的链接集合，urls 应为规范化后的 URL
+        """
+        if self._bloom is None:
+            await self.open()
+        urls = list(set(urls))
+        if not urls:
+            return set()
+        return await self._run(self._find, urls)
+
+    def _insert(self, urls, published_at):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO published_links (url, published_at) VALUES (?, ?)",
+                [(url, published_at) for url in urls]
+            )
+
+    async def add(self, urls):
+        """
+        记录已发布的链接
+        """
+        if self._bloom is None:
+            await self.open()
+        urls = list(set(urls))
+        if not urls:
+            return
+        # 先更新过滤器，写入数据库期间的查询也能命中
+        for url in urls:
+            self._bloom.add(url)
+        await self._run(self._insert, urls, time.time())
+
+    def _save(self):
+        # 只记录确实合并进过滤器的最大 rowid，其他进程在这之后写入的行下次启动时补上
+        self._catch_up(self._bloom)
+        header = _SNAPSHOT_HEADER.pack(self._bloom.size, self._bloom.hashes, self._last_rowid)
+        snapshot = header + bytes(self._bloom.bits)
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO link_index_meta (name, value) VALUES ('bloom', ?)", (snapshot,)
+            )
+        self._conn.close()
+
+    async def close(self):
+        """
+        保存布隆过滤器快照并关闭数据库
+        """
+        if self._bloom is None:
+            return
+        await self._run(self._save)
+        self._bloom = None
+        self._conn = None
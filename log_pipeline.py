@@ -0,0 +1,150 @@
+"""
+日志管线
+
+事件循环中的代码只把日志记录放进有上限的内存队列（不做任何磁盘操作），
+由 QueueListener 的后台线程格式化成 JSON 行并写入按大小或按时间轮转的文件。
+队列满时丢弃新记录并计数，磁盘卡顿不会阻塞事件循环。
+
+每条记录带上当前上下文中的 update_id / user_id / channel（见 log_context），
+DEBUG 级别的记录按 debug_sample_rate 抽样。
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+CONTEXT_FIELDS = ('update_id', 'user_id', 'channel')
+
+_log_context = contextvars.ContextVar('log_context', default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    在 with 块内的日志记录中附加字段，可以嵌套
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def current_log_context():
+    return _log_context.get()
+
+
+class ContextFilter(logging.Filter):
+    """
+    在产生日志的线程/任务中读取上下文字段，之后由后台线程格式化
+    """
+
+    def filter(self, record):
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    DEBUG 记录按 rate 的概率保留，INFO 及以上全部保留
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    每条记录一行 JSON
+    """
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    队列满时丢弃记录而不是等待
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 在产生日志的线程中合并参数、格式化异常，异常单独保存在 exc_text 中
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(path, level=logging.INFO, rotation='size', max_bytes=10 * 1024 * 1024, backup_count=5,
+                  when='midnight', debug_sample_rate=0.01, queue_size=10000):
+    """
+    配置根日志记录器，返回已启动的 QueueListener，退出前应调用其 stop() 写完剩余记录
+    level: 日志级别，可以是名称（如 "INFO"）
+    rotation: "size" 按 max_bytes 轮转，"time" 按 when 轮转
+    """
+    if rotation == 'time':
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+    elif rotation == 'size':
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True
+        )
+    else:
+        raise ValueError(f"未知的日志轮转方式: {rotation}")
+    file_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(SamplingFilter(debug_sample_rate))
+    queue_handler.addFilter(ContextFilter())
+
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    # httpx 每个请求都会打 INFO 日志
+    logging.getLogger('httpx').setLevel(max(level, logging.WARNING))
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -1,24 +1,74 @@
 import asyncio
+import hashlib
 import re
 import os
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import secrets
+import signal
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.request import HTTPXRequest
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
-from telegram.error import RetryAfter, TimedOut
-
-# 配置日志
-logging.basicConfig(
-    filename="error_log.txt",
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from storage import open_stores
+from bot_pool import BotPool
+from keyword_filter import AD_KEYWORDS, COPYRIGHT, SUSPICIOUS_LINK, KeywordMatcher, load_keywords
+from link_checker import DEAD, LinkChecker
+from link_index import LinkIndex
+from log_pipeline import setup_logging
+from post_history import PostHistory
+from publish_ledger import PublishLedger
+from metrics import REGISTRY, Gauge, Histogram
+from publisher import PublishJob, Publisher
+from dispatcher import PerUserUpdateProcessor
+from health import HealthCheck, PollingMonitor
+from rate_limiter import RateLimiter
+from routing import load_routing
+from webhook import InlineReplyRequest, WebhookProcessor
+from webserver import make_asgi_app, start_http_server
 
 logger = logging.getLogger(__name__)
 
+# Serverless 平台（Vercel、AWS Lambda）上只有临时目录可写，日志和 SQLite 文件默认放在临时目录
+SERVERLESS = bool(os.getenv("VERCEL") or os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+DATA_DIR = os.getenv("DATA_DIR", tempfile.gettempdir() if SERVERLESS else "")  # 日志和数据库文件的默认目录
+
+# 日志配置：JSON 行，由后台线程写入并轮转
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(DATA_DIR, "bot_log.jsonl"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")                        # size 或 time
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))      # 按大小轮转时单个文件上限
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")             # 按时间轮转的周期
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", 0.01))  # DEBUG 日志的抽样比例
+
+
+def configure_logging():
+    """
+    配置日志，只在 main() 和 ASGI 应用启动时调用，导入模块时不创建日志文件
+    返回后台写日志的 QueueListener
+    """
+    return setup_logging(
+        LOG_FILE,
+        level=LOG_LEVEL,
+        rotation=LOG_ROTATION,
+        max_bytes=LOG_MAX_BYTES,
+        backup_count=LOG_BACKUP_COUNT,
+        when=LOG_ROTATE_WHEN,
+        debug_sample_rate=LOG_DEBUG_SAMPLE_RATE
+    )
+
 # 机器人配置
 # TOKEN = 'telegram_bot_token'
 TOKEN = os.getenv("TOKEN")        # 从 Render 环境变量里读
 
+# 以下频道和页脚为默认路由，可以用 ROUTING_FILE 指定的 JSON 文件覆盖（见 routing.py），
+# 修改文件后发送 SIGHUP 或管理员命令 /reload_routing 即可生效，无需重启
 CHANNEL_IDS = ['@yunpanNB', '@ammmziyuan']  # 多个频道ID
 SPECIFIC_CHANNELS = {
     'quark': '@yunpanquark',      # 夸克网盘频道
@@ -27,20 +77,323 @@ SPECIFIC_CHANNELS = {
     'xunlei': '@pxyunpanxunlei'   # 迅雷网盘频道
 }
 
-### 废话
-import os, threading, http.server, socketserver
-def _keep_port():
-    port = int(os.environ.get("PORT", 8080))
-    handler = http.server.SimpleHTTPRequestHandler
-    with socketserver.TCPServer(("", port), handler) as httpd:
-        httpd.serve_forever()
-threading.Thread(target=_keep_port, daemon=True).start()
+# 发布到汇总/备用频道时附加的页脚
+SUMMARY_FOOTER = (
+    "\n\n📢 频道：@yunpanNB\n"
+    "👥 群组：@naclzy\n"
+    "🔗 获取更多资源：https://docs.qq.com/aio/DYmZYVGpFVGxOS3NE\n"
+    "🎉 来源：https://link3.cc/pyxh"
+)
+# 发布到各网盘专门频道时附加的页脚
+PROVIDER_FOOTER = (
+    "\n📢 频道：@yunpanNB\n"
+    "👥 群组：@naclzy\n"
+    "🔗 获取更多资源：https://docs.qq.com/aio/DYmZYVGpFVGxOS3NE\n"
+    "🔗交流讨论：https://link3.cc/pyxh"
+)
+DEFAULT_ROUTING = {
+    'summary_channels': CHANNEL_IDS,
+    'summary_footer': SUMMARY_FOOTER,
+    'provider_channels': SPECIFIC_CHANNELS,
+    'provider_footer': PROVIDER_FOOTER,
+    'provider_footers': {},
+}
+ROUTING_FILE = os.getenv("ROUTING_FILE")
+# 最终发布时添加的标签
+SUBMISSION_TAG = "#鹏摇星海"
+
+# 广告/版权关键词配置文件（JSON），会与内置关键词合并
+KEYWORDS_FILE = os.getenv("KEYWORDS_FILE")
+
+# 发布队列配置
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", 4))            # 同时发送的 worker 数量
+PUBLISH_MAX_ATTEMPTS = int(os.getenv("PUBLISH_MAX_ATTEMPTS", 4))  # 每个频道最多尝试次数
+# 发送限速，默认按 Telegram 的限制：全局每秒 30 条，每个频道每分钟 20 条
+RATE_LIMIT_GLOBAL_PER_SEC = float(os.getenv("RATE_LIMIT_GLOBAL_PER_SEC", 30))
+RATE_LIMIT_CHANNEL_PER_MIN = float(os.getenv("RATE_LIMIT_CHANNEL_PER_MIN", 20))
+RATE_LIMIT_CHANNEL_BURST = int(os.getenv("RATE_LIMIT_CHANNEL_BURST", 3))
+# 频道发布机器人池：逗号分隔的 token，这些机器人都要是目标频道的管理员
+# 为空时由主机器人发送；设置后频道消息分摊到这些机器人，每个机器人分别按上面的限速计数
+PUBLISH_TOKENS = [token.strip() for token in os.getenv("PUBLISH_TOKENS", "").split(",") if token.strip()]
+# 同时处理 update 的用户数上限，同一用户的 update 始终按顺序处理
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", 64))
+# 健康检查：发布队列积压上限，以及多久没有成功轮询视为机器人已停止（秒）
+HEALTH_MAX_QUEUE_DEPTH = int(os.getenv("HEALTH_MAX_QUEUE_DEPTH", 1000))
+HEALTH_POLL_STALE_AFTER = float(os.getenv("HEALTH_POLL_STALE_AFTER", 60))
+
+# 管理员用户 ID（逗号分隔），可以使用 /import 批量导入
+ADMIN_IDS = {int(user_id) for user_id in os.getenv("ADMIN_IDS", "").split(",") if user_id.strip()}
+# 批量导入配置
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", 2))                # 校验用的线程数
+IMPORT_MAX_IN_FLIGHT = int(os.getenv("IMPORT_MAX_IN_FLIGHT", 5))    # 同时在发布队列中的导入资源数
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024                             # Bot API 可下载的文件上限
+
+# 启动时是否丢弃机器人离线期间收到的 update
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "0") == "1"
+
+# 运行模式：polling（轮询）或 webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# webhook 模式配置
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")              # 向 Telegram 注册的公网地址，为空时不自动注册
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")        # 校验 X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_INLINE_REPLY = os.getenv("WEBHOOK_INLINE_REPLY", "0") == "1"  # 简单回复直接放在 HTTP 响应里
+# 处理超过该秒数（如等待频道发布）时简单回复改为单独发送，不再等 HTTP 响应
+WEBHOOK_INLINE_DEADLINE = float(os.getenv("WEBHOOK_INLINE_DEADLINE", 0.5))
+# webhook 模式下确认发布后等频道发送完、结果通知发出后再返回 HTTP 响应。
+# Serverless 平台在响应后会冻结实例，后台任务不会继续执行，所以默认开启；
+# 只有部署为长期运行的进程时才可以设为 0（批量导入始终在后台执行，也需要长期运行的进程）
+WEBHOOK_WAIT_FOR_PUBLISH = os.getenv("WEBHOOK_WAIT_FOR_PUBLISH", "1") == "1"
+# 设置后 getMe 在本地应答，Serverless 冷启动时初始化 Bot 不需要访问 Telegram（应与机器人实际用户名一致）
+BOT_USERNAME = os.getenv("BOT_USERNAME")
+# Bot API 地址，默认 https://api.telegram.org，可以指向自建的 Bot API 服务器或测试用的模拟服务器
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+TELEGRAM_READ_TIMEOUT = float(os.getenv("TELEGRAM_READ_TIMEOUT", 5))  # Bot API 请求等待响应的超时（秒）
 
-#### 以上的
 
 # 用户数据存储
-user_posts = {}
-user_states = {}
+# STORAGE_BACKEND: sqlite（默认，重启后保留草稿和分步投稿进度）或 memory（测试用）
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.getenv("STORAGE_PATH", os.path.join(DATA_DIR, "bot_state.db"))
+# 已发布链接索引，memory 后端时不持久化
+LINK_INDEX_PATH = os.getenv("LINK_INDEX_PATH", os.path.join(DATA_DIR, "published_links.db"))
+LINK_INDEX_CAPACITY = int(os.getenv("LINK_INDEX_CAPACITY", 1_000_000))  # 布隆过滤器的预计链接数量
+# 已发布投稿的历史记录（"我的投稿"），memory 后端时不持久化
+POST_HISTORY_PATH = os.getenv("POST_HISTORY_PATH", os.path.join(DATA_DIR, "post_history.db"))
+MY_POSTS_PAGE_SIZE = int(os.getenv("MY_POSTS_PAGE_SIZE", 10))  # "我的投稿"每页显示的条数
+# 发布台账：记录每条投稿在每个频道的发送结果，重复确认不重复发送，重启后继续未完成的发送
+PUBLISH_LEDGER_PATH = os.getenv("PUBLISH_LEDGER_PATH", os.path.join(DATA_DIR, "publish_ledger.db"))
+PUBLISH_LEDGER_LEASE = float(os.getenv("PUBLISH_LEDGER_LEASE", 300))  # 发送中的频道超过该秒数视为中断，可重新领取
+# 重复投稿处理：warn 提示后仍可发布，reject 拒绝，off 不检查
+DUPLICATE_LINK_POLICY = os.getenv("DUPLICATE_LINK_POLICY", "warn")
+# 确认发布前检查分享链接是否失效
+LINK_CHECK_ENABLED = os.getenv("LINK_CHECK_ENABLED", "1") == "1"
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", 2.0))      # 单个请求超时（秒）
+LINK_CHECK_DEADLINE = float(os.getenv("LINK_CHECK_DEADLINE", 0.8))    # 一次确认最多等待（秒），超时按未知处理
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", 4))        # 每个网盘域名的并发请求数
+LINK_CHECK_TTL = float(os.getenv("LINK_CHECK_TTL", 600))              # 检查结果缓存时间（秒）
+# 把某个网盘的检查请求改发到其他地址（如本地模拟服务器），格式：quark=http://127.0.0.1:9000,baidu=http://...
+LINK_CHECK_BASE_URLS = {
+    provider.strip(): base_url.strip()
+    for provider, _, base_url in (item.partition("=") for item in os.getenv("LINK_CHECK_BASE_URLS", "").split(","))
+    if provider.strip() and base_url.strip()
+}
+
+
+# 投稿内容解析用的正则和字段表，导入时预编译
+# 带网盘类型前缀的链接行，如"夸克：https://..."
+_PROVIDER_PREFIX_RE = re.compile(r"^(夸克|百度|UC|迅雷)：")
+_PREFIXED_URL_RE = re.compile(r"：\s*(https?://.+)")
+# 广告检测用：描述所在行、带"链接："前缀的链接
+_DESC_LINE_RE = re.compile(r"描述：\s*(.+?)(?=\n|$)")
+_LABELED_URL_RE = re.compile(r"链接：\s*(https?://[^\s]+)")
+# 发布时从"链接："行中提取 URL
+_LINK_LINE_URL_RE = re.compile(r"链接：\s*(https?://\S+)")
+# 任意 http(s) 链接
+_ANY_URL_RE = re.compile(r"https?://\S+")
+# 标准投稿格式校验
+_STANDARD_FORMAT_RE = re.compile(
+    r"名称：\s*.*\n\n"
+    r"描述：\s*.*\n\n"
+    r"(链接：\s*https?:\\/\\/[^\s]+\n)+\n"
+    r"📁 大小：\s*.*\n"
+    r"🏷 标签：\s*.*",
+    re.DOTALL
+)
+# 字段标签（冒号前的文字）到字段名的映射
+_COMMON_FIELD_LABELS = {
+    '名称': 'name',
+    '描述': 'description',
+    '大小': 'size',
+    '标签': 'tags',
+    '链接': 'links',
+    '夸克': 'provider_links',
+    '百度': 'provider_links',
+    'UC': 'provider_links',
+    '迅雷': 'provider_links',
+}
+# 严格模式的名称还可以写作"资源标题"，自动修复的描述还可以写作"简介"
+STRICT_FIELD_LABELS = {**_COMMON_FIELD_LABELS, '资源标题': 'name'}
+AUTO_FIX_FIELD_LABELS = {**_COMMON_FIELD_LABELS, '简介': 'description'}
+# 字段标签后的冒号（全角或半角）
+_COLON_RE = re.compile(r"[：:]")
+# 描述在遇到以这些前缀开头的行时结束
+_DESC_STOP_PREFIXES = ('链接', '夸克', '百度', 'UC', '迅雷', '📁', '🏷')
+
+
+def _iter_field_labels(line, labels):
+    """
+    按出现顺序识别行内每个冒号（全角或半角）前的字段标签，与原来在整段内容中搜索"标签："的正则一致：
+    "名称: 复仇者联盟：终局"的名称为"复仇者联盟：终局"，"描述：文件大小：3G"同时得到描述和大小
+    生成 (字段名, 冒号后直到行尾的内容)
+    """
+    for match in _COLON_RE.finditer(line):
+        colon = match.start()
+        key = labels.get(line[max(colon - 2, 0):colon]) or labels.get(line[max(colon - 4, 0):colon])
+        if key is not None:
+            yield key, line[colon + 1:]
+
+
+def tokenize_caption(caption, labels):
+    """
+    单次遍历投稿内容，提取名称、描述、链接、大小和标签
+    labels: 字段标签表，STRICT_FIELD_LABELS 或 AUTO_FIX_FIELD_LABELS
+    返回字典，其中:
+      links: 所有网盘分享链接（严格模式使用）
+      all_links: 带链接前缀的任意链接以及网盘链接（自动修复使用），
+                 依次为"链接："后的、"夸克："等网盘前缀后的、其余网盘链接
+    每个字段只取第一次出现的值，链接去重并保持原有顺序
+    """
+    fields = {
+        'name': '',
+        'description': '',
+        'links': [],
+        'all_links': [],
+        'size': '',
+        'tags': ''
+    }
+    pan_links = {}
+    labeled_links = {}
+    provider_links = {}
+    desc_lines = None  # 正在收集描述时为行列表
+    found_desc = False
+
+    for line in caption.split('\n'):
+        # 描述可以跨多行，直到遇到链接/大小/标签等行为止
+        if desc_lines is not None:
+            if line.startswith(_DESC_STOP_PREFIXES):
+                fields['description'] = '\n'.join(desc_lines).strip()
+                desc_lines = None
+            else:
+                desc_lines.append(line)
+
+        for key, value in _iter_field_labels(line, labels):
+            if key == 'links' or key == 'provider_links':
+                # 链接标签后的任意 URL 都保留给自动修复
+                url_match = _ANY_URL_RE.match(value.lstrip())
+                if url_match:
+                    (labeled_links if key == 'links' else provider_links).setdefault(url_match.group(0))
+            elif key == 'description':
+                if not found_desc:
+                    found_desc = True
+                    desc_lines = [value]
+            elif not fields[key]:
+                fields[key] = value.strip()
+
+        if 'http' in line:
+            for url in _PAN_URL_RE.findall(line):
+                pan_links.setdefault(url)
+
+    if desc_lines is not None:
+        fields['description'] = '\n'.join(desc_lines).strip()
+
+    fields['links'] = list(pan_links)
+    fields['all_links'] = list(dict.fromkeys([*labeled_links, *provider_links, *pan_links]))
+    return fields
+
+
+# 网盘类型注册表：域名 -> 网盘类型，以及每种网盘的分享链接路径前缀
+# 新增网盘只需调用 register_link_provider，并在路由配置的 provider_channels 中配置频道
+LINK_PROVIDER_HOSTS = {}
+LINK_PROVIDER_SHARE_PATHS = {}
+
+# 规范化链接时去掉的查询参数：提取码和分享来源等统计参数，其余参数（如百度 /share/init?surl=）用于定位分享，保留
+LINK_IGNORED_PARAMS = frozenset(('pwd', 'from', 'fr', 'entry', 'share_source', 'share_medium', 'share_tag',
+                                 'shareid_source', 'clicktime', 'sharetype'))
+
+
+class PanLink(NamedTuple):
+    """
+    链接识别结果
+    provider: 网盘类型，无法识别时为 None
+    url: 规范化后的链接（https、小写域名、去掉锚点、提取码和统计参数，其余查询参数按名称排序）
+    pwd: 提取码，没有时为空字符串
+    raw: 去掉"链接："前缀后的原始链接
+    """
+    provider: Optional[str]
+    url: str
+    pwd: str
+    raw: str
+
+
+def strip_link_prefix(link):
+    """
+    去掉"链接："前缀和首尾空白
+    """
+    link = link.strip()
+    if link.startswith("链接："):
+        link = link[3:].strip()
+    return link
+
+
+def _build_pan_url_re():
+    """
+    根据注册表生成匹配网盘分享链接的正则
+    """
+    alternatives = '|'.join(
+        re.escape(host + LINK_PROVIDER_SHARE_PATHS[provider])
+        for host, provider in LINK_PROVIDER_HOSTS.items()
+    )
+    return re.compile(rf"https?://(?:{alternatives})\S+")
+
+
+def register_link_provider(provider, hosts, share_path='/'):
+    """
+    注册网盘类型
+    hosts: 该网盘分享链接使用的域名
+    share_path: 分享链接路径前缀，投稿解析时只提取以此开头的链接
+    """
+    global _PAN_URL_RE
+    LINK_PROVIDER_SHARE_PATHS[provider] = share_path
+    for host in hosts:
+        LINK_PROVIDER_HOSTS[host.lower()] = provider
+    _PAN_URL_RE = _build_pan_url_re()
+    classify_link.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def classify_link(link):
+    """
+    识别单个链接，只解析一次域名并查表
+    link 可以带"链接："前缀
+    """
+    raw = strip_link_prefix(link)
+    try:
+        parts = urlsplit(raw)
+        host = parts.hostname or ''
+    except ValueError:
+        return PanLink(None, raw, '', raw)
+
+    path = parts.path.rstrip('/') or '/'
+    pwd = ''
+    params = []
+    for name, value in parse_qsl(parts.query, keep_blank_values=True):
+        if name == 'pwd':
+            pwd = pwd or value
+        elif name not in LINK_IGNORED_PARAMS and not name.startswith('utm_'):
+            params.append((name, value))
+    url = f"https://{host}{path}"
+    if params:
+        url += '?' + urlencode(sorted(params))
+    return PanLink(LINK_PROVIDER_HOSTS.get(host), url, pwd, raw)
+
+
+register_link_provider('quark', ['pan.quark.cn'], '/s/')
+register_link_provider('baidu', ['pan.baidu.com'], '/s/')
+register_link_provider('uc', ['drive.uc.cn'])
+register_link_provider('xunlei', ['pan.xunlei.com'], '/s/')
+
+
+class PublishPlan(NamedTuple):
+    """
+    发布计划
+    links: 投稿中的所有链接（去重后）
+    link_types: 识别出的网盘类型，按首次出现的顺序
+    jobs: [(频道ID, 发送内容), ...]
+    """
+    links: list
+    link_types: list
+    jobs: list
 
 
 class PostManager:
@@ -70,8 +423,8 @@ class PostManager:
             if link.startswith("链接："):
                 formatted_links.append(link)
             # 如果包含网盘类型前缀，提取链接部分
-            elif re.match(r"^(夸克|百度|UC|迅雷)：", link):
-                actual_link = re.search(r"：\s*(https?://.+)", link)
+            elif _PROVIDER_PREFIX_RE.match(link):
+                actual_link = _PREFIXED_URL_RE.search(link)
                 if actual_link:
                     formatted_links.append(f"链接：{actual_link.group(1)}")
                 else:
@@ -95,7 +448,7 @@ class PostManager:
 
         for line in lines:
             if line.startswith("链接："):
-                link_url = line[3:].strip()
+                link_url = strip_link_prefix(line)
                 if link_url not in seen_links:
                     seen_links.add(link_url)
                     processed_lines.append(line)
@@ -109,40 +462,16 @@ class PostManager:
         识别链接类型
         返回包含所有链接类型的集合
         """
-        link_types = set()
-        unrecognized_links = []  # 用于存储未识别的链接
-
         # 确保links是列表格式
         if isinstance(links, str):
             links = [links]
 
+        link_types = set()
         for link in links:
-            # 如果是格式化后的链接，提取URL部分
-            if link.startswith("链接："):
-                url = link[3:].strip()
-            else:
-                url = link.strip()
-
-            # 根据URL识别网盘类型
-            if 'pan.quark.cn' in url:
-                link_types.add('quark')
-            elif 'pan.baidu.com' in url:
-                link_types.add('baidu')
-            elif 'drive.uc.cn' in url:
-                link_types.add('uc')
-            elif 'pan.xunlei.com' in url:
-                link_types.add('xunlei')
-            else:
-                # 收集未识别的链接
-                unrecognized_links.append(url)
-                # print(f"未识别的链接类型: {url}")
+            provider = classify_link(link).provider
+            if provider:
+                link_types.add(provider)
 
-        # 如果有未识别的链接，记录日志
-        if unrecognized_links:
-            pass
-           # print(f"未识别的链接: {unrecognized_links}")
-
-        # print(f"识别出的链接类型: {link_types}")  # 调试信息
         return link_types
 
     def get_channels_for_each_link(self, links):
@@ -156,27 +485,13 @@ class PostManager:
             links = [links]
 
         for link in links:
-            # 如果是格式化后的链接，提取URL部分
-            if link.startswith("链接："):
-                url = link[3:].strip()
-            else:
-                url = link.strip()
-
-            # 确定链接类型和对应的频道
-            target_channels = list(CHANNEL_IDS)  # 默认包含汇总和备用频道
-
-            if 'pan.quark.cn' in url:
-                target_channels.append('@yunpanquark')
-            elif 'pan.baidu.com' in url:
-                target_channels.append('@yunpanbaidu')
-            elif 'drive.uc.cn' in url:
-                target_channels.append('@pxyunpanuc')
-            elif 'pan.xunlei.com' in url:
-                target_channels.append('@pxyunpanxunlei')
+            pan_link = classify_link(link)
+            url = pan_link.raw
 
+            # 确定链接类型和对应的频道（汇总和备用频道 + 专门频道，路由表中预先算好）
             link_channel_mapping.append({
                 'link': url,
-                'channels': target_channels
+                'channels': routing.channels_for_provider(pan_link.provider)
             })
 
         return link_channel_mapping
@@ -184,25 +499,8 @@ class PostManager:
         """
         根据链接类型获取目标频道列表
         """
-        # 获取链接类型
-        link_types = self.identify_link_types(links)
-
-        # 如果没有识别出链接类型，返回默认频道
-        if not link_types:
-            return CHANNEL_IDS
-
-        # 构建目标频道列表
-        target_channels = set()
-
-        # 添加汇总频道和备用频道
-        target_channels.update(CHANNEL_IDS)
-
-        # 根据链接类型添加对应的专门频道
-        for link_type in link_types:
-            if link_type in SPECIFIC_CHANNELS:
-                target_channels.add(SPECIFIC_CHANNELS[link_type])
-
-        return list(target_channels)
+        # 汇总频道和备用频道 + 各链接类型的专门频道，没有识别出链接类型时只有汇总频道
+        return routing.channels_for(self.identify_link_types(links))
 
     def create_channel_specific_caption(self, original_caption, link_type):
         """
@@ -210,24 +508,11 @@ class PostManager:
         """
         lines = original_caption.split('\n')
         filtered_lines = []
-        keep_link = False
 
         for line in lines:
             if line.startswith("链接："):
-                url = line[3:].strip()
                 # 根据链接类型决定是否保留该链接
-                if link_type == 'quark' and 'pan.quark.cn' in url:
-                    keep_link = True
-                elif link_type == 'baidu' and 'pan.baidu.com' in url:
-                    keep_link = True
-                elif link_type == 'uc' and 'drive.uc.cn' in url:
-                    keep_link = True
-                elif link_type == 'xunlei' and 'pan.xunlei.com' in url:
-                    keep_link = True
-                else:
-                    keep_link = False
-
-                if keep_link:
+                if classify_link(line).provider == link_type:
                     filtered_lines.append(line)
             else:
                 # 保留非链接行（名称、描述、大小、标签等）
@@ -239,106 +524,119 @@ class PostManager:
         """
         检测是否包含广告内容
         """
-        ad_keywords = [
-            '兼职', '招聘', '游戏代练', '刷单', '刷钻'
-        ]
-        
+        return self.find_ad_content(caption) is not None
+
+    def find_ad_content(self, caption):
+        """
+        查找广告内容
+        返回第一个命中的 KeywordMatch（位置相对于整个投稿内容），没有时返回 None
+        """
         # 检查描述中是否包含广告关键词
-        desc_match = re.search(r"描述：\s*(.+?)(?=\n|$)", caption)
+        desc_match = _DESC_LINE_RE.search(caption)
         if desc_match:
-            description = desc_match.group(1)
-            for keyword in ad_keywords:
-                if keyword in description:
-                    return True
-                    
+            match = get_keyword_matcher().find_first(desc_match.group(1), (AD_KEYWORDS,))
+            if match:
+                offset = desc_match.start(1)
+                return match._replace(start=match.start + offset, end=match.end + offset)
+
         # 检查链接是否为可疑链接
-        link_matches = re.findall(r"链接：\s*(https?://[^\s]+)", caption)
-        for link in link_matches:
-            # 检查是否为非网盘链接
-            if not re.match(r"https?://(pan\.quark\.cn|pan\.baidu\.com|drive\.uc\.cn|pan\.xunlei\.com)/", link):
-                # 如果不是网盘链接，检查是否包含可疑关键词
-                suspicious_patterns = [
-                    r"taobao\.com", r"tmall\.com", r"jd\.com", 
-                    r"wechat", r"wx\.qq\.com", r"alipay\.com"
-                ]
-                for pattern in suspicious_patterns:
-                    if re.search(pattern, link):
-                        return True
-                        
-        return False
+        for link_match in _LABELED_URL_RE.finditer(caption):
+            link = link_match.group(1)
+            # 只检查非网盘链接
+            if classify_link(link).provider is None:
+                match = get_keyword_matcher().find_first(link, (SUSPICIOUS_LINK,))
+                if match:
+                    offset = link_match.start(1)
+                    return match._replace(start=match.start + offset, end=match.end + offset)
+
+        return None
 
     # 添加严格模式解析方法
     def strict_mode_parse(self, caption):
         """
         严格模式解析投稿内容，只提取必需字段
         """
-        # 初始化数据
+        fields = tokenize_caption(caption, STRICT_FIELD_LABELS)
         parsed_data = {
-            'name': '',
-            'description': '',
-            'links': [],
-            'size': '',
-            'tags': ''
+            'name': fields['name'],
+            'description': fields['description'],
+            'links': fields['links'],
+            'size': fields['size'],
+            'tags': fields['tags']
         }
         
-        # 提取名称（支持"名称"或"资源标题"）
-        name_match = re.search(r"(?:名称|资源标题)[：:]\s*(.+?)(?=\n|$)", caption)
-        if name_match:
-            parsed_data['name'] = name_match.group(1).strip()
-        
-        # 提取描述
-        desc_match = re.search(r"描述[：:]\s*(.+?)(?=\n(?:链接|夸克|百度|UC|迅雷|📁|🏷)|$)", caption, re.DOTALL)
-        if desc_match:
-            parsed_data['description'] = desc_match.group(1).strip()
-        
-        # 提取链接
-        link_matches = re.findall(r"(?:(?:夸克|百度|UC|迅雷)[：:]\s*)?(https?://(?:pan\.quark\.cn/s/[^\s\n]+|pan\.baidu\.com/s/[^\s\n]+(?:\?pwd=[^\s\n]+)?|drive\.uc\.cn/[^\s\n]+|pan\.xunlei\.com/s/[^\s\n]+(?:\?pwd=[^\s\n]+)?))", caption)
-        for link in link_matches:
-            if link not in parsed_data['links']:
-                parsed_data['links'].append(link)
-        
-        # 如果没有找到特定格式的链接，尝试查找所有可能的网盘链接
-        if not parsed_data['links']:
-            generic_links = re.findall(r"https?://(?:pan\.quark\.cn/s/[^\s\n]+|pan\.baidu\.com/s/[^\s\n]+(?:\?pwd=[^\s\n]+)?|drive\.uc\.cn/[^\s\n]+|pan\.xunlei\.com/s/[^\s\n]+(?:\?pwd=[^\s\n]+)?)", caption)
-            parsed_data['links'] = list(dict.fromkeys(generic_links))  # 去重但保持顺序
-        
-        # 提取大小
-        size_match = re.search(r"大小[：:]\s*(.+?)(?=\n|$)", caption)
-        if size_match:
-            parsed_data['size'] = size_match.group(1).strip()
-        else:
-            # 查找带图标的大小格式
-            size_icon_match = re.search(r"📁\s*大小[：:]\s*(.+?)(?=\n|$)", caption)
-            if size_icon_match:
-                parsed_data['size'] = size_icon_match.group(1).strip()
-        
-        # 提取标签
-        tag_match = re.search(r"标签[：:]\s*(.+?)(?=\n|$)", caption)
-        if tag_match:
-            parsed_data['tags'] = tag_match.group(1).strip()
-        else:
-            # 查找带图标的标签格式
-            tag_icon_match = re.search(r"🏷\s*标签[：:]\s*(.+?)(?=\n|$)", caption)
-            if tag_icon_match:
-                parsed_data['tags'] = tag_icon_match.group(1).strip()
-        
         return parsed_data
 
+    def plan_publish(self, caption):
+        """
+        生成发布计划：只遍历一次投稿内容，同时完成链接去重、添加发布标签、链接分类，
+        并渲染汇总频道和每个网盘专门频道的发送内容
+        """
+        lines = caption.split('\n')
+        has_tag_line = "🏷 标签：" in caption
+        add_tag = not has_tag_line or SUBMISSION_TAG not in caption
+
+        base_lines = []
+        # 网盘类型 -> 该专门频道的内容行；None 表示所有专门频道共用的行
+        provider_lines = {}
+        shared_positions = []
+        links = []
+        seen_links = set()
+
+        for line in lines:
+            if line.startswith("链接："):
+                link_url = strip_link_prefix(line)
+                if link_url in seen_links:
+                    continue
+                seen_links.add(link_url)
+                base_lines.append(line)
+
+                url_match = _LINK_LINE_URL_RE.match(line)
+                if url_match:
+                    pan_link = classify_link(url_match.group(1))
+                    links.append(pan_link)
+                    if pan_link.provider is not None:
+                        provider_lines.setdefault(pan_link.provider, []).append(len(base_lines) - 1)
+                continue
+
+            if add_tag and has_tag_line and "🏷 标签：" in line:
+                line = line.replace("🏷 标签：", f"🏷 标签：{SUBMISSION_TAG} ")
+            base_lines.append(line)
+            shared_positions.append(len(base_lines) - 1)
+
+        if add_tag and not has_tag_line:
+            base_lines.append(f"🏷 标签：{SUBMISSION_TAG}")
+            shared_positions.append(len(base_lines) - 1)
+
+        # 整个计划使用同一个路由表，重新加载不会影响进行中的计划
+        table = routing
+        base_text = '\n'.join(base_lines)
+        jobs = [(route.channel_id, base_text + route.footer) for route in table.summary_routes]
+
+        # 专门频道的内容 = 共用行 + 该网盘的链接行，保持原有顺序
+        for provider, positions in provider_lines.items():
+            route = table.provider_routes.get(provider)
+            if route is None:
+                continue
+            kept = sorted(shared_positions + positions)
+            text = '\n'.join([base_lines[i] for i in kept])
+            jobs.append((route.channel_id, text + route.footer))
+
+        return PublishPlan(links, list(provider_lines), jobs)
+
     def create_post_caption(self, post_data, is_submission=False):
         """
         创建标准格式的投稿说明
         is_submission: 是否是最终提交，只有在最终提交时才添加 #鹏摇星海 标签
         """
-        # 添加版权相关关键词过滤
-        copyright_keywords = ['⚠️ 版权：', '版权反馈/DMCA', '📢 频道 👥群组🔍投稿/搜索', '版权', '版权反馈', 'DMCA', '频道',
-                              '群组', '投稿', '搜索']
         name = post_data['name']
         description = post_data['description']
 
         # 检查名称和描述中是否包含版权相关关键词
-        for keyword in copyright_keywords:
-            if keyword in name or keyword in description:
-                raise ValueError(f"内容包含禁止关键词: {keyword}")
+        for text in (name, description):
+            match = get_keyword_matcher().find_first(text, (COPYRIGHT,))
+            if match:
+                raise ValueError(f"内容包含禁止关键词: {match.keyword}")
 
         links_formatted = self.format_links('\n'.join(post_data['links']) if isinstance(post_data['links'], list)
                                             else post_data['links'])
@@ -361,8 +659,221 @@ class PostManager:
         return self.remove_duplicate_links(fixed_caption)
 
 
-# 初始化投稿管理器
+# 初始化路由表、关键词过滤器、投稿管理器、发布台账和发布队列
+# 路由表重新加载时整体替换
+routing = load_routing(ROUTING_FILE, DEFAULT_ROUTING)
+
+
+@lru_cache(maxsize=None)
+def get_keyword_matcher():
+    """
+    读取关键词并编译自动机，结果缓存
+    main() 和 ASGI 启动时预先调用，配置文件有误时启动失败，不会等到用户投稿时才报错
+    """
+    return KeywordMatcher(load_keywords(KEYWORDS_FILE))
+
+
 post_manager = PostManager()
+publish_ledger = PublishLedger(":memory:" if STORAGE_BACKEND == "memory" else PUBLISH_LEDGER_PATH,
+                               lease=PUBLISH_LEDGER_LEASE)
+
+
+def make_rate_limiter():
+    return RateLimiter(
+        global_rate=RATE_LIMIT_GLOBAL_PER_SEC,
+        chat_rate=RATE_LIMIT_CHANNEL_PER_MIN / 60,
+        chat_burst=RATE_LIMIT_CHANNEL_BURST
+    )
+
+
+def make_publish_bot(token):
+    """
+    创建池中的发布机器人，与主机器人使用相同的 Bot API 地址和超时
+    不调用 getMe，token 失效时在第一次发送时发现并从池中移除
+    """
+    kwargs = {}
+    if TELEGRAM_API_URL:
+        api_url = TELEGRAM_API_URL.rstrip('/')
+        kwargs = {'base_url': f"{api_url}/bot", 'base_file_url': f"{api_url}/file/bot"}
+    request = HTTPXRequest(connection_pool_size=PUBLISH_WORKERS, read_timeout=TELEGRAM_READ_TIMEOUT)
+    return Bot(token, request=request, get_updates_request=request, **kwargs)
+
+
+rate_limiter = make_rate_limiter()
+bot_pool = BotPool(PUBLISH_TOKENS, make_publish_bot, make_rate_limiter) if PUBLISH_TOKENS else None
+publisher = Publisher(workers=PUBLISH_WORKERS, max_attempts=PUBLISH_MAX_ATTEMPTS, rate_limiter=rate_limiter,
+                      ledger=publish_ledger, bot_pool=bot_pool)
+health_check = HealthCheck(publisher, max_queue_depth=HEALTH_MAX_QUEUE_DEPTH, poll_stale_after=HEALTH_POLL_STALE_AFTER)
+
+# 处理函数耗时，callback_data 只对 button_handler 有值
+HANDLER_LATENCY = Histogram('bot_handler_seconds', 'Update handler latency', ('handler', 'callback_data'))
+
+
+class Post:
+    """
+    投稿草稿
+    保存解析后的各字段，投稿内容（caption）在第一次使用时生成并缓存，只有修改字段后才重新生成
+    摘要（summary）是"我的投稿"中显示的一行，同样缓存并随投稿保存
+    post_id 在创建时生成并随投稿保存，发布台账按它识别同一条投稿
+    """
+    __slots__ = ('image', 'name', 'description', 'links', 'size', 'tags', '_caption', '_classified_links',
+                 '_summary', 'post_id')
+
+    FIELDS = ('name', 'description', 'links', 'size', 'tags')
+
+    def __init__(self, image, name='', description='', links=None, size='', tags='', caption=None, summary=None,
+                 post_id=None):
+        self.image = image
+        self.name = name
+        self.description = description
+        self.links = list(links or [])
+        self.size = size
+        self.tags = tags
+        self._caption = caption
+        self._classified_links = None
+        self._summary = summary
+        self.post_id = post_id or secrets.token_hex(8)
+
+    @classmethod
+    def from_fields(cls, image, fields, caption=None):
+        """
+        从 strict_mode_parse / tokenize_caption 的结果创建
+        """
+        links = fields['links']
+        if isinstance(links, str):
+            links = [link.strip() for link in links.split('\n') if link.strip()]
+        return cls(image, fields['name'], fields['description'], links, fields['size'], fields['tags'], caption)
+
+    @property
+    def caption(self):
+        """
+        标准格式的投稿内容，包含禁止关键词时抛出 ValueError
+        """
+        if self._caption is None:
+            self._caption = post_manager.create_post_caption(self.fields())
+        return self._caption
+
+    def render(self):
+        """
+        立即生成投稿内容和摘要，用于在保存前检查禁止关键词
+        """
+        caption = self.caption
+        if self._summary is None:
+            self._summary = self._make_summary()
+        return caption
+
+    @property
+    def summary(self):
+        """
+        一行摘要：名称、大小和链接数量
+        """
+        if self._summary is None:
+            self._summary = self._make_summary()
+        return self._summary
+
+    def _make_summary(self):
+        name = self.name if len(self.name) <= 40 else self.name[:40] + "..."
+        return f"{name} · {self.size or 'NG'} · {len(self.links)}个链接"
+
+    @property
+    def classified_links(self):
+        if self._classified_links is None:
+            self._classified_links = [classify_link(link) for link in self.links]
+        return self._classified_links
+
+    def fields(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def copy(self):
+        post = Post(self.image, self.name, self.description, self.links, self.size, self.tags, self._caption,
+                    self._summary, self.post_id)
+        post._classified_links = self._classified_links
+        return post
+
+    def update_field(self, field, value):
+        """
+        修改一个字段，并使缓存的投稿内容失效
+        """
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        setattr(self, field, list(value) if field == 'links' else value)
+        self._caption = None
+        self._summary = None
+        if field == 'links':
+            self._classified_links = None
+
+    def to_dict(self):
+        data = self.fields()
+        data['image'] = self.image
+        data['caption'] = self._caption
+        data['summary'] = self._summary
+        data['post_id'] = self.post_id
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        # 旧版本没有保存 post_id，由内容生成，同一份草稿每次读取得到相同的 ID
+        post_id = data.get('post_id') or hashlib.blake2b(
+            repr(sorted(data.items())).encode('utf-8'), digest_size=8).hexdigest()
+        if 'name' not in data:
+            # 旧版本只保存了图片和投稿内容
+            post = cls.from_fields(data['image'], post_manager.strict_mode_parse(data['caption']), data['caption'])
+            post.post_id = post_id
+            return post
+        return cls(data['image'], data['name'], data['description'], data['links'], data['size'], data['tags'],
+                   data.get('caption'), data.get('summary'), post_id)
+
+
+def _encode_posts(posts):
+    return [post.to_dict() for post in posts]
+
+
+def _decode_posts(data):
+    return [Post.from_dict(item) for item in data]
+
+
+# 用户数据存储：user_posts 保存 Post 列表，user_states 保存分步投稿和编辑状态，
+# user_previews 保存预览消息的位置、当前显示的投稿序号和内容哈希
+storage_backend, _stores = open_stores(
+    STORAGE_BACKEND, STORAGE_PATH, ('user_posts', 'user_states', 'user_previews'),
+    codecs={'user_posts': (_encode_posts, _decode_posts)}
+)
+user_posts = _stores['user_posts']
+user_states = _stores['user_states']
+user_previews = _stores['user_previews']
+
+
+async def _store_sizes():
+    return {
+        ('user_posts',): await user_posts.count(),
+        ('user_states',): await user_states.count(),
+        ('user_previews',): await user_previews.count(),
+    }
+
+
+STORE_SIZE = Gauge('bot_store_entries', 'Number of users with stored entries', _store_sizes, ('store',))
+link_checker = LinkChecker(
+    timeout=LINK_CHECK_TIMEOUT,
+    deadline=LINK_CHECK_DEADLINE,
+    per_host_limit=LINK_CHECK_PER_HOST,
+    ttl=LINK_CHECK_TTL,
+    base_urls=LINK_CHECK_BASE_URLS
+)
+link_index = LinkIndex(":memory:" if STORAGE_BACKEND == "memory" else LINK_INDEX_PATH, capacity=LINK_INDEX_CAPACITY)
+post_history = PostHistory(":memory:" if STORAGE_BACKEND == "memory" else POST_HISTORY_PATH)
+
+
+async def find_reposted_links(post):
+    """
+    返回投稿中已经发布过的网盘链接（原始写法）
+    """
+    if DUPLICATE_LINK_POLICY == "off":
+        return []
+    pan_links = [link for link in post.classified_links if link.provider]
+    if not pan_links:
+        return []
+    published = await link_index.find_existing([link.url for link in pan_links])
+    return [link.raw for link in pan_links if link.url in published]
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -418,10 +929,10 @@ async def step_post_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     开始分步投稿流程
     """
     user_id = update.callback_query.from_user.id
-    user_states[user_id] = {
+    await user_states.set(user_id, {
         'step': 'name',
         'data': post_manager.post_template.copy()
-    }
+    })
 
     message = "开始分步投稿流程：\n\n请输入资源名称"
 
@@ -438,13 +949,14 @@ async def handle_step_post_message(update: Update, context: ContextTypes.DEFAULT
     处理分步投稿的消息
     """
     user_id = update.message.from_user.id
+    state = await user_states.get(user_id)
 
-    if user_id not in user_states or 'step' not in user_states[user_id]:
+    if not state or 'step' not in state:
         await handle_message(update, context)
         return
 
-    current_step = user_states[user_id]['step']
-    user_data = user_states[user_id]['data']
+    current_step = state['step']
+    user_data = state['data']
 
     step_messages = {
         'name': {
@@ -480,7 +992,8 @@ async def handle_step_post_message(update: Update, context: ContextTypes.DEFAULT
         next_step = step_messages[current_step]['next_step']
         
         # 更新步骤状态
-        user_states[user_id]['step'] = next_step
+        state['step'] = next_step
+        await user_states.set(user_id, state)
         
         # 构造回复消息
         message = step_messages[current_step]['prompt']
@@ -499,21 +1012,21 @@ async def handle_step_post_message(update: Update, context: ContextTypes.DEFAULT
             
         # 完成分步投稿
         image = update.message.photo[-1].file_id
-        user_data['links'] = user_data['links'].split('\n') if isinstance(user_data['links'], str) else user_data['links']
         
         # 创建投稿内容
-        caption = post_manager.create_post_caption(user_data)
+        post = Post.from_fields(image, user_data)
+        post.render()
         
         # 保存投稿
-        if user_id not in user_posts:
-            user_posts[user_id] = []
-        user_posts[user_id].append({'image': image, 'caption': caption})
+        posts = await user_posts.get(user_id, [])
+        posts.append(post)
+        await user_posts.set(user_id, posts)
         
         # 清除状态
-        del user_states[user_id]
+        await user_states.delete(user_id)
         
-        # 显示预览
-        await show_post_preview(update, context, user_id)
+        # 显示预览，翻到刚提交的投稿
+        await show_post_preview(update, context, user_id, -1)
 
 
 async def post_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -546,52 +1059,197 @@ async def post_info(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.callback_query.edit_message_text(info_message, reply_markup=reply_markup)
 
 
+def _parse_history_cursor(data):
+    """
+    解析"我的投稿"翻页的 callback_data：my_posts:older:<id> 或 my_posts:newer:<id>
+    返回 (before, after)，第一页为 (None, None)
+    """
+    parts = data.split(":")
+    if len(parts) == 3 and parts[2].isdecimal():
+        if parts[1] == "older":
+            return int(parts[2]), None
+        if parts[1] == "newer":
+            return None, int(parts[2])
+    return None, None
+
+
 async def show_my_posts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
-    显示用户投稿
+    显示用户投稿：未发布的草稿数量和已发布的历史记录，历史记录按游标分页
     """
+    query = update.callback_query
     user_id = update.effective_user.id
+    before, after = _parse_history_cursor(query.data)
+    drafts = await user_posts.get(user_id, [])
+    page = await post_history.page(user_id, before=before, after=after, limit=MY_POSTS_PAGE_SIZE)
 
-    if user_id not in user_posts or not user_posts[user_id]:
+    if not drafts and not page.entries and before is None and after is None:
         message = "您还没有投稿记录。"
         keyboard = [
             [InlineKeyboardButton("📝 开始投稿", callback_data="quick_post")],
             [InlineKeyboardButton("◀️ 返回", callback_data="back_to_main")]
         ]
-    else:
-        posts_summary = "\n\n".join(
-            [f"#{i + 1} 投稿内容：\n{post['caption'][:100]}..." if len(post['caption']) > 100
-             else f"#{i + 1} 投稿内容：\n{post['caption']}"
-             for i, post in enumerate(user_posts[user_id])]
+        await query.edit_message_text(message, reply_markup=InlineKeyboardMarkup(keyboard))
+        return
+
+    lines = ["您的投稿记录："]
+    if drafts:
+        lines.append(f"\n未发布的草稿：{len(drafts)}条")
+    if page.entries:
+        lines.append("\n已发布：")
+        lines.extend(
+            f"{time.strftime('%Y-%m-%d', time.localtime(entry.published_at))} {entry.summary}"
+            for entry in page.entries
         )
-        message = f"您的投稿记录：\n\n{posts_summary}"
+    elif before is not None or after is not None:
+        lines.append("\n没有更多记录了。")
+
+    keyboard = []
+    page_buttons = []
+    if page.has_newer:
+        page_buttons.append(InlineKeyboardButton("◀️ 较新", callback_data=f"my_posts:newer:{page.entries[0].id}"))
+    if page.has_older:
+        page_buttons.append(InlineKeyboardButton("较早 ▶️", callback_data=f"my_posts:older:{page.entries[-1].id}"))
+    if page_buttons:
+        keyboard.append(page_buttons)
+    if drafts:
+        keyboard.append([InlineKeyboardButton("📝 查看草稿", callback_data="view_drafts")])
+    keyboard.append([InlineKeyboardButton("➕ 继续投稿", callback_data="quick_post")])
+    if drafts:
+        keyboard.append([InlineKeyboardButton("🗑 清空草稿", callback_data="clear_posts")])
+    keyboard.append([InlineKeyboardButton("◀️ 返回", callback_data="back_to_main")])
+
+    await query.edit_message_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(keyboard))
+
+
+async def view_drafts(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    从"我的投稿"进入草稿预览
+    """
+    user_id = update.callback_query.from_user.id
+    if not await user_posts.get(user_id):
+        await show_my_posts(update, context)
+        return
+    await show_post_preview(update, context, user_id)
 
-        keyboard = [
-            [InlineKeyboardButton("➕ 继续投稿", callback_data="quick_post")],
-            [InlineKeyboardButton("🗑 清空投稿", callback_data="clear_posts")],
-            [InlineKeyboardButton("◀️ 返回", callback_data="back_to_main")]
-        ]
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.callback_query.edit_message_text(message, reply_markup=reply_markup)
+def _preview_hash(posts, index):
+    """
+    预览内容的哈希：当前投稿的内容、序号和总数，判断是否需要重新生成时不必先生成预览文本
+    """
+    post = posts[index]
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{index}/{len(posts)}\0{post.image}\0{post.caption}".encode())
+    return digest.hexdigest()
 
 
-async def show_post_preview(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id):
+def _current_index(preview, posts):
     """
-    显示投稿预览
+    预览当前显示的投稿序号，没有预览或序号已失效时为最新的一条
     """
-    posts_summary = "\n\n".join(
-        [f"#{i + 1} 投稿内容：\n{post['caption']}" for i, post in enumerate(user_posts[user_id])])
+    index = preview.get('index', -1) if preview else -1
+    return index if 0 <= index < len(posts) else len(posts) - 1
 
-    keyboard = [
+
+def render_post_preview(posts, index):
+    """
+    生成预览消息：只显示第 index 条投稿，多条投稿时带翻页按钮
+    返回 (消息文本, InlineKeyboardMarkup)
+    """
+    total = len(posts)
+    if total == 1:
+        header = "感谢您的投稿！以下是您的投稿内容："
+        footer = "您可以选择以下操作："
+    else:
+        header = f"感谢您的投稿！以下是第{index + 1}/{total}条投稿："
+        footer = f"确认发布会发布全部{total}条投稿。您可以选择以下操作："
+
+    keyboard = []
+    if total > 1:
+        keyboard.append([
+            InlineKeyboardButton("◀️ 上一条", callback_data=f"preview_page:{(index - 1) % total}"),
+            InlineKeyboardButton(f"{index + 1}/{total}", callback_data=f"preview_page:{index}"),
+            InlineKeyboardButton("下一条 ▶️", callback_data=f"preview_page:{(index + 1) % total}")
+        ])
+    keyboard += [
         [InlineKeyboardButton("✏️ 编辑", callback_data="edit_post")],
         [InlineKeyboardButton("✅ 确认发布", callback_data="confirm_post")],
         [InlineKeyboardButton("❌ 取消", callback_data="cancel_post")]
     ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return f"{header}\n\n{posts[index].caption}\n\n{footer}", InlineKeyboardMarkup(keyboard)
 
-    await update.message.reply_text(f"感谢您的投稿！以下是您的所有投稿内容：\n\n{posts_summary}\n\n"
-                                    "您可以选择以下操作：", reply_markup=reply_markup)
+
+async def show_post_preview(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id, index=None):
+    """
+    显示投稿预览
+    每个用户只有一条预览消息，有变化时原地编辑，内容哈希不变时不重新生成也不调用 Bot API
+    index: 要显示的投稿序号，负数从末尾计算，为空时保持当前页
+    """
+    posts = await user_posts.get(user_id, [])
+    if not posts:
+        return
+    chat_id = update.effective_chat.id
+    preview = await user_previews.get(user_id)
+    if preview and preview['chat_id'] != chat_id:
+        preview = None
+
+    # 从按钮触发时，按钮所在的消息就是预览消息
+    query = update.callback_query
+    if query is not None and query.message is not None:
+        if preview is None or preview['message_id'] != query.message.message_id:
+            preview = {**(preview or {}), 'chat_id': chat_id, 'message_id': query.message.message_id, 'hash': None}
+
+    if index is None:
+        index = _current_index(preview, posts)
+    elif index < 0:
+        index += len(posts)
+    content_hash = _preview_hash(posts, index)
+    if preview and preview.get('hash') == content_hash:
+        return
+
+    text, reply_markup = render_post_preview(posts, index)
+    message_id = preview['message_id'] if preview else None
+    if message_id is not None:
+        try:
+            await context.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id,
+                                                reply_markup=reply_markup)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                # 原消息已被删除或无法编辑，改为发送新的预览
+                logger.warning(f"Failed to edit preview message {message_id}: {e}")
+                message_id = None
+    if message_id is None:
+        message = await context.bot.send_message(chat_id, text, reply_markup=reply_markup)
+        message_id = message.message_id
+
+    await user_previews.set(user_id, {'chat_id': chat_id, 'message_id': message_id, 'index': index,
+                                      'hash': content_hash})
+
+
+async def _preview_replaced(user_id):
+    """
+    预览消息被改成了其他内容（编辑菜单、错误提示等），下次显示预览时需要重新生成
+    """
+    preview = await user_previews.get(user_id)
+    if preview and preview.get('hash'):
+        await user_previews.set(user_id, {**preview, 'hash': None})
+
+
+async def handle_preview_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    预览翻页
+    """
+    query = update.callback_query
+    user_id = query.from_user.id
+    posts = await user_posts.get(user_id)
+    if not posts:
+        await query.edit_message_text("找不到您的投稿内容")
+        return
+    try:
+        index = int(query.data.split(":", 1)[1])
+    except ValueError:
+        return
+    await show_post_preview(update, context, user_id, min(max(index, 0), len(posts) - 1))
 
 
 async def handle_edit_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -600,31 +1258,29 @@ async def handle_edit_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     """
     query = update.callback_query
     user_id = query.from_user.id
+    posts = await user_posts.get(user_id)
 
-    if user_id not in user_posts or not user_posts[user_id]:
+    if not posts:
         await query.answer("找不到您的投稿内容")
         return
 
-    # 获取最新的投稿
-    latest_post = user_posts[user_id][-1]
-    caption = latest_post['caption']
-
-    # 解析投稿内容
-    parsed_data = post_manager.strict_mode_parse(caption)
+    # 编辑预览中当前显示的投稿
+    post = posts[_current_index(await user_previews.get(user_id), posts)]
 
     # 创建编辑菜单
     keyboard = [
-        [InlineKeyboardButton(f"✏️ 编辑名称: {parsed_data['name'][:20]}{'...' if len(parsed_data['name']) > 20 else ''}", callback_data="edit_name")],
-        [InlineKeyboardButton(f"✏️ 编辑描述: {parsed_data['description'][:20]}{'...' if len(parsed_data['description']) > 20 else ''}", callback_data="edit_description")],
-        [InlineKeyboardButton(f"✏️ 编辑链接: {len(parsed_data['links'])}个链接", callback_data="edit_links")],
-        [InlineKeyboardButton(f"✏️ 编辑大小: {parsed_data['size']}", callback_data="edit_size")],
-        [InlineKeyboardButton(f"✏️ 编辑标签: {parsed_data['tags'][:20]}{'...' if len(parsed_data['tags']) > 20 else ''}", callback_data="edit_tags")],
+        [InlineKeyboardButton(f"✏️ 编辑名称: {post.name[:20]}{'...' if len(post.name) > 20 else ''}", callback_data="edit_name")],
+        [InlineKeyboardButton(f"✏️ 编辑描述: {post.description[:20]}{'...' if len(post.description) > 20 else ''}", callback_data="edit_description")],
+        [InlineKeyboardButton(f"✏️ 编辑链接: {len(post.links)}个链接", callback_data="edit_links")],
+        [InlineKeyboardButton(f"✏️ 编辑大小: {post.size}", callback_data="edit_size")],
+        [InlineKeyboardButton(f"✏️ 编辑标签: {post.tags[:20]}{'...' if len(post.tags) > 20 else ''}", callback_data="edit_tags")],
         [InlineKeyboardButton("✅ 完成编辑", callback_data="finish_edit")],
         [InlineKeyboardButton("❌ 取消编辑", callback_data="cancel_edit")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     await query.edit_message_text("请选择要编辑的字段：", reply_markup=reply_markup)
+    await _preview_replaced(user_id)
 
 
 async def handle_edit_field_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -634,24 +1290,22 @@ async def handle_edit_field_callback(update: Update, context: ContextTypes.DEFAU
     query = update.callback_query
     user_id = query.from_user.id
     field_to_edit = query.data.replace("edit_", "")
+    posts = await user_posts.get(user_id)
 
-    # 获取最新的投稿
-    latest_post = user_posts[user_id][-1]
-    caption = latest_post['caption']
+    if not posts:
+        await query.answer("找不到您的投稿内容")
+        return
 
-    # 解析投稿内容
-    parsed_data = post_manager.strict_mode_parse(caption)
+    # 编辑预览中当前显示的投稿
+    index = _current_index(await user_previews.get(user_id), posts)
+    post = posts[index]
 
     # 存储当前编辑状态
-    user_states[user_id] = {
+    await user_states.set(user_id, {
         'step': f'edit_{field_to_edit}',
-        'current_post': {
-            'image': latest_post['image'],
-            'caption': caption,
-            'parsed_data': parsed_data
-        },
-        'editing_field': field_to_edit
-    }
+        'editing_field': field_to_edit,
+        'index': index
+    })
 
     # 提示用户输入新值
     field_names = {
@@ -663,8 +1317,8 @@ async def handle_edit_field_callback(update: Update, context: ContextTypes.DEFAU
     }
 
     # 显示当前值和输入提示
-    current_value = parsed_data[field_to_edit]
-    if field_to_edit == 'links' and isinstance(current_value, list):
+    current_value = getattr(post, field_to_edit)
+    if field_to_edit == 'links':
         current_value = '\n'.join(current_value)
     
     message = f"当前{field_names[field_to_edit]}：\n{current_value}\n\n请输入新的{field_names[field_to_edit]}："
@@ -674,6 +1328,7 @@ async def handle_edit_field_callback(update: Update, context: ContextTypes.DEFAU
     reply_markup = InlineKeyboardMarkup(keyboard)
 
     await query.edit_message_text(message, reply_markup=reply_markup)
+    await _preview_replaced(user_id)
 
 
 async def handle_edit_field_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -681,13 +1336,13 @@ async def handle_edit_field_message(update: Update, context: ContextTypes.DEFAUL
     处理用户编辑字段的消息
     """
     user_id = update.message.from_user.id
+    edit_state = await user_states.get(user_id)
 
-    if user_id not in user_states or user_states[user_id]['step'] not in ['edit_name', 'edit_description', 'edit_links', 'edit_size', 'edit_tags']:
+    if not edit_state or edit_state['step'] not in ['edit_name', 'edit_description', 'edit_links', 'edit_size', 'edit_tags']:
         await handle_message(update, context)
         return
 
     # 获取编辑状态
-    edit_state = user_states[user_id]
     editing_field = edit_state['editing_field']
     new_value = update.message.text.strip()
 
@@ -702,20 +1357,30 @@ async def handle_edit_field_message(update: Update, context: ContextTypes.DEFAUL
         # 过滤空行
         new_value = [link.strip() for link in new_value if link.strip()]
 
-    # 更新解析数据
-    edit_state['current_post']['parsed_data'][editing_field] = new_value
+    posts = await user_posts.get(user_id)
+    if not posts:
+        await user_states.delete(user_id)
+        await update.message.reply_text("找不到您的投稿内容")
+        return
+
+    index = edit_state.get('index', -1)
+    if not 0 <= index < len(posts):
+        index = len(posts) - 1
+
+    # 在副本上修改，生成失败时不影响已保存的投稿
+    post = posts[index].copy()
+    post.update_field(editing_field, new_value)
 
     # 更新投稿内容
     try:
-        new_caption = post_manager.create_post_caption(edit_state['current_post']['parsed_data'])
-        edit_state['current_post']['caption'] = new_caption
+        post.render()
         
         # 更新用户投稿
-        user_posts[user_id][-1] = edit_state['current_post']
+        posts[index] = post
+        await user_posts.set(user_id, posts)
         
-        # 显示编辑成功消息和完整的更新内容
-        await update.message.reply_text(f"{editing_field}已更新！\n\n更新后的完整内容：\n{new_caption}")
-        await show_post_preview(update, context, user_id)
+        # 预览消息原地更新为修改后的内容
+        await show_post_preview(update, context, user_id, index)
     except ValueError as e:
         await update.message.reply_text(f"更新失败：{str(e)}")
 
@@ -728,8 +1393,7 @@ async def handle_finish_edit(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = query.from_user.id
 
     # 清除编辑状态
-    if user_id in user_states:
-        del user_states[user_id]
+    await user_states.delete(user_id)
 
     # 显示更新后的投稿预览
     await show_post_preview(update, context, user_id)
@@ -743,8 +1407,7 @@ async def handle_cancel_edit(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = query.from_user.id
 
     # 清除编辑状态
-    if user_id in user_states:
-        del user_states[user_id]
+    await user_states.delete(user_id)
 
     # 显示原始投稿预览
     await show_post_preview(update, context, user_id)
@@ -758,25 +1421,28 @@ async def handle_cancel_edit_field(update: Update, context: ContextTypes.DEFAULT
     user_id = query.from_user.id
 
     # 清除当前字段编辑状态
-    if user_id in user_states and user_states[user_id]['step'].startswith('edit_'):
+    state = await user_states.get(user_id)
+    if state and state['step'].startswith('edit_'):
         # 返回到编辑菜单
         await handle_edit_callback(update, context)
 
 
 # 修改 handle_message 函数以支持编辑模式
+@HANDLER_LATENCY.time('handle_message', '')
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     处理用户投稿消息
     """
     user_id = update.message.from_user.id
+    state = await user_states.get(user_id)
     
     # 检查是否在编辑模式
-    if user_id in user_states and user_states[user_id]['step'].startswith('edit_'):
+    if state and state['step'].startswith('edit_'):
         await handle_edit_field_message(update, context)
         return
 
     # 检查是否在分步投稿状态
-    if user_id in user_states and 'step' in user_states[user_id]:
+    if state and 'step' in state:
         await handle_step_post_message(update, context)
         return
 
@@ -818,15 +1484,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # 验证格式
-        pattern = (
-            r"名称：\s*.*\n\n"
-            r"描述：\s*.*\n\n"
-            r"(链接：\s*https?:\\/\\/[^\s]+\n)+\n"
-            r"📁 大小：\s*.*\n"
-            r"🏷 标签：\s*.*"
-        )
-
-        if not re.search(pattern, caption, re.DOTALL):
+        if not _STANDARD_FORMAT_RE.search(caption):
             # 尝试自动修复
             fixed_caption = auto_fix_message(caption)
             # 修复后再次检测广告内容
@@ -837,7 +1495,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 return
                 
-            if not re.search(pattern, fixed_caption, re.DOTALL):
+            if not _STANDARD_FORMAT_RE.search(fixed_caption):
                 error_message = "投稿格式不正确，请按照模板重新投稿。\n\n"
                 error_message += (
                     "请按照以下格式投稿：\n\n"
@@ -856,66 +1514,51 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 return
             caption = fixed_caption
             
-        # 存储投稿内容
-        if user_id not in user_posts:
-            user_posts[user_id] = []
-
-        user_posts[user_id].append({'image': image, 'caption': caption})
+        # 自动修复后的内容直接作为缓存，不重新生成
+        fields = tokenize_caption(caption, AUTO_FIX_FIELD_LABELS)
+        fields['links'] = fields['all_links']
+        post = Post.from_fields(image, fields, caption)
+        post.render()
     else:
         # 使用严格模式解析的数据创建标准格式投稿
         try:
-            standard_caption = post_manager.create_post_caption(parsed_data)
-            
-            # 存储投稿内容
-            if user_id not in user_posts:
-                user_posts[user_id] = []
-
-            user_posts[user_id].append({'image': image, 'caption': standard_caption})
+            post = Post.from_fields(image, parsed_data)
+            post.render()
         except ValueError as e:
             await update.message.reply_text(f"投稿被拒绝：{str(e)}")
             return
 
-    # 显示预览
-    await show_post_preview(update, context, user_id)
+    # 检查是否重复投稿
+    reposted_links = await find_reposted_links(post)
+    if reposted_links:
+        if DUPLICATE_LINK_POLICY == "reject":
+            await update.message.reply_text("投稿被拒绝：以下链接已经发布过：\n" + "\n".join(reposted_links))
+            return
+        await update.message.reply_text("提示：以下链接已经发布过，请确认不是重复投稿：\n" + "\n".join(reposted_links))
+
+    # 存储投稿内容
+    posts = await user_posts.get(user_id, [])
+    posts.append(post)
+    await user_posts.set(user_id, posts)
+
+    # 显示预览，翻到刚提交的投稿
+    await show_post_preview(update, context, user_id, -1)
 
 
 def auto_fix_message(caption):
     """
     自动修复消息格式
     """
-    # 提取各部分内容
-    name_match = re.search(r"名称[：:]\s*(.+?)(?=\n|$)", caption)
-    desc_match = re.search(r"(?:描述|简介)[：:]\s*(.+?)(?=\n(?:链接|夸克|百度|UC|迅雷|📁|🏷)|$)", caption, re.DOTALL)
-    
-    # 提取链接
-    links = []
-    link_patterns = [
-        r"链接[：:]\s*(https?://[^\s\n]+)",
-        r"(夸克|百度|UC|迅雷)[：:]\s*(https?://[^\s\n]+(?:\?pwd=[^\s\n]+)?)",
-        r"(https?://(?:pan\.quark\.cn/s/[^\s\n]+|pan\.baidu\.com/s/[^\s\n]+(?:\?pwd=[^\s\n]+)?|drive\.uc\.cn/[^\s\n]+|pan\.xunlei\.com/s/[^\s\n]+(?:\?pwd=[^\s\n]+)?))"
-    ]
-    
-    for pattern in link_patterns:
-        matches = re.findall(pattern, caption)
-        for match in matches:
-            if isinstance(match, tuple):
-                link = match[1] if len(match) > 1 else match[0]
-            else:
-                link = match
-            if link not in links:
-                links.append(link)
+    fields = tokenize_caption(caption, AUTO_FIX_FIELD_LABELS)
+    links = fields['all_links']
     
     # 格式化链接
     links_formatted = [f"链接：{link}" for link in links] if links else ["链接：https://pan.quark.cn/s/3c07afa156f3"]
     
-    # 提取大小和标签
-    size_match = re.search(r"大小[：:]\s*(.+?)(?=\n|$)", caption)
-    tag_match = re.search(r"标签[：:]\s*(.+?)(?=\n|$)", caption)
-    
-    name = name_match.group(1).strip() if name_match else "未提供"
-    description = desc_match.group(1).strip() if desc_match else "未提供"
-    size = size_match.group(1).strip() if size_match else "NG"
-    tags = tag_match.group(1).strip() if tag_match else "#网盘资源"
+    name = fields['name'] or "未提供"
+    description = fields['description'] or "未提供"
+    size = fields['size'] or "NG"
+    tags = fields['tags'] or "#网盘资源"
     
     # 构建标准格式
     newline = "\n"
@@ -934,6 +1577,7 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     处理按钮回调
     """
+    start_time = time.perf_counter()
     query = update.callback_query
     await query.answer()
 
@@ -942,10 +1586,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "step_post": step_post_start,
         "post_info": post_info,
         "my_posts": show_my_posts,
+        "view_drafts": view_drafts,
         "back_to_main": start,
         "clear_posts": clear_posts,
         "edit_post": handle_edit_callback,
         "confirm_post": handle_confirm_callback,
+        "retry_publish": handle_retry_publish,
         "cancel_post": cancel_post,
         "cancel_step_post": cancel_step_post,
         "edit_name": handle_edit_field_callback,
@@ -958,8 +1604,19 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "cancel_edit_field": handle_cancel_edit_field
     }
 
-    if query.data in handlers:
-        await handlers[query.data](update, context)
+    handler = handlers.get(query.data)
+    label = query.data
+    if handler is None and query.data.startswith("preview_page:"):
+        handler, label = handle_preview_page, "preview_page"
+    elif handler is None and query.data.startswith("my_posts:"):
+        handler, label = show_my_posts, "my_posts_page"
+
+    if handler is not None:
+        try:
+            await handler(update, context)
+        finally:
+            # 只记录已知的 callback_data，避免任意回调数据产生大量标签
+            HANDLER_LATENCY.labels('button_handler', label).observe(time.perf_counter() - start_time)
 
 
 async def clear_posts(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -967,201 +1624,237 @@ async def clear_posts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     清空投稿记录
     """
     user_id = update.callback_query.from_user.id
-    if user_id in user_posts:
-        del user_posts[user_id]
+    await user_posts.delete(user_id)
+    await user_previews.delete(user_id)
     await update.callback_query.edit_message_text("投稿记录已清空。")
     await asyncio.sleep(2)
     await start(update, context)
 
 
+@HANDLER_LATENCY.time('handle_confirm_callback', '')
 async def handle_confirm_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     处理确认发布回调 - 根据网盘类型发布到对应频道
     """
     query = update.callback_query
     user_id = query.from_user.id
+    posts = await user_posts.get(user_id)
 
-    if user_id not in user_posts:
+    if not posts:
         await query.answer("找不到您的投稿内容，无法发送到频道。")
         return
 
-    success_count = 0
-    fail_count = 0
+    accepted = []
+    rejected = []
+    published_urls = []
 
-    for post_data in user_posts[user_id]:
-        image = post_data['image']
-        caption = post_data['caption']
+    # 已经有发布记录的投稿（重复确认或上次发送中断），其链接已记入索引，不再按重复投稿拒绝
+    known_post_ids = await publish_ledger.known(post.post_id for post in posts)
+
+    # 所有投稿的链接一起并发检查是否失效
+    link_status = {}
+    if LINK_CHECK_ENABLED:
+        link_status = await link_checker.check(
+            [link for post in posts for link in post.classified_links if link.provider]
+        )
+
+    # 逐条检查，通过的投稿发布，未通过的保留在草稿中并在结果里列出原因
+    for post in posts:
+        caption = post.caption
 
         # 发布前再次检测广告内容
         if post_manager.detect_ad_content(caption):
-            await query.answer("检测到广告内容，无法发布。")
-            fail_count += 1
+            rejected.append((post, "检测到广告内容"))
             continue
 
-        # 处理重复链接
-        processed_caption = post_manager.remove_duplicate_links(caption)
-        
-        # 在最终提交时添加"鹏摇星海"标签
-        if "🏷 标签：" in processed_caption:
-            # 如果已经有标签行，检查是否包含"#鹏摇星海"，如果没有则添加
-            if "#鹏摇星海" not in processed_caption:
-                processed_caption = processed_caption.replace("🏷 标签：", "🏷 标签：#鹏摇星海 ")
-        else:
-            # 如果没有标签行，添加包含"#鹏摇星海"的标签行
-            processed_caption += "\n🏷 标签：#鹏摇星海"
+        # 拒绝模式下，发布前再次检查重复链接（包括同一批次中的其他投稿）
+        if DUPLICATE_LINK_POLICY == "reject" and post.post_id not in known_post_ids:
+            pan_urls = {link.url for link in post.classified_links if link.provider}
+            if await find_reposted_links(post) or pan_urls.intersection(published_urls):
+                rejected.append((post, "链接已经发布过"))
+                continue
 
-        # 提取链接以确定链接类型
-        links = re.findall(r"链接：\s*(https?://[^\s\n]+)", processed_caption)
+        dead_links = [link.raw for link in post.classified_links if link_status.get(link.url) == DEAD]
+        if dead_links:
+            rejected.append((post, "以下链接已失效：\n" + "\n".join(dead_links)))
+            continue
 
-        # 检查是否有链接
-        if not links:
-            # 告诉用户没有找到有效的链接
-            await query.answer("未识别到任何有效链接，请检查链接格式。")
-            await query.edit_message_text("发布失败：未识别到任何有效链接，请检查链接格式。\n\n"
-                                         "链接应以以下格式之一开头：\n"
-                                         "- https://pan.quark.cn/\n"
-                                         "- https://pan.baidu.com/\n"
-                                         "- https://drive.uc.cn/\n"
-                                         "- https://pan.xunlei.com/\n\n"
-                                         "请编辑或重新投稿。")
-            return
+        # 生成发布计划（去重、添加标签、链接分类和各频道内容）
+        plan = post_manager.plan_publish(caption)
 
-        # 识别所有链接类型
-        link_types = post_manager.identify_link_types(links)
+        # 检查是否有链接
+        if not plan.links:
+            rejected.append((post, "未识别到任何有效链接"))
+            continue
 
         # 检查是否识别出了链接类型
-        if not link_types:
-            unrecognized_links = []
-            for link in links:
-                if link.startswith("链接："):
-                    url = link[3:].strip()
-                else:
-                    url = link.strip()
-                unrecognized_links.append(url)
-
-            # 告诉用户有哪些未识别的链接
-            await query.answer("发现未识别的链接类型。")
-            await query.edit_message_text(f"发布失败：发现未识别的链接类型。\n\n"
-                                         f"未识别的链接：\n" +
-                                         "\n".join(unrecognized_links) +
-                                         "\n\n链接应以以下格式之一开头：\n"
-                                         "- https://pan.quark.cn/\n"
-                                         "- https://pan.baidu.com/\n"
-                                         "- https://drive.uc.cn/\n"
-                                         "- https://pan.xunlei.com/\n\n"
-                                         "请编辑或重新投稿。")
-            return
+        if not plan.link_types:
+            rejected.append((post, "未识别的链接类型：\n" + "\n".join(link.raw for link in plan.links)))
+            continue
 
-        # 总是发送到汇总频道和备用频道（包含所有链接）
-        base_channels = CHANNEL_IDS
+        published_urls.extend(link.url for link in plan.links if link.provider)
+        accepted.append((post, plan))
 
-        # 构建基础消息内容（包含所有链接）
-        base_message = (
-            f"{processed_caption}\n"
-            f"\n📢 频道：@yunpanNB\n"
-            f"👥 群组：@naclzy\n"
-            f"🔗 获取更多资源：https://docs.qq.com/aio/DYmZYVGpFVGxOS3NE\n"
-            f"🎉 来源：https://link3.cc/pyxh"
-        )
+    rejected_text = format_rejected_posts(rejected)
+    if not accepted:
+        # 全部未通过：草稿保持不变，预览消息改为失败原因
+        keyboard = [
+            [InlineKeyboardButton("✏️ 编辑投稿", callback_data="edit_post")],
+            [InlineKeyboardButton("❌ 取消投稿", callback_data="cancel_post")]
+        ]
+        await query.edit_message_text("发布失败。" + rejected_text, reply_markup=InlineKeyboardMarkup(keyboard))
+        await _preview_replaced(user_id)
+        return
 
-        # 发送到汇总频道和备用频道
-        for channel_id in base_channels:
-            try:
-                await context.bot.send_photo(chat_id=channel_id, photo=image, caption=base_message)
-                success_count += 1
-               # print(f"成功发送到基础频道: {channel_id}")  # 调试信息
-            except RetryAfter as e:
-                retry_after = e.retry_after
-                await asyncio.sleep(retry_after)
-                try:
-                    await context.bot.send_photo(chat_id=channel_id, photo=image, caption=base_message)
-                    success_count += 1
-                   # print(f"重试后成功发送到基础频道: {channel_id}")  # 调试信息
-                except:
-                    fail_count += 1
-                   # print(f"发送到基础频道失败: {channel_id}")  # 调试信息
-                    continue
-            except TimedOut:
-                await asyncio.sleep(5)
-                try:
-                    await context.bot.send_photo(chat_id=channel_id, photo=image, caption=base_message)
-                    success_count += 1
-                   # print(f"超时后成功发送到基础频道: {channel_id}")  # 调试信息
-                except:
-                    fail_count += 1
-                   # print(f"超时发送到基础频道失败: {channel_id}")  # 调试信息
-                    continue
-            except Exception as e:
-                logger.error(f"Error while sending post to channel {channel_id}: {e}")
-                fail_count += 1
-              #  print(f"发送到基础频道异常: {channel_id}, 错误: {e}")  # 调试信息
-
-        # 为每种链接类型创建特定内容并发送到对应专门频道
-        for link_type in link_types:
-            if link_type in SPECIFIC_CHANNELS:
-                # 创建只包含该类型链接的投稿内容
-                specific_caption = post_manager.create_channel_specific_caption(processed_caption, link_type)
-
-                # 构建专门频道消息内容
-                specific_message = (
-                    f"{specific_caption}\n"
-                    f"📢 频道：@@yunpanNB\n"
-                    f"👥 群组：@naclzy\n"
-                    f"🔗 获取更多资源：https://docs.qq.com/aio/DYmZYVGpFVGxOS3NE\n"
-                    f"🔗交流讨论：https://link3.cc/pyxh"
-                )
+    # 在发布台账中领取每个频道：已发送的和正在由其他确认发送的跳过，失败或中断的重新发送
+    chat_id = query.message.chat_id
+    message_id = query.message.message_id
+    jobs = []
+    already_sent = in_progress = 0
+    for post, plan in accepted:
+        claim = await publish_ledger.claim(
+            post.post_id, [(channel_id, post.image, message) for channel_id, message in plan.jobs],
+            chat_id, message_id, user_id, post.summary, [link.url for link in plan.links if link.provider]
+        )
+        jobs.extend(PublishJob(entry.channel_id, entry.image, entry.caption, entry.post_id) for entry in claim.entries)
+        already_sent += claim.sent
+        in_progress += claim.in_progress
 
-                # 发送到对应的专门频道
-                channel_id = SPECIFIC_CHANNELS[link_type]
-                try:
-                    await context.bot.send_photo(chat_id=channel_id, photo=image, caption=specific_message)
-                    success_count += 1
-                   # print(f"成功发送到专门频道 {link_type}: {channel_id}")  # 调试信息
-                except RetryAfter as e:
-                    retry_after = e.retry_after
-                    await asyncio.sleep(retry_after)
-                    try:
-                        await context.bot.send_photo(chat_id=channel_id, photo=image, caption=specific_message)
-                        success_count += 1
-                     #   print(f"重试后成功发送到专门频道 {link_type}: {channel_id}")  # 调试信息
-                    except:
-                        fail_count += 1
-                      #  print(f"发送到专门频道 {link_type} 失败: {channel_id}")  # 调试信息
-                        continue
-                except TimedOut:
-                    await asyncio.sleep(5)
-                    try:
-                        await context.bot.send_photo(chat_id=channel_id, photo=image, caption=specific_message)
-                        success_count += 1
-                      #  print(f"超时后成功发送到专门频道 {link_type}: {channel_id}")  # 调试信息
-                    except:
-                        fail_count += 1
-                      #  print(f"超时发送到专门频道 {link_type} 失败: {channel_id}")  # 调试信息
-                        continue
-                except Exception as e:
-                    logger.error(f"Error while sending post to channel {channel_id}: {e}")
-                    fail_count += 1
-                  #  print(f"发送到专门频道 {link_type} 异常: {channel_id}, 错误: {e}")  # 调试信息
-
-    # 回复用户
-    if fail_count == 0:
-        await query.answer("内容已成功发布到所有频道！")
-        await query.edit_message_text(f"您的投稿已成功发布到所有频道（共{success_count}条）。\n感谢您的支持！")
+    # 清理数据，未通过检查的投稿留在草稿中，预览消息接下来用于显示发布进度
+    if rejected:
+        await user_posts.set(user_id, [post for post, _ in rejected])
     else:
-        await query.answer("部分内容发布失败")
-        await query.edit_message_text(
-            f"您的投稿发布完成：\n成功：{success_count}条\n失败：{fail_count}条\n感谢您的支持！")
+        await user_posts.delete(user_id)
+    await user_states.delete(user_id)
+    await user_previews.delete(user_id)
+
+    # 已发布链接和投稿历史在有频道发送成功后才记录（见 record_published）
+    if not jobs and in_progress:
+        await query.edit_message_text(f"您的投稿正在发布中（共{in_progress}条），完成后会通知您..." + rejected_text)
+        return
 
-    # 清理数据
-    if user_id in user_posts:
-        del user_posts[user_id]
-    if user_id in user_states:
-        del user_states[user_id]
+    # 放入发布队列，由后台 worker 发送，发送完成后编辑这条消息通知用户
+    if jobs:
+        await query.edit_message_text(f"正在发布到频道（共{len(jobs)}条），完成后会在这里通知您..." + rejected_text)
+    await submit_publish(context.bot, jobs, make_publish_report(chat_id, message_id, rejected_text, already_sent))
+
+
+def format_rejected_posts(rejected):
+    """
+    未通过发布检查的投稿及原因，附加在预览/结果消息后面；没有时返回空字符串
+    """
+    if not rejected:
+        return ""
+    lines = [f"\n\n以下{len(rejected)}条投稿未发布，已保留在草稿中，可编辑后重新确认："]
+    for post, reason in rejected:
+        lines.append(f"• {post.summary}：{reason}")
+    if any(reason.startswith("未识别") for _, reason in rejected):
+        lines.append("\n链接应以以下格式之一开头：\n"
+                     "- https://pan.quark.cn/\n"
+                     "- https://pan.baidu.com/\n"
+                     "- https://drive.uc.cn/\n"
+                     "- https://pan.xunlei.com/")
+    return "\n".join(lines)
+
+
+async def record_published(batch):
+    """
+    本批次中至少有一个频道发送成功的投稿，第一次成功时记录其网盘链接（防止重复投稿）并写入投稿历史；
+    所有频道都失败的投稿不记录，投稿人可以重新投稿
+    """
+    post_ids = {job.post_id for job in batch.jobs if job.post_id is not None and job.message_id is not None}
+    if not post_ids:
+        return
+    published = await publish_ledger.mark_published(post_ids)
+    urls = [url for post in published for url in post.urls]
+    if urls and DUPLICATE_LINK_POLICY != "off":
+        await link_index.add(urls)
+    summaries = {}
+    for post in published:
+        if post.user_id is not None:
+            summaries.setdefault(post.user_id, []).append(post.summary)
+    for user_id, user_summaries in summaries.items():
+        await post_history.add(user_id, user_summaries)
+
+
+def make_publish_report(chat_id, message_id, rejected_text="", already_sent=0):
+    """
+    返回发布批次完成后的回调：记录已发布的投稿，再编辑通知消息
+    rejected_text: 确认时未通过检查的投稿（format_rejected_posts 的结果），附加在结果后面
+    already_sent: 之前已经发送成功的频道数，计入成功
+    chat_id 为 None 时不通知
+    """
+    async def report_result(batch):
+        await record_published(batch)
+        if chat_id is None:
+            return
+        success_count = batch.success_count + already_sent
+        if batch.fail_count == 0:
+            message = f"您的投稿已成功发布到所有频道（共{success_count}条）。\n感谢您的支持！"
+        else:
+            message = f"您的投稿发布完成：\n成功：{success_count}条\n失败：{batch.fail_count}条\n感谢您的支持！"
+        message += rejected_text
+        keyboard = [[InlineKeyboardButton("◀️ 返回主菜单", callback_data="back_to_main")]]
+        if batch.fail_count and any(job.post_id is not None for job in batch.jobs):
+            # 失败的频道记录在发布台账中，按这条通知消息重新领取
+            keyboard.insert(0, [InlineKeyboardButton("🔁 重试失败的频道", callback_data="retry_publish")])
+        await batch.bot.edit_message_text(message, chat_id=chat_id, message_id=message_id,
+                                          reply_markup=InlineKeyboardMarkup(keyboard))
+
+    return report_result
 
-    await asyncio.sleep(2)
-    await start(update, context)
 
+async def handle_retry_publish(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    重新发送发布结果消息对应的失败频道，已发送的频道不会重复发送
+    """
+    query = update.callback_query
+    chat_id = query.message.chat_id
+    message_id = query.message.message_id
+    claim = await publish_ledger.claim_failed(chat_id, message_id)
+    if not claim.entries:
+        if claim.in_progress:
+            await query.edit_message_text(f"您的投稿正在发布中（共{claim.in_progress}条），完成后会通知您...")
+        else:
+            keyboard = [[InlineKeyboardButton("◀️ 返回主菜单", callback_data="back_to_main")]]
+            await query.edit_message_text("没有需要重试的频道。", reply_markup=InlineKeyboardMarkup(keyboard))
+        return
 
+    jobs = [PublishJob(entry.channel_id, entry.image, entry.caption, entry.post_id) for entry in claim.entries]
+    await query.edit_message_text(f"正在重新发布失败的频道（共{len(jobs)}条），完成后会在这里通知您...")
+    await submit_publish(context.bot, jobs, make_publish_report(chat_id, message_id, already_sent=claim.sent))
+
+
+async def submit_publish(bot, jobs, on_complete):
+    """
+    提交到发布队列；webhook 模式下开启 WEBHOOK_WAIT_FOR_PUBLISH 时等结果通知发出后才返回
+    """
+    batch = publisher.submit(bot, jobs, on_complete)
+    if BOT_MODE == "webhook" and WEBHOOK_WAIT_FOR_PUBLISH:
+        await batch.reported.wait()
+    return batch
+
+
+async def resume_publishing(bot, stale_after=None):
+    """
+    继续发送发布台账中中断的频道（进程在发送途中退出），按通知消息分批，完成后照常通知投稿人
+    stale_after: 领取多久以前的 pending 记录，默认为租约时间；单实例启动时为 0
+    只放入发布队列，不等待发送完成（即使开启了 WEBHOOK_WAIT_FOR_PUBLISH）
+    """
+    try:
+        entries = await publish_ledger.claim_stale(stale_after)
+    except Exception as e:
+        logger.error(f"Error while reading publish ledger: {e}")
+        return
+    if not entries:
+        return
+    batches = {}
+    for entry in entries:
+        batches.setdefault((entry.notify_chat_id, entry.notify_message_id), []).append(entry)
+    for (chat_id, message_id), group in batches.items():
+        jobs = [PublishJob(entry.channel_id, entry.image, entry.caption, entry.post_id) for entry in group]
+        publisher.submit(bot, jobs, make_publish_report(chat_id, message_id))
+    logger.info(f"Resumed {len(entries)} interrupted channel sends from publish ledger")
 
 
 async def cancel_post(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -1171,8 +1864,8 @@ async def cancel_post(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = query.from_user.id
     
-    if user_id in user_posts:
-        del user_posts[user_id]
+    await user_posts.delete(user_id)
+    await user_previews.delete(user_id)
         
     await query.edit_message_text("投稿已取消。")
     await asyncio.sleep(2)
@@ -1186,37 +1879,423 @@ async def cancel_step_post(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     user_id = query.from_user.id
     
-    if user_id in user_states:
-        del user_states[user_id]
+    await user_states.delete(user_id)
         
     await query.edit_message_text("分步投稿已取消。")
     await asyncio.sleep(2)
     await start(update, context)
 
 
+def reload_routing():
+    """
+    重新读取路由配置并替换当前路由表，配置有误时抛出 ValueError 并保留原路由表
+    """
+    global routing
+    table = load_routing(ROUTING_FILE, DEFAULT_ROUTING)
+    routing = table
+    return table
+
+
+def _reload_routing_on_signal():
+    try:
+        table = reload_routing()
+        logger.info(f"Routing reloaded: {len(table.summary_routes)} summary, "
+                    f"{len(table.provider_routes)} provider channels")
+    except ValueError as e:
+        logger.error(f"Error while reloading routing: {e}")
+
+
+def install_reload_signal():
+    """
+    收到 SIGHUP 时重新加载路由配置（Windows 不支持）
+    """
+    if hasattr(signal, 'SIGHUP'):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload_routing_on_signal)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+
+async def reload_routing_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /reload_routing：管理员重新加载路由配置
+    """
+    if update.message.from_user.id not in ADMIN_IDS:
+        await update.message.reply_text("该命令仅限管理员使用。")
+        return
+    try:
+        table = reload_routing()
+    except ValueError as e:
+        await update.message.reply_text(f"路由配置有误，未生效：{e}")
+        return
+    provider_lines = [f"{provider}：{route.channel_id}" for provider, route in table.provider_routes.items()]
+    await update.message.reply_text(
+        "路由已更新。\n"
+        f"汇总频道：{', '.join(route.channel_id for route in table.summary_routes)}\n"
+        "专门频道：\n" + "\n".join(provider_lines)
+    )
+
+
+# 批量导入的校验线程池
+import_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+
+
+def validate_import_row(row):
+    """
+    校验一行导入数据，在线程池中执行
+    返回 (发布计划中的 [(频道ID, 发送内容), ...], 网盘链接的规范化 URL)，不通过时抛出 ValueError
+    重复链接需要查询链接索引，由 run_import_job 中的 check_duplicates 在事件循环中检查
+    """
+    post = Post.from_fields(row['cover'], row)
+    # 生成投稿内容时检查版权关键词
+    caption = post.caption
+    parsed_data = post_manager.strict_mode_parse(caption)
+    if not parsed_data['name'] or not parsed_data['links']:
+        raise ValueError("格式不正确")
+    if post_manager.detect_ad_content(caption):
+        raise ValueError("包含广告内容")
+    plan = post_manager.plan_publish(caption)
+    if not plan.link_types:
+        raise ValueError("未识别到有效的网盘链接")
+    return plan.jobs, [link.url for link in plan.links if link.provider]
+
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /import：管理员批量导入
+    """
+    if update.message.from_user.id not in ADMIN_IDS:
+        await update.message.reply_text("该命令仅限管理员使用。")
+        return
+    context.user_data['awaiting_import'] = True
+    await update.message.reply_text(
+        "请发送 JSONL 或 CSV 文件，每行一个资源，字段：\n"
+        "name, description, links, size, tags, cover\n\n"
+        "links 可以是列表，或用换行/空格/|分隔；cover 为图片的 file_id 或 URL。"
+    )
+
+
+async def handle_import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    接收 /import 之后上传的文件，导入在后台执行，不阻塞该用户后续的消息
+    """
+    user_id = update.message.from_user.id
+    if user_id not in ADMIN_IDS or not context.user_data.pop('awaiting_import', False):
+        await update.message.reply_text("投稿请发送图片，批量导入请先发送 /import。")
+        return
+
+    # 批量导入很少用到，相关模块在第一次导入时再加载
+    from bulk_import import detect_format
+
+    document = update.message.document
+    fmt = detect_format(document.file_name, document.mime_type)
+    if fmt is None:
+        await update.message.reply_text("无法识别文件格式，请上传 .jsonl 或 .csv 文件。")
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await update.message.reply_text("文件太大，请拆分后分别导入（单个文件不超过 20MB）。")
+        return
+
+    await update.message.reply_text("文件已收到，开始导入...")
+    context.application.create_task(
+        run_import_job(context.bot, update.message.chat_id, document.file_id, fmt),
+        update=update
+    )
+
+
+async def run_import_job(bot, chat_id, file_id, fmt):
+    """
+    下载文件、逐行校验，并按 IMPORT_MAX_IN_FLIGHT 控制同时发布的数量
+    """
+    import csv
+
+    from bulk_import import run_import
+
+    slots = asyncio.Semaphore(IMPORT_MAX_IN_FLIGHT)
+    publish_result = {'success': 0, 'fail': 0}
+    source_path = report_path = None
+    # 本次导入中已通过的链接，前面的行还没发布完时也能发现文件内的重复
+    accepted_urls = set()
+
+    async def check_duplicates(line_no, row, result):
+        # 与投稿一样按 DUPLICATE_LINK_POLICY 处理：reject 拒绝该行，warn 在报告中提示
+        _, urls = result
+        if not urls or DUPLICATE_LINK_POLICY == "off":
+            return None
+        duplicates = await link_index.find_existing(urls)
+        duplicates.update(url for url in urls if url in accepted_urls)
+        if duplicates and DUPLICATE_LINK_POLICY == "reject":
+            raise ValueError("链接已经发布过：" + " ".join(sorted(duplicates)))
+        accepted_urls.update(urls)
+        if duplicates:
+            return "链接已经发布过：" + " ".join(sorted(duplicates))
+        return None
+
+    async def publish_row(line_no, row, result):
+        channel_jobs, urls = result
+        # 等待有空位再发布，读取和校验也随之暂停
+        await slots.acquire()
+
+        async def release(batch):
+            publish_result['success'] += batch.success_count
+            publish_result['fail'] += batch.fail_count
+            try:
+                # 至少一个频道发送成功后才记录链接
+                if batch.success_count and urls and DUPLICATE_LINK_POLICY != "off":
+                    await link_index.add(urls)
+            except Exception as e:
+                logger.error(f"Error while recording imported links: {e}")
+            finally:
+                slots.release()
+
+        publisher.submit(bot, [PublishJob(channel_id, row['cover'], message) for channel_id, message in channel_jobs],
+                         release)
+
+    try:
+        with tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False) as source:
+            source_path = source.name
+        tg_file = await bot.get_file(file_id)
+        await tg_file.download_to_drive(source_path)
+
+        with tempfile.NamedTemporaryFile('w', suffix=".csv", newline='', encoding='utf-8-sig',
+                                         delete=False) as report_file, \
+                open(source_path, encoding='utf-8-sig', newline='') as source:
+            report_path = report_file.name
+            summary = await run_import(source, fmt, validate_import_row, publish_row, csv.writer(report_file),
+                                       import_executor, check=check_duplicates)
+
+        with open(report_path, 'rb') as report_file:
+            await bot.send_document(chat_id, report_file, filename="import_report.csv",
+                                    caption=f"校验完成：{summary}\n正在发布通过的资源...")
+
+        # 等待所有发布完成
+        for _ in range(IMPORT_MAX_IN_FLIGHT):
+            await slots.acquire()
+        await bot.send_message(
+            chat_id,
+            f"导入完成：{summary}\n"
+            f"发布成功{publish_result['success']}条，失败{publish_result['fail']}条。"
+        )
+    except Exception as e:
+        logger.exception(f"Error while importing file: {e}")
+        await bot.send_message(chat_id, f"导入失败：{e}")
+    finally:
+        for path in (source_path, report_path):
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+# 轮询模式下与机器人共用事件循环的 HTTP 服务（/metrics、/healthz、/readyz）
+_http_server = None
+
+
+async def start_services(application):
+    """
+    轮询模式启动后在同一个事件循环里监听端口
+    """
+    global _http_server
+    health_check.attach(application, application.bot_data.get('poll_monitor'))
+    install_reload_signal()
+    _http_server = await start_http_server(service_routes, "0.0.0.0", int(os.environ.get("PORT", 8080)))
+    # 轮询模式只有一个实例，台账中所有 pending 记录都是上次退出时未完成的
+    await resume_publishing(application.bot, stale_after=0)
+
+
+async def close_services(application):
+    """
+    退出前停止发布队列并提交未写入的数据
+    """
+    global _http_server
+    if _http_server is not None:
+        _http_server.close()
+        _http_server = None
+    await publisher.stop()
+    if bot_pool is not None:
+        await bot_pool.shutdown()
+    if storage_backend is not None:
+        await storage_backend.close()
+    await link_index.close()
+    await post_history.close()
+    await publish_ledger.close()
+    await link_checker.close()
+    import_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def build_application():
+    """
+    创建 Application 并注册处理器
+    """
+    builder = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+        .post_shutdown(close_services)
+    )
+    if TELEGRAM_API_URL:
+        api_url = TELEGRAM_API_URL.rstrip('/')
+        builder = builder.base_url(f"{api_url}/bot").base_file_url(f"{api_url}/file/bot")
+    if BOT_MODE == "webhook":
+        # webhook 模式不调用 getUpdates，两类请求共用一个连接池，冷启动时只创建一次 SSL 上下文
+        bot_info = None
+        if BOT_USERNAME:
+            bot_info = {
+                'id': int(TOKEN.split(':', 1)[0]),
+                'is_bot': True,
+                'first_name': BOT_USERNAME,
+                'username': BOT_USERNAME.lstrip('@'),
+            }
+        request = InlineReplyRequest(connection_pool_size=256, read_timeout=TELEGRAM_READ_TIMEOUT, bot_info=bot_info)
+        builder = builder.request(request).get_updates_request(request)
+    if BOT_MODE == "polling":
+        poll_monitor = PollingMonitor()
+        builder = (
+            builder.read_timeout(TELEGRAM_READ_TIMEOUT)
+            .get_updates_request(poll_monitor)
+            .post_init(start_services)
+        )
+    application = builder.build()
+    if BOT_MODE == "polling":
+        application.bot_data['poll_monitor'] = poll_monitor
+
+    # 添加处理器
+    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("import", import_command))
+    application.add_handler(CommandHandler("reload_routing", reload_routing_command))
+    application.add_handler(MessageHandler(filters.Document.ALL, handle_import_document))
+    application.add_handler(MessageHandler(filters.TEXT | filters.PHOTO, handle_message))
+    application.add_handler(CallbackQueryHandler(button_handler))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+    return application
+
+
+# webhook 模式下整个进程共用一个已初始化的 Application，
+# Serverless 平台复用同一个实例处理后续请求时不再重复创建和初始化
+_application = None
+_application_lock = asyncio.Lock()
+# 后台任务的引用，避免任务在完成前被垃圾回收
+_background_tasks = set()
+
+
+async def get_application():
+    """
+    返回已初始化的 Application，第一次调用时创建
+    """
+    global _application
+    if _application is None:
+        created = False
+        async with _application_lock:
+            if _application is None:
+                application = build_application()
+                await application.initialize()
+                _application = application
+                created = True
+        if created:
+            # 在后台继续中断的发送，冷启动后的第一个请求不等待；可能有其他实例正在发送，只继续租约已过期的记录。
+            # Serverless 实例在发送完成前被冻结时，这些记录保持 pending，租约过期后由之后启动的实例再次领取
+            task = asyncio.get_running_loop().create_task(resume_publishing(_application.bot))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+    return _application
+
+
+async def shutdown_application():
+    """
+    关闭 webhook 模式下的 Application
+    """
+    global _application
+    if _application is not None:
+        application, _application = _application, None
+        await application.shutdown()
+        await close_services(application)
+
+
+webhook_processor = WebhookProcessor(get_application, WEBHOOK_SECRET, WEBHOOK_INLINE_REPLY, WEBHOOK_INLINE_DEADLINE)
+service_routes = {
+    ('GET', '/metrics'): REGISTRY.handle,
+    ('GET', '/healthz'): health_check.healthz,
+    ('GET', '/readyz'): health_check.readyz,
+}
+webhook_routes = {('POST', WEBHOOK_PATH): webhook_processor.handle, **service_routes}
+
+_asgi_log_listener = None
+
+
+async def startup_asgi():
+    """
+    ASGI 应用启动（lifespan startup）时配置日志，并加载关键词配置（有误时启动失败）
+    """
+    global _asgi_log_listener
+    if _asgi_log_listener is None:
+        _asgi_log_listener = configure_logging()
+    get_keyword_matcher()
+
+
+async def shutdown_asgi():
+    """
+    ASGI 应用关闭时关闭 Application 并写完剩余日志
+    """
+    global _asgi_log_listener
+    await shutdown_application()
+    if _asgi_log_listener is not None:
+        _asgi_log_listener.stop()
+        _asgi_log_listener = None
+
+
+# Vercel（@vercel/python）等平台通过这个 ASGI 应用接收 webhook
+app = make_asgi_app(webhook_routes, on_startup=startup_asgi, on_shutdown=shutdown_asgi)
+
+
+async def run_webhook():
+    """
+    自行监听端口接收 webhook
+    """
+    application = await get_application()
+    install_reload_signal()
+    if WEBHOOK_URL:
+        await application.bot.set_webhook(
+            WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+    server = await start_http_server(webhook_routes, "0.0.0.0", int(os.environ.get("PORT", 8080)))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await shutdown_application()
+
+
 def main():
     """
     主函数
     """
+    log_listener = configure_logging()
     try:
-        # 使用更明确的初始化方式
-        application = Application.builder().token(TOKEN).build()
+        # 关键词配置有误时直接退出
+        get_keyword_matcher()
+        if BOT_MODE == "webhook":
+            print("机器人启动中（webhook 模式）...")
+            asyncio.run(run_webhook())
+            return
 
-        # 添加处理器
-        application.add_handler(CommandHandler("start", start))
-        application.add_handler(MessageHandler(filters.TEXT | filters.PHOTO, handle_message))
-        application.add_handler(CallbackQueryHandler(button_handler))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
+        # 使用更明确的初始化方式
+        application = build_application()
 
         print("机器人启动中...")
         # 开始轮询
-        application.run_polling(drop_pending_updates=True)
+        application.run_polling(drop_pending_updates=DROP_PENDING_UPDATES)
 
     except Exception as e:
-        logger.error(f"启动机器人时发生错误: {e}")
+        logger.exception(f"启动机器人时发生错误: {e}")
         print(f"启动机器人时发生错误: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # 写完队列中剩余的日志
+        log_listener.stop()
 
 if __name__ == '__main__':
     import asyncio
@@ -1227,12 +2306,3 @@ if __name__ == '__main__':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
     main()
-
-
-
-
-
-
-
-
-
@@ -0,0 +1,131 @@
+"""
+投稿历史
+
+确认发布时为每条投稿保存一行摘要（投稿时已生成），供"我的投稿"分页浏览。
+按 (user_id, id) 建索引，翻页使用游标（上一页最后一条的 id）而不是 OFFSET，
+每页的查询代价与该用户的历史数量无关。
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+
+class HistoryEntry(NamedTuple):
+    id: int
+    summary: str
+    published_at: float
+
+
+class HistoryPage(NamedTuple):
+    """
+    一页历史记录，按发布时间从新到旧排列
+    has_older / has_newer: 这一页之前（更早）/ 之后（更新）是否还有记录
+    """
+    entries: list
+    has_older: bool
+    has_newer: bool
+
+
+class PostHistory:
+    """
+    path: SQLite 数据库文件，":memory:" 表示不持久化
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # 单线程执行器保证所有数据库操作串行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post_history")
+        self._conn = None
+        self._open_lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS post_history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+            "summary TEXT NOT NULL, published_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS post_history_user ON post_history (user_id, id)")
+        conn.commit()
+        return conn
+
+    async def open(self):
+        """
+        打开数据库，第一次使用时自动调用
+        """
+        async with self._open_lock:
+            if self._conn is None:
+                self._conn = await self._run(self._connect)
+
+    def _insert(self, user_id, summaries, published_at):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO post_history (user_id, summary, published_at) VALUES (?, ?, ?)",
+                [(user_id, summary, published_at) for summary in summaries]
+            )
+
+    async def add(self, user_id, summaries):
+        """
+        记录一次确认发布的所有投稿摘要
+        """
+        if not summaries:
+            return
+        if self._conn is None:
+            await self.open()
+        await self._run(self._insert, user_id, list(summaries), time.time())
+
+    def _exists(self, user_id, op, entry_id):
+        return self._conn.execute(
+            f"SELECT 1 FROM post_history WHERE user_id = ? AND id {op} ? LIMIT 1", (user_id, entry_id)
+        ).fetchone() is not None
+
+    def _page(self, user_id, before, after, limit):
+        if after is not None:
+            rows = self._conn.execute(
+                "SELECT id, summary, published_at FROM post_history WHERE user_id = ? AND id > ? "
+                "ORDER BY id ASC LIMIT ?", (user_id, after, limit + 1)
+            ).fetchall()
+            has_newer = len(rows) > limit
+            entries = [HistoryEntry(*row) for row in reversed(rows[:limit])]
+            has_older = bool(entries) and self._exists(user_id, '<', entries[-1].id)
+            return HistoryPage(entries, has_older, has_newer)
+
+        if before is None:
+            rows = self._conn.execute(
+                "SELECT id, summary, published_at FROM post_history WHERE user_id = ? "
+                "ORDER BY id DESC LIMIT ?", (user_id, limit + 1)
+            ).fetchall()
+        else:
+            rows = self._conn.execute(
+                "SELECT id, summary, published_at FROM post_history WHERE user_id = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?", (user_id, before, limit + 1)
+            ).fetchall()
+        has_older = len(rows) > limit
+        entries = [HistoryEntry(*row) for row in rows[:limit]]
+        has_newer = before is not None and bool(entries) and self._exists(user_id, '>', entries[0].id)
+        return HistoryPage(entries, has_older, has_newer)
+
+    async def page(self, user_id, before=None, after=None, limit=10):
+        """
+        读取一页记录
+        before: 返回 id 小于它的最新 limit 条（向更早翻页）
+        after: 返回 id 大于它的最早 limit 条（向更新翻页）
+        都为空时返回最新的一页
+        """
+        if self._conn is None:
+            await self.open()
+        return await self._run(self._page, user_id, before, after, limit)
+
+    async def close(self):
+        if self._conn is None:
+            return
+        await self._run(self._conn.close)
+        self._conn = None
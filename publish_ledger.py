@@ -0,0 +1,305 @@
+"""
+发布台账
+
+每个 (投稿 ID, 频道) 一行，记录发送内容、状态和发出的 message_id，保存在 SQLite 中：
+  - pending：已领取，正在发送（claimed_at 为领取时间）
+  - sent：已发送，message_id 为频道中的消息
+  - failed：重试用完仍失败，投稿人点击"重试"（claim_failed）或再次确认时重新领取
+
+确认发布时先在一个事务里领取需要发送的频道：没有记录的插入为 pending，failed 和租约过期的 pending
+重新领取，sent 和租约内的 pending 跳过。重复点击确认、Telegram 重新投递回调都不会重复发送；
+进程在发送途中退出后，未完成的 pending 行可以由 claim_stale 领取并继续发送。
+每条投稿另有一行记录投稿人、摘要和网盘链接，第一次有频道发送成功时由 mark_published 取出（只返回一次），
+调用方据此记录已发布链接，全部频道都失败的投稿不会被当作已发布。
+所有数据库操作在同一个线程中串行执行，多个进程共用数据库时由 SQLite 的写事务保证领取互斥。
+"""
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+
+
+class LedgerEntry(NamedTuple):
+    """
+    一个需要发送的 (投稿, 频道)
+    notify_chat_id / notify_message_id: 发送完成后通知投稿人的消息
+    """
+    post_id: str
+    channel_id: str
+    image: str
+    caption: str
+    notify_chat_id: object
+    notify_message_id: object
+
+
+class PublishedPost(NamedTuple):
+    """
+    第一次有频道发送成功的投稿
+    """
+    post_id: str
+    user_id: object
+    summary: str
+    urls: list
+
+
+class ClaimResult(NamedTuple):
+    """
+    entries: 本次领取、需要发送的 LedgerEntry
+    sent: 之前已经发送成功的频道数
+    in_progress: 正在由其他确认发送的频道数
+    new: 该投稿之前没有任何记录
+    """
+    entries: list
+    sent: int
+    in_progress: int
+    new: bool
+
+
+class PublishLedger:
+    """
+    path: SQLite 数据库文件，":memory:" 表示不持久化
+    lease: pending 行超过该秒数没有结果时视为发送中断，可以重新领取
+    retention: 已发送记录保留的秒数，打开时清理更早的记录（同一投稿在此期间不会重复发送）
+    """
+
+    def __init__(self, path, lease=300, retention=7 * 24 * 3600):
+        self.path = path
+        self.lease = lease
+        self.retention = retention
+        # 单线程执行器保证所有数据库操作串行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="publish_ledger")
+        self._conn = None
+        self._open_lock = asyncio.Lock()
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS publish_ledger ("
+            "post_id TEXT NOT NULL, channel_id TEXT NOT NULL, image TEXT NOT NULL, caption TEXT NOT NULL, "
+            "status TEXT NOT NULL, message_id INTEGER, claimed_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "notify_chat_id INTEGER, notify_message_id INTEGER, "
+            "PRIMARY KEY (post_id, channel_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS publish_ledger_status ON publish_ledger (status, claimed_at)")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS publish_ledger_notify ON publish_ledger (notify_chat_id, notify_message_id)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS publish_posts ("
+            "post_id TEXT PRIMARY KEY, user_id INTEGER, summary TEXT, urls TEXT NOT NULL, "
+            "published INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("DELETE FROM publish_ledger WHERE status = ? AND updated_at < ?",
+                     (SENT, time.time() - self.retention))
+        conn.execute("DELETE FROM publish_posts WHERE post_id NOT IN (SELECT post_id FROM publish_ledger)")
+        return conn
+
+    async def open(self):
+        """
+        打开数据库，第一次使用时自动调用
+        """
+        async with self._open_lock:
+            if self._conn is None:
+                self._conn = await self._run(self._connect)
+
+    async def _call(self, func, *args):
+        if self._conn is None:
+            await self.open()
+        return await self._run(func, *args)
+
+    def _claim(self, post_id, channels, notify_chat_id, notify_message_id, user_id, summary, urls, now):
+        conn = self._conn
+        entries = []
+        claimed = set()
+        sent = in_progress = 0
+        # BEGIN IMMEDIATE 先拿到写锁，其他进程的领取要等这个事务结束
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO publish_posts (post_id, user_id, summary, urls) VALUES (?, ?, ?, ?)",
+                (post_id, user_id, summary, '\n'.join(urls))
+            )
+            existing = {
+                row[0]: row[1:] for row in conn.execute(
+                    "SELECT channel_id, status, claimed_at, image, caption FROM publish_ledger WHERE post_id = ?",
+                    (post_id,)
+                )
+            }
+            for channel_id, image, caption in channels:
+                channel_id = str(channel_id)
+                if channel_id in claimed:
+                    continue
+                claimed.add(channel_id)
+                row = existing.get(channel_id)
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO publish_ledger (post_id, channel_id, image, caption, status, claimed_at, "
+                        "updated_at, notify_chat_id, notify_message_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (post_id, channel_id, image, caption, PENDING, now, now, notify_chat_id, notify_message_id)
+                    )
+                    entries.append(LedgerEntry(post_id, channel_id, image, caption, notify_chat_id, notify_message_id))
+                    continue
+                status, claimed_at, stored_image, stored_caption = row
+                if status == SENT:
+                    sent += 1
+                elif status == PENDING and claimed_at > now - self.lease:
+                    in_progress += 1
+                else:
+                    # 失败或中断的频道按第一次领取时的内容重新发送
+                    conn.execute(
+                        "UPDATE publish_ledger SET status = ?, claimed_at = ?, updated_at = ?, notify_chat_id = ?, "
+                        "notify_message_id = ? WHERE post_id = ? AND channel_id = ?",
+                        (PENDING, now, now, notify_chat_id, notify_message_id, post_id, channel_id)
+                    )
+                    entries.append(LedgerEntry(post_id, channel_id, stored_image, stored_caption,
+                                               notify_chat_id, notify_message_id))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return ClaimResult(entries, sent, in_progress, not existing)
+
+    async def claim(self, post_id, channels, notify_chat_id=None, notify_message_id=None, user_id=None,
+                    summary=None, urls=()):
+        """
+        领取一条投稿需要发送的频道
+        channels: [(频道ID, 图片, 发送内容), ...]
+        user_id / summary / urls: 投稿人、摘要和网盘链接，第一次领取时保存，由 mark_published 返回
+        返回 ClaimResult
+        """
+        return await self._call(self._claim, post_id, list(channels), notify_chat_id, notify_message_id,
+                                user_id, summary, list(urls), time.time())
+
+    def _claim_failed(self, notify_chat_id, notify_message_id, now):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT post_id, channel_id, image, caption, status, claimed_at FROM publish_ledger "
+                "WHERE notify_chat_id = ? AND notify_message_id = ?", (notify_chat_id, notify_message_id)
+            ).fetchall()
+            failed = [row for row in rows if row[4] == FAILED]
+            conn.executemany(
+                "UPDATE publish_ledger SET status = ?, claimed_at = ?, updated_at = ? "
+                "WHERE post_id = ? AND channel_id = ?",
+                [(PENDING, now, now, row[0], row[1]) for row in failed]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        entries = [LedgerEntry(*row[:4], notify_chat_id, notify_message_id) for row in failed]
+        sent = sum(1 for row in rows if row[4] == SENT)
+        in_progress = sum(1 for row in rows if row[4] == PENDING and row[5] > now - self.lease)
+        return ClaimResult(entries, sent, in_progress, False)
+
+    async def claim_failed(self, notify_chat_id, notify_message_id):
+        """
+        重新领取通知消息对应的一次发布中失败的频道，只重发这些频道
+        返回 ClaimResult
+        """
+        return await self._call(self._claim_failed, notify_chat_id, notify_message_id, time.time())
+
+    def _claim_stale(self, stale_after, now):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT post_id, channel_id, image, caption, notify_chat_id, notify_message_id FROM publish_ledger "
+                "WHERE status = ? AND claimed_at <= ?", (PENDING, now - stale_after)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE publish_ledger SET claimed_at = ?, updated_at = ? WHERE post_id = ? AND channel_id = ?",
+                [(now, now, row[0], row[1]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [LedgerEntry(*row) for row in rows]
+
+    async def claim_stale(self, stale_after=None):
+        """
+        领取超过 stale_after 秒（默认为租约时间）仍未完成的 pending 行，用于重启后继续发送
+        """
+        return await self._call(self._claim_stale, self.lease if stale_after is None else stale_after, time.time())
+
+    def _finish(self, post_id, channel_id, status, message_id, now):
+        self._conn.execute(
+            "UPDATE publish_ledger SET status = ?, message_id = ?, updated_at = ? WHERE post_id = ? AND channel_id = ?",
+            (status, message_id, now, post_id, str(channel_id))
+        )
+
+    async def mark_sent(self, post_id, channel_id, message_id):
+        await self._call(self._finish, post_id, channel_id, SENT, message_id, time.time())
+
+    async def mark_failed(self, post_id, channel_id):
+        await self._call(self._finish, post_id, channel_id, FAILED, None, time.time())
+
+    def _mark_published(self, post_ids):
+        conn = self._conn
+        published = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for post_id in post_ids:
+                row = conn.execute(
+                    "SELECT user_id, summary, urls FROM publish_posts WHERE post_id = ? AND published = 0", (post_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                conn.execute("UPDATE publish_posts SET published = 1 WHERE post_id = ?", (post_id,))
+                user_id, summary, urls = row
+                published.append(PublishedPost(post_id, user_id, summary, urls.split('\n') if urls else []))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return published
+
+    async def mark_published(self, post_ids):
+        """
+        标记投稿已经有频道发送成功，返回其中第一次被标记的 PublishedPost
+        """
+        return await self._call(self._mark_published, list(post_ids))
+
+    def _known(self, post_ids):
+        known = set()
+        for post_id in post_ids:
+            if self._conn.execute("SELECT 1 FROM publish_ledger WHERE post_id = ? LIMIT 1", (post_id,)).fetchone():
+                known.add(post_id)
+        return known
+
+    async def known(self, post_ids):
+        """
+        返回已经有发布记录的投稿 ID
+        """
+        return await self._call(self._known, list(post_ids))
+
+    def _message_ids(self, post_id):
+        return dict(self._conn.execute(
+            "SELECT channel_id, message_id FROM publish_ledger WHERE post_id = ? AND status = ?", (post_id, SENT)
+        ).fetchall())
+
+    async def message_ids(self, post_id):
+        """
+        返回 {频道ID: message_id}，只包含已发送的频道
+        """
+        return await self._call(self._message_ids, post_id)
+
+    async def close(self):
+        if self._conn is None:
+            return
+        await self._run(self._conn.close)
+        self._conn = None
@@ -0,0 +1,297 @@
+"""
+后台发布队列
+
+确认发布时每个 (投稿, 频道) 生成一个 PublishJob 放入队列，由固定数量的 worker 发送。
+遇到限流或网络错误时按指数退避（带随机抖动）重新入队，worker 不会因此等待；
+重试次数用完或遇到不可重试的错误时放入死信列表。
+同一次确认产生的所有任务属于一个 PublishBatch，全部结束后回调通知发起人。
+配置了 RateLimiter 时，发送前先预约令牌，令牌不足的任务延后入队，不占用 worker。
+配置了 BotPool 时，频道消息由池中为该频道选出的机器人发送，使用该机器人自己的 RateLimiter；
+池中的机器人被限流、token 失效或没有频道权限时换下一个机器人，都不可用时退回到发起确认的机器人。
+配置了 PublishLedger 时，任务结束后把结果（成功时包括频道中的 message_id）写入发布台账。
+"""
+import asyncio
+import contextvars
+import logging
+import random
+import time
+from collections import deque
+
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter, TimedOut
+
+from log_pipeline import current_log_context, log_context
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+SEND_LATENCY = Histogram('bot_send_photo_seconds', 'send_photo latency per channel', ('channel',))
+SEND_RESULTS = Counter('bot_send_photo_results', 'send_photo outcomes per channel', ('channel', 'outcome'))
+RETRY_AFTER_WAITS = Counter('bot_retry_after_waits', 'RetryAfter responses per channel', ('channel',))
+RETRY_AFTER_SECONDS = Counter('bot_retry_after_sleep_seconds', 'Seconds waited because of RetryAfter', ('channel',))
+
+
+class PublishJob:
+    """
+    发送一张图片到一个频道
+    post_id: 投稿 ID，配置了发布台账时用于记录结果
+    message_id: 发送成功后频道中的消息 ID
+    """
+    __slots__ = ('batch', 'channel_id', 'image', 'caption', 'attempts', 'last_error', 'post_id', 'message_id')
+
+    def __init__(self, channel_id, image, caption, post_id=None):
+        self.batch = None
+        self.channel_id = channel_id
+        self.image = image
+        self.caption = caption
+        self.attempts = 0
+        self.last_error = None
+        self.post_id = post_id
+        self.message_id = None
+
+
+class PublishBatch:
+    """
+    一次确认发布产生的所有任务
+    on_complete: 全部任务结束后调用的协程函数，参数为本批次
+    done: 全部任务结束时设置；reported: on_complete 执行完（或没有 on_complete）时设置
+    """
+
+    def __init__(self, bot, jobs, on_complete=None):
+        self.bot = bot
+        self.jobs = jobs
+        self.on_complete = on_complete
+        self.success_count = 0
+        self.fail_count = 0
+        self.done = asyncio.Event()
+        self.reported = asyncio.Event()
+        # 发起确认的 update_id / user_id，worker 记录日志时使用
+        self.log_context = current_log_context()
+        for job in jobs:
+            job.batch = self
+
+    @property
+    def finished(self):
+        return self.success_count + self.fail_count >= len(self.jobs)
+
+
+class Publisher:
+    """
+    发布队列和 worker 池
+    workers: 同时发送的 worker 数量
+    max_attempts: 每个任务最多尝试次数
+    base_delay / max_delay: 指数退避的初始和最大等待时间（秒）
+    rate_limiter: 可选的 RateLimiter，用于主动控制发送速率
+    ledger: 可选的 PublishLedger，记录带 post_id 的任务的发送结果
+    bot_pool: 可选的 BotPool，频道消息分摊到池中的多个机器人发送
+    """
+
+    def __init__(self, workers=4, max_attempts=4, base_delay=1.0, max_delay=60.0, dead_letter_size=1000,
+                 rate_limiter=None, ledger=None, bot_pool=None):
+        self.rate_limiter = rate_limiter
+        self.bot_pool = bot_pool
+        self.ledger = ledger
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self._queue = None
+        self._tasks = []
+        self._retry_handles = set()
+        self._notify_tasks = set()
+
+    @property
+    def queue_size(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        loop = asyncio.get_running_loop()
+        while len(self._tasks) < self.workers:
+            # worker 不继承第一次提交时的日志上下文
+            self._tasks.append(loop.create_task(self._worker(), context=contextvars.Context()))
+
+    def submit(self, bot, jobs, on_complete=None):
+        """
+        提交一批任务，立即返回 PublishBatch
+        """
+        self._ensure_started()
+        batch = PublishBatch(bot, jobs, on_complete)
+        if not jobs:
+            self._finish(batch)
+        for job in jobs:
+            self._queue.put_nowait(job)
+        return batch
+
+    def backoff_delay(self, attempts):
+        """
+        第 attempts 次失败后的等待时间：指数增长，并在 [上限/2, 上限] 内随机抖动
+        """
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        return random.uniform(cap / 2, cap)
+
+    def _retry_later(self, job, delay):
+        loop = asyncio.get_running_loop()
+
+        def _requeue():
+            self._retry_handles.discard(handle)
+            self._queue.put_nowait(job)
+
+        handle = loop.call_later(delay, _requeue)
+        self._retry_handles.add(handle)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                with log_context(**job.batch.log_context, channel=job.channel_id):
+                    await self._process(job)
+            except Exception:
+                logger.exception("Unexpected error in publish worker")
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job):
+        bot, rate_limiter, shard = job.batch.bot, self.rate_limiter, None
+        if self.bot_pool is not None:
+            shard = self.bot_pool.select(job.channel_id)
+            if shard is not None:
+                bot, rate_limiter = shard.bot, shard.rate_limiter
+
+        if rate_limiter is not None:
+            wait = rate_limiter.reserve(job.channel_id)
+            if wait > 0:
+                self._retry_later(job, wait)
+                return
+
+        job.attempts += 1
+        channel = str(job.channel_id)
+        start = time.perf_counter()
+        try:
+            message = await bot.send_photo(chat_id=job.channel_id, photo=job.image, caption=job.caption)
+        except RetryAfter as e:
+            self._record(channel, start, 'retry_after')
+            job.last_error = e
+            if shard is not None:
+                self.bot_pool.on_retry_after(shard, job.channel_id, e.retry_after)
+            elif rate_limiter is not None:
+                rate_limiter.on_retry_after(job.channel_id, e.retry_after)
+            if shard is not None and self.bot_pool.select(job.channel_id) is not shard:
+                # 池中还有没被限流的机器人，马上换它发送
+                delay = random.uniform(0, self.base_delay)
+            else:
+                # 限流时至少等待 Telegram 要求的时间
+                delay = e.retry_after + random.uniform(0, self.base_delay)
+                RETRY_AFTER_WAITS.labels(channel).inc()
+                RETRY_AFTER_SECONDS.labels(channel).inc(delay)
+            logger.warning(f"RetryAfter {e.retry_after}s on attempt {job.attempts}, retrying in {delay:.1f}s")
+        except (Forbidden, InvalidToken) as e:
+            self._record(channel, start, 'rejected')
+            job.last_error = e
+            if shard is None:
+                # 发起确认的机器人没有频道权限或 token 失效，重试也不会成功
+                await self._dead_letter(job)
+                return
+            if isinstance(e, InvalidToken):
+                self.bot_pool.on_revoked(shard)
+            else:
+                self.bot_pool.on_forbidden(shard, job.channel_id)
+            # 换机器人重发不计入尝试次数
+            job.attempts -= 1
+            self._queue.put_nowait(job)
+            return
+        except BadRequest as e:
+            # 内容或频道本身的问题，重试也不会成功
+            self._record(channel, start, 'rejected')
+            job.last_error = e
+            await self._dead_letter(job)
+            return
+        except NetworkError as e:
+            self._record(channel, start, 'timeout' if isinstance(e, TimedOut) else 'network_error')
+            job.last_error = e
+            delay = self.backoff_delay(job.attempts)
+            logger.warning(f"{type(e).__name__} on attempt {job.attempts}, retrying in {delay:.1f}s: {e}")
+        except Exception as e:
+            self._record(channel, start, 'error')
+            job.last_error = e
+            await self._dead_letter(job)
+            return
+        else:
+            self._record(channel, start, 'success')
+            logger.debug(f"Sent post on attempt {job.attempts}")
+            if shard is not None:
+                self.bot_pool.on_success(shard, job.channel_id)
+            elif rate_limiter is not None:
+                rate_limiter.on_success(job.channel_id)
+            job.message_id = message.message_id
+            await self._record_result(job)
+            job.batch.success_count += 1
+            self._check_finished(job.batch)
+            return
+
+        if job.attempts >= self.max_attempts:
+            await self._dead_letter(job)
+        else:
+            self._retry_later(job, delay)
+
+    @staticmethod
+    def _record(channel, start, outcome):
+        SEND_LATENCY.labels(channel).observe(time.perf_counter() - start)
+        SEND_RESULTS.labels(channel, outcome).inc()
+
+    async def _record_result(self, job):
+        if self.ledger is None or job.post_id is None:
+            return
+        try:
+            if job.message_id is not None:
+                await self.ledger.mark_sent(job.post_id, job.channel_id, job.message_id)
+            else:
+                await self.ledger.mark_failed(job.post_id, job.channel_id)
+        except Exception as e:
+            # 台账写入失败时该频道保持 pending，租约过期后会被重新领取
+            logger.error(f"Error while recording publish result in ledger: {e}")
+
+    async def _dead_letter(self, job):
+        logger.error(f"Error while sending post to channel {job.channel_id} "
+                     f"after {job.attempts} attempts: {type(job.last_error).__name__}: {job.last_error}",
+                     exc_info=job.last_error)
+        await self._record_result(job)
+        self.dead_letters.append(job)
+        job.batch.fail_count += 1
+        self._check_finished(job.batch)
+
+    def _check_finished(self, batch):
+        if batch.finished:
+            self._finish(batch)
+
+    def _finish(self, batch):
+        batch.done.set()
+        if batch.on_complete is None:
+            batch.reported.set()
+        else:
+            task = asyncio.get_running_loop().create_task(self._notify(batch))
+            self._notify_tasks.add(task)
+            task.add_done_callback(self._notify_tasks.discard)
+
+    async def _notify(self, batch):
+        try:
+            with log_context(**batch.log_context):
+                await batch.on_complete(batch)
+        except Exception as e:
+            logger.error(f"Error while reporting publish result: {e}")
+        finally:
+            batch.reported.set()
+
+    async def stop(self):
+        """
+        停止所有 worker，未完成的任务会被丢弃
+        """
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
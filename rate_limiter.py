@@ -0,0 +1,122 @@
+"""
+Bot API 发送限速
+
+Telegram 对同一个机器人的限制大致为：全局每秒约 30 条，同一个群组/频道每分钟约 20 条。
+RateLimiter 为全局和每个频道各维护一个令牌桶，发送前先预约令牌，
+令牌不足时返回需要等待的秒数，由调用方决定何时重试，从而尽量避免触发 RetryAfter。
+
+收到 RetryAfter 时对应频道暂停 retry_after 秒，并把速率减半；之后每次成功发送逐步恢复。
+"""
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶
+    rate: 每秒补充的令牌数
+    capacity: 桶容量（允许的突发数量）
+    """
+    __slots__ = ('rate', 'max_rate', 'capacity', 'tokens', 'updated', 'paused_until')
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.max_rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now):
+        """
+        距离可以取出一个令牌还需要等待的秒数
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, seconds, now):
+        """
+        暂停 seconds 秒并清空令牌，速率减半
+        """
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0
+        self.updated = self.paused_until
+        self.rate = max(self.max_rate / 8, self.rate / 2)
+
+    def recover(self, step):
+        """
+        成功发送后按 step 比例恢复速率
+        """
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * step)
+
+
+class RateLimiter:
+    """
+    全局令牌桶 + 每个频道一个令牌桶
+    global_rate: 全局每秒条数
+    chat_rate: 每个频道每秒条数
+    chat_burst: 每个频道允许的突发条数
+    """
+
+    def __init__(self, global_rate=30.0, chat_rate=20 / 60, chat_burst=3, recovery_step=0.1):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.recovery_step = recovery_step
+        self._global = TokenBucket(global_rate, max(1.0, global_rate))
+        self._chats = {}
+
+    def _bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def reserve(self, chat_id, now=None):
+        """
+        尝试为 chat_id 预约一次发送
+        返回 0 表示已取得令牌可以立即发送，否则返回需要等待的秒数（此时不消耗令牌）
+        """
+        now = time.monotonic() if now is None else now
+        bucket = self._bucket(chat_id)
+        wait = max(bucket.wait_time(now), self._global.wait_time(now))
+        if wait > 0:
+            return wait
+        bucket.take(now)
+        self._global.take(now)
+        return 0.0
+
+    def on_success(self, chat_id):
+        self._bucket(chat_id).recover(self.recovery_step)
+
+    def on_retry_after(self, chat_id, retry_after, now=None):
+        """
+        根据 Telegram 返回的 retry_after 调整该频道的令牌桶
+        """
+        now = time.monotonic() if now is None else now
+        self._bucket(chat_id).pause(retry_after, now)
+
+    def paused(self, chat_id, now=None):
+        """
+        该频道是否因为 RetryAfter 处于暂停中
+        """
+        now = time.monotonic() if now is None else now
+        return self._bucket(chat_id).paused_until > now
+
+    def chat_rate_of(self, chat_id):
+        """
+        当前该频道的发送速率（条/秒）
+        """
+        return self._bucket(chat_id).rate
@@ -0,0 +1,128 @@
+"""
+频道路由
+
+路由配置（JSON 文件，所有键都可省略，省略时使用默认值）：
+    {
+        "summary_channels": ["@频道1", "@频道2"],     # 所有投稿都发送的汇总/备用频道
+        "summary_footer": "...",                      # 汇总频道内容的页脚
+        "provider_channels": {"quark": "@频道", ...}, # 各网盘的专门频道
+        "provider_footer": "...",                     # 专门频道内容的页脚
+        "provider_footers": {"quark": "..."}          # 单个网盘的页脚，覆盖 provider_footer
+    }
+
+加载时生成不可变的 RoutingTable，网盘类型组合的目标频道在第一次用到时计算并缓存（有上限的 LRU），
+组合数量随网盘类型指数增长，不预先全部计算；
+重新加载时整体替换引用，正在进行的发布继续使用旧表，不会看到一半新一半旧的配置。
+"""
+import json
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple
+
+# 每个 RoutingTable 缓存的网盘类型组合数量
+ROUTE_CACHE_SIZE = 256
+
+
+class Route(NamedTuple):
+    """
+    一个目标频道
+    provider: 专门频道对应的网盘类型，汇总频道为 None
+    """
+    channel_id: str
+    provider: object
+    footer: str
+
+
+class RoutingTable:
+    """
+    路由表，创建后不再修改
+    """
+    __slots__ = ('summary_routes', 'provider_routes', '_resolve', '_channels_by_provider')
+
+    def __init__(self, summary_channels, summary_footer, provider_channels, provider_footer, provider_footers=None):
+        provider_footers = provider_footers or {}
+        self.summary_routes = tuple(Route(channel_id, None, summary_footer) for channel_id in summary_channels)
+        self.provider_routes = MappingProxyType({
+            provider: Route(channel_id, provider, provider_footers.get(provider, provider_footer))
+            for provider, channel_id in provider_channels.items()
+        })
+
+        # 网盘类型组合 -> (所有 Route, 所有频道 ID)
+        self._resolve = lru_cache(maxsize=ROUTE_CACHE_SIZE)(self._routes_for_types)
+
+        # 单个链接的目标频道
+        summary_ids = tuple(route.channel_id for route in self.summary_routes)
+        channels_by_provider = {None: summary_ids}
+        for provider, route in self.provider_routes.items():
+            channels_by_provider[provider] = summary_ids + (route.channel_id,)
+        self._channels_by_provider = MappingProxyType(channels_by_provider)
+
+    def _routes_for_types(self, types):
+        # 按 provider_channels 的顺序排列，没有配置专门频道的网盘忽略
+        routes = self.summary_routes + tuple(
+            route for provider, route in self.provider_routes.items() if provider in types
+        )
+        return routes, tuple(route.channel_id for route in routes)
+
+    def routes_for(self, link_types):
+        """
+        一组网盘类型对应的所有 Route
+        """
+        return self._resolve(frozenset(link_types))[0]
+
+    def channels_for(self, link_types):
+        """
+        一组网盘类型对应的所有频道 ID
+        """
+        return self._resolve(frozenset(link_types))[1]
+
+    def channels_for_provider(self, provider):
+        """
+        单个链接对应的频道 ID
+        """
+        return self._channels_by_provider.get(provider, self._channels_by_provider[None])
+
+
+def build_routing(config, defaults):
+    """
+    用配置覆盖默认值生成 RoutingTable，配置有误时抛出 ValueError
+    """
+    merged = {**defaults, **config}
+    unknown = set(config) - set(defaults)
+    if unknown:
+        raise ValueError(f"未知的路由配置项: {', '.join(sorted(unknown))}")
+    summary_channels = merged['summary_channels']
+    provider_channels = merged['provider_channels']
+    if not isinstance(summary_channels, list) or not all(isinstance(c, str) for c in summary_channels):
+        raise ValueError("summary_channels 应为频道 ID 列表")
+    if not isinstance(provider_channels, dict) or not all(isinstance(c, str) for c in provider_channels.values()):
+        raise ValueError("provider_channels 应为 {网盘类型: 频道 ID}")
+    for name in ('summary_footer', 'provider_footer'):
+        if not isinstance(merged[name], str):
+            raise ValueError(f"{name} 应为字符串")
+    provider_footers = merged.get('provider_footers') or {}
+    if not isinstance(provider_footers, dict) or not all(isinstance(f, str) for f in provider_footers.values()):
+        raise ValueError("provider_footers 应为 {网盘类型: 页脚}")
+    return RoutingTable(
+        summary_channels,
+        merged['summary_footer'],
+        provider_channels,
+        merged['provider_footer'],
+        provider_footers
+    )
+
+
+def load_routing(path, defaults):
+    """
+    读取路由配置文件，path 为空时只使用默认值
+    """
+    if not path:
+        return build_routing({}, defaults)
+    try:
+        with open(path, encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"读取路由配置文件失败 {path}: {e}") from e
+    if not isinstance(config, dict):
+        raise ValueError("路由配置应为 JSON 对象")
+    return build_routing(config, defaults)
@@ -0,0 +1,229 @@
+"""
+用户数据存储
+
+提供统一的异步接口（get / set / delete / count），后端可选:
+  - memory: 进程内字典，用于测试
+  - sqlite: SQLite（WAL 模式），重启后数据不丢失
+
+SQLite 后端对每个命名空间维护一个有上限的 LRU 写穿缓存；写入先进入待写队列，
+由后台任务批量提交，所有数据库操作都在单独的线程中执行，不阻塞事件循环。
+每个命名空间可以指定编解码函数 (encode, decode)，缓存中保存解码后的对象，
+只有写入和缓存未命中时才做转换。
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 缓存中表示"已确认不存在"的标记
+_ABSENT = object()
+
+
+class MemoryStore:
+    """
+    基于字典的存储，不做持久化
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    async def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    async def set(self, key, value):
+        self._data[key] = value
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+    async def count(self):
+        return len(self._data)
+
+
+class SqliteStore:
+    """
+    SQLite 后端中的一个命名空间（如 user_posts、user_states）
+    """
+
+    def __init__(self, backend, namespace, cache_size, codec=None):
+        self._backend = backend
+        self._namespace = namespace
+        self._encode, self._decode = codec or (None, None)
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _remember(self, key, value):
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    async def get(self, key, default=None):
+        key = str(key)
+        value = self._cache.get(key)
+        if value is None:
+            value = await self._backend.load(self._namespace, key)
+            if value is not _ABSENT and self._decode is not None:
+                value = self._decode(value)
+        else:
+            self._cache.move_to_end(key)
+        self._remember(key, value)
+        return default if value is _ABSENT else value
+
+    async def set(self, key, value):
+        key = str(key)
+        self._remember(key, value)
+        data = self._encode(value) if self._encode is not None else value
+        self._backend.schedule_write(self._namespace, key, json.dumps(data, ensure_ascii=False))
+
+    async def delete(self, key):
+        key = str(key)
+        self._remember(key, _ABSENT)
+        self._backend.schedule_write(self._namespace, key, None)
+
+    async def count(self):
+        return await self._backend.count(self._namespace)
+
+
+class SqliteBackend:
+    """
+    一个 SQLite 数据库文件，多个命名空间共用
+    flush_interval: 待写数据最长等待多久提交（秒）
+    batch_size: 待写数据达到该数量时立即提交
+    """
+
+    def __init__(self, path, flush_interval=0.5, batch_size=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        # 单线程执行器保证所有数据库操作串行，读操作总能看到之前提交的写入
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        self._conn = None
+        self._pending = {}
+        self._flush_event = None
+        self._flush_task = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def namespace(self, name, cache_size=1024, codec=None):
+        return SqliteStore(self, name, cache_size, codec)
+
+    def _load(self, namespace, key):
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else _ABSENT
+
+    async def load(self, namespace, key):
+        # 还没提交的写入优先
+        pending = self._pending.get((namespace, key), _ABSENT)
+        if pending is not _ABSENT:
+            return _ABSENT if pending is None else json.loads(pending)
+        return await self._run(self._load, namespace, key)
+
+    def schedule_write(self, namespace, key, value):
+        """
+        登记一次写入，value 为 None 表示删除
+        """
+        self._pending[(namespace, key)] = value
+        self._ensure_flusher()
+        if len(self._pending) >= self.batch_size:
+            self._flush_event.set()
+
+    def _ensure_flusher(self):
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_event = asyncio.Event()
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error while flushing storage: {e}")
+
+    def _write(self, batch):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO kv (namespace, key, value) VALUES (?, ?, ?)",
+                [(namespace, key, value) for (namespace, key), value in batch.items() if value is not None]
+            )
+            conn.executemany(
+                "DELETE FROM kv WHERE namespace = ? AND key = ?",
+                [(namespace, key) for (namespace, key), value in batch.items() if value is None]
+            )
+
+    async def flush(self):
+        """
+        提交所有待写数据
+        """
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await self._run(self._write, batch)
+        except Exception:
+            # 提交失败时把数据放回队列，之后的写入优先
+            batch.update(self._pending)
+            self._pending = batch
+            raise
+
+    def _count(self, namespace):
+        return self._connect().execute("SELECT COUNT(*) FROM kv WHERE namespace = ?", (namespace,)).fetchone()[0]
+
+    async def count(self, namespace):
+        await self.flush()
+        return await self._run(self._count, namespace)
+
+    async def close(self):
+        """
+        提交剩余数据并关闭数据库
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+
+def open_stores(backend, path, namespaces, codecs=None):
+    """
+    按配置创建存储
+    backend: "sqlite" 或 "memory"
+    codecs: {命名空间: (encode, decode)}，未指定的命名空间直接按 JSON 保存
+    返回 (backend 对象或 None, {命名空间: store})
+    """
+    if backend == "memory":
+        return None, {name: MemoryStore() for name in namespaces}
+    if backend != "sqlite":
+        raise ValueError(f"未知的存储后端: {backend}")
+    codecs = codecs or {}
+    sqlite_backend = SqliteBackend(path)
+    return sqlite_backend, {name: sqlite_backend.namespace(name, codec=codecs.get(name)) for name in namespaces}
@@ -0,0 +1,65 @@
+from bot_pool import BotPool
+from rate_limiter import RateLimiter
+
+
+def make_pool(tokens):
+    return BotPool(tokens, make_bot=lambda token: f"bot-{token}", make_rate_limiter=RateLimiter)
+
+
+TOKENS = [f"{100 + i}:secret" for i in range(5)]
+CHANNELS = [f"@channel{i}" for i in range(200)]
+
+
+def test_ranking_is_stable():
+    first = make_pool(TOKENS)
+    second = make_pool(list(reversed(TOKENS)))
+    for channel in CHANNELS:
+        assert [shard.name for shard in first.ranked(channel)] == [shard.name for shard in second.ranked(channel)]
+
+
+def test_adding_a_bot_moves_few_channels():
+    before = make_pool(TOKENS)
+    after = make_pool(TOKENS + ["200:secret"])
+    moved = [channel for channel in CHANNELS
+             if before.select(channel).name != after.select(channel).name]
+    # 只有改由新机器人发送的频道换了机器人
+    assert all(after.select(channel).name == "200" for channel in moved)
+    assert len(moved) < len(CHANNELS) / 2
+
+
+def test_channels_spread_across_bots():
+    pool = make_pool(TOKENS)
+    used = {pool.select(channel).name for channel in CHANNELS}
+    assert used == {token.split(':')[0] for token in TOKENS}
+
+
+def test_failover_on_retry_after_forbidden_and_revoked():
+    pool = make_pool(TOKENS[:3])
+    channel = "@channel0"
+    first, second, third = pool.ranked(channel)
+
+    pool.on_retry_after(first, channel, 30)
+    assert pool.select(channel) is second
+    # 其他频道不受影响
+    other = next(c for c in CHANNELS if pool.ranked(c)[0] is first and c != channel)
+    assert pool.select(other) is first
+
+    pool.on_forbidden(second, channel)
+    assert pool.select(channel) is third
+
+    pool.on_revoked(third)
+    # 剩下的只有被限流的机器人，仍然选它
+    assert pool.select(channel) is first
+    assert pool.select(other) is first
+
+    pool.on_revoked(first)
+    assert pool.select(channel) is None
+
+
+def test_duplicate_tokens_and_lazy_bots():
+    pool = make_pool(TOKENS[:2] + TOKENS[:1])
+    assert len(pool) == 2
+    shard = pool.shards[0]
+    assert shard._bot is None
+    assert shard.bot == f"bot-{TOKENS[0]}"
+    assert shard.name == "100"
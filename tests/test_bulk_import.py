@@ -0,0 +1,53 @@
+import asyncio
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from bulk_import import run_import
+
+
+def make_file(rows):
+    return io.StringIO(''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows))
+
+
+ROWS = [
+    {'name': 'a', 'description': 'd', 'links': 'https://pan.quark.cn/s/1', 'cover': 'c'},
+    {'name': 'b', 'description': 'd', 'links': 'https://pan.quark.cn/s/2', 'cover': 'c'},
+    {'name': 'c', 'description': 'd', 'links': 'https://pan.quark.cn/s/3'},
+    {'name': 'd', 'description': 'd', 'links': 'https://pan.quark.cn/s/4', 'cover': 'c'},
+]
+
+
+def test_check_can_reject_or_annotate_rows():
+    accepted = []
+    checked = []
+
+    async def check(line_no, row, result):
+        checked.append(line_no)
+        if row['name'] == 'b':
+            raise ValueError("重复")
+        return "提示" if row['name'] == 'd' else None
+
+    async def on_accepted(line_no, row, result):
+        accepted.append((line_no, result))
+
+    async def scenario():
+        output = io.StringIO()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            summary = await run_import(make_file(ROWS), 'jsonl', lambda row: row['links'], on_accepted,
+                                       csv.writer(output), executor, chunk_size=2, check=check)
+        return summary, list(csv.reader(io.StringIO(output.getvalue())))
+
+    summary, report = asyncio.run(scenario())
+    assert str(summary) == "共4行，通过2行，拒绝2行"
+    # 格式错误的行不经过 check，其余按行号顺序检查
+    assert checked == [1, 2, 4]
+    assert accepted == [(1, ['https://pan.quark.cn/s/1']), (4, ['https://pan.quark.cn/s/4'])]
+    assert report == [
+        ['row', 'status', 'name', 'detail'],
+        ['1', 'accepted', 'a', ''],
+        ['2', 'rejected', 'b', '重复'],
+        ['3', 'rejected', '', '缺少字段: cover'],
+        ['4', 'accepted', 'd', '提示'],
+    ]
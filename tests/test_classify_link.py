@@ -0,0 +1,25 @@
+from new_contribute import classify_link
+
+
+def test_strips_pwd_and_tracking_params():
+    link = classify_link("链接：https://pan.quark.cn/s/abc/?pwd=1234&utm_source=x&from=share#top")
+    assert link.provider == "quark"
+    assert link.url == "https://pan.quark.cn/s/abc"
+    assert link.pwd == "1234"
+
+
+def test_keeps_identifying_params():
+    first = classify_link("https://pan.baidu.com/share/init?surl=AAAA&pwd=1111")
+    second = classify_link("https://pan.baidu.com/share/init?surl=BBBB")
+    assert first.url == "https://pan.baidu.com/share/init?surl=AAAA"
+    assert first.pwd == "1111"
+    assert first.url != second.url
+
+
+def test_param_order_does_not_matter():
+    assert (classify_link("https://pan.baidu.com/share/init?b=2&surl=A").url
+            == classify_link("https://pan.baidu.com/share/init?surl=A&b=2").url)
+
+
+def test_unknown_host():
+    assert classify_link("https://example.com/s/abc").provider is None
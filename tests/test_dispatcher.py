@@ -0,0 +1,114 @@
+import asyncio
+
+from telegram import Update
+
+from dispatcher import PerUserUpdateProcessor
+
+
+def make_update(update_id, user_id):
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+            "text": str(update_id),
+        },
+    }, None)
+
+
+async def record(log, name, delay=0.0):
+    log.append(f"{name} start")
+    await asyncio.sleep(delay)
+    log.append(f"{name} end")
+
+
+def test_same_user_in_order_other_users_concurrent():
+    async def scenario():
+        processor = PerUserUpdateProcessor(8)
+        log = []
+        await asyncio.gather(
+            processor.process_update(make_update(1, 1), record(log, "a1", 0.02)),
+            processor.process_update(make_update(2, 1), record(log, "a2")),
+            processor.process_update(make_update(3, 2), record(log, "b1")),
+            processor.process_update(make_update(4, 1), record(log, "a3")),
+        )
+        user_a = [entry for entry in log if entry.startswith("a")]
+        assert user_a == ["a1 start", "a1 end", "a2 start", "a2 end", "a3 start", "a3 end"]
+        # 另一个用户不用等 a1 处理完
+        assert log.index("b1 end") < log.index("a1 end")
+        assert processor.active_users == 0
+
+    asyncio.run(scenario())
+
+
+def test_error_does_not_block_later_updates():
+    async def scenario():
+        processor = PerUserUpdateProcessor(8)
+        log = []
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        await asyncio.gather(
+            processor.process_update(make_update(1, 1), fail()),
+            processor.process_update(make_update(2, 1), record(log, "a2")),
+        )
+        assert log == ["a2 start", "a2 end"]
+
+    asyncio.run(scenario())
+
+
+def test_queue_removed_and_waiters_cancelled_on_cancel():
+    async def scenario():
+        processor = PerUserUpdateProcessor(8)
+        log = []
+        head = asyncio.create_task(processor.process_update(make_update(1, 1), record(log, "a1", 10)))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(processor.process_update_and_wait(make_update(2, 1), record(log, "a2")))
+        await asyncio.sleep(0)
+        assert processor.active_users == 1
+
+        head.cancel()
+        await asyncio.gather(head, waiter, return_exceptions=True)
+        assert waiter.cancelled()
+        assert processor.active_users == 0
+        assert "a2 start" not in log
+
+    asyncio.run(scenario())
+
+
+def test_wait_respects_concurrency_limit():
+    async def scenario():
+        processor = PerUserUpdateProcessor(2)
+        running = 0
+        peak = 0
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        await asyncio.gather(*(
+            processor.process_update_and_wait(make_update(user_id, user_id), work()) for user_id in range(6)
+        ))
+        assert peak == 2
+
+    asyncio.run(scenario())
+
+
+def test_wait_returns_after_own_update():
+    async def scenario():
+        processor = PerUserUpdateProcessor(1)
+        log = []
+        first = asyncio.create_task(processor.process_update_and_wait(make_update(1, 1), record(log, "a1", 0.02)))
+        await asyncio.sleep(0)
+        await processor.process_update_and_wait(make_update(2, 1), record(log, "a2"))
+        # 排在后面的请求返回时自己的 update 已经处理完
+        assert log == ["a1 start", "a1 end", "a2 start", "a2 end"]
+        await first
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from telegram.request import HTTPXRequest
+
+from health import HealthCheck, PollingMonitor
+
+
+def status(check):
+    async def scenario():
+        return [await handler({}, b'') for handler in (check.healthz, check.readyz)]
+
+    (live_code, _, live_body), (ready_code, content_type, ready_body) = asyncio.run(scenario())
+    assert content_type == 'application/json'
+    return live_code, ready_code, json.loads(ready_body)['problems']
+
+
+def make_check(monkeypatch, code=200):
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        return code, b'{"ok":true,"result":[]}'
+
+    monkeypatch.setattr(HTTPXRequest, 'do_request', do_request)
+    publisher = SimpleNamespace(queue_size=0)
+    application = SimpleNamespace(running=True, updater=SimpleNamespace(running=True))
+    check = HealthCheck(publisher, max_queue_depth=10, poll_stale_after=30)
+    monitor = PollingMonitor()
+    check.attach(application, monitor)
+    return check, publisher, application, monitor
+
+
+def test_webhook_mode_only_checks_queue():
+    publisher = SimpleNamespace(queue_size=0)
+    check = HealthCheck(publisher, max_queue_depth=10)
+    assert status(check) == (200, 200, [])
+    publisher.queue_size = 11
+    assert status(check) == (200, 503, ["publish queue depth 11 > 10"])
+
+
+def test_polling_dependencies(monkeypatch):
+    check, publisher, application, monitor = make_check(monkeypatch)
+    # 刚启动还没有 getUpdates 时按启动时间计算
+    assert status(check) == (200, 200, [])
+
+    publisher.queue_size = 11
+    assert status(check) == (200, 503, ["publish queue depth 11 > 10"])
+    publisher.queue_size = 10
+    assert status(check) == (200, 200, [])
+
+    application.updater.running = False
+    assert status(check) == (200, 503, ["polling stopped"])
+    application.running = False
+    assert status(check) == (200, 503, ["application not running"])
+    application.running = application.updater.running = True
+    application.updater = None
+    assert status(check) == (200, 200, [])
+
+
+def test_stale_polling_fails_both(monkeypatch):
+    check, publisher, application, monitor = make_check(monkeypatch)
+    check._attached_at = time.monotonic() - 45
+    live, ready, problems = status(check)
+    assert (live, ready) == (503, 503) and problems[0].startswith("no successful getUpdates for 4")
+
+    # 成功的 getUpdates 恢复存活
+    asyncio.run(monitor.do_request("https://api.telegram.org/bot1:x/getUpdates", 'POST'))
+    assert status(check) == (200, 200, [])
+
+    monitor.last_success = time.monotonic() - 45
+    assert status(check)[:2] == (503, 503)
+
+
+def test_failed_get_updates_are_not_success(monkeypatch):
+    check, publisher, application, monitor = make_check(monkeypatch, code=502)
+    check._attached_at = time.monotonic() - 45
+    asyncio.run(monitor.do_request("https://api.telegram.org/bot1:x/getUpdates", 'POST'))
+    assert monitor.last_success is None
+    assert status(check)[:2] == (503, 503)
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from keyword_filter import AD_KEYWORDS, COPYRIGHT, DEFAULT_KEYWORDS, KeywordMatch, KeywordMatcher, load_keywords
+
+
+def test_overlapping_and_nested_keywords():
+    matcher = KeywordMatcher({'a': ['he', 'she', 'his', 'hers'], 'b': ['ers']})
+    matches = list(matcher.iter_matches("ushers"))
+    # 按结束位置排列，同一位置较长的先返回
+    assert matches == [
+        KeywordMatch('she', 'a', 1, 4),
+        KeywordMatch('he', 'a', 2, 4),
+        KeywordMatch('hers', 'a', 2, 6),
+        KeywordMatch('ers', 'b', 3, 6),
+    ]
+    for match in matches:
+        assert "ushers"[match.start:match.end] == match.keyword
+
+
+def test_chinese_nested_keywords_and_categories():
+    matcher = KeywordMatcher({COPYRIGHT: ['版权', '版权反馈'], AD_KEYWORDS: ['反馈']})
+    text = "版权反馈请联系"
+    assert [match.keyword for match in matcher.iter_matches(text)] == ['版权', '版权反馈', '反馈']
+    assert matcher.find_first(text, {AD_KEYWORDS}) == KeywordMatch('反馈', AD_KEYWORDS, 2, 4)
+    assert matcher.find_first("没有命中") is None
+
+
+def test_duplicates_and_empty_words_ignored():
+    matcher = KeywordMatcher({'a': ['x', 'x', ''], 'b': ['x']})
+    assert matcher.size == 2
+    assert [match.category for match in matcher.iter_matches("x")] == ['a', 'b']
+
+
+def test_load_keywords_merges_with_defaults(tmp_path):
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps({AD_KEYWORDS: [' 加微信 ', ' '], 'custom': ['abc']}), encoding='utf-8')
+    keywords = load_keywords(str(path))
+    assert keywords[AD_KEYWORDS] == DEFAULT_KEYWORDS[AD_KEYWORDS] + ['加微信']
+    assert keywords['custom'] == ['abc']
+    assert load_keywords(str(tmp_path / "missing.json")) == load_keywords()
+
+
+@pytest.mark.parametrize('config', [
+    ['兼职'],
+    {AD_KEYWORDS: '兼职'},
+    {AD_KEYWORDS: ['兼职', 1]},
+    {AD_KEYWORDS: None},
+])
+def test_load_keywords_rejects_bad_types(tmp_path, config):
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps(config), encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_keywords(str(path))
+
+
+def test_load_keywords_rejects_invalid_json(tmp_path):
+    path = tmp_path / "keywords.json"
+    path.write_text("{", encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_keywords(str(path))
+
+
+def test_asgi_startup_fails_on_bad_keywords(tmp_path, monkeypatch):
+    import asyncio
+
+    import new_contribute
+
+    path = tmp_path / "keywords.json"
+    path.write_text(json.dumps({AD_KEYWORDS: '兼职'}), encoding='utf-8')
+    monkeypatch.setattr(new_contribute, 'KEYWORDS_FILE', str(path))
+    monkeypatch.setattr(new_contribute, 'configure_logging', lambda: None)
+    new_contribute.get_keyword_matcher.cache_clear()
+
+    async def scenario():
+        messages = [{'type': 'lifespan.startup'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        await new_contribute.app({'type': 'lifespan'}, receive, send)
+        return sent
+
+    try:
+        sent = asyncio.run(scenario())
+    finally:
+        new_contribute.get_keyword_matcher.cache_clear()
+    assert [message['type'] for message in sent] == ['lifespan.startup.failed']
+    assert '应为字符串列表' in sent[0]['message']
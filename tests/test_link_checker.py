@@ -0,0 +1,98 @@
+import asyncio
+
+from link_checker import ALIVE, DEAD, UNKNOWN, LinkChecker
+from new_contribute import classify_link
+from webserver import start_http_server
+
+
+def html(text):
+    return 200, 'text/html; charset=utf-8', f"<html><body>{text}</body></html>".encode('utf-8')
+
+
+async def start_stub(requests):
+    """
+    模拟夸克分享页：/s/alive 正常，/s/dead 带失效提示，/s/gone 返回 404，/s/slow 超过 deadline 才响应
+    """
+    async def alive(headers, body):
+        requests.append('alive')
+        await asyncio.sleep(0.05)
+        return html("文件列表")
+
+    async def dead(headers, body):
+        requests.append('dead')
+        return html("很抱歉，分享不存在")
+
+    async def gone(headers, body):
+        requests.append('gone')
+        return 404, 'text/plain; charset=utf-8', b'Not Found'
+
+    async def slow(headers, body):
+        requests.append('slow')
+        await asyncio.sleep(0.5)
+        return html("文件列表")
+
+    server = await start_http_server({
+        ('GET', '/s/alive'): alive,
+        ('GET', '/s/dead'): dead,
+        ('GET', '/s/gone'): gone,
+        ('GET', '/s/slow'): slow,
+    }, '127.0.0.1', 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    return server, f"http://{host}:{port}"
+
+
+def links(*names):
+    return [classify_link(f"https://pan.quark.cn/s/{name}") for name in names]
+
+
+def test_alive_dead_and_timeout():
+    async def scenario():
+        requests = []
+        server, base_url = await start_stub(requests)
+        checker = LinkChecker(deadline=0.2, base_urls={'quark': base_url})
+        try:
+            results = await checker.check(links('alive', 'dead', 'gone', 'slow'))
+            assert results == {
+                "https://pan.quark.cn/s/alive": ALIVE,
+                "https://pan.quark.cn/s/dead": DEAD,
+                "https://pan.quark.cn/s/gone": DEAD,
+                "https://pan.quark.cn/s/slow": UNKNOWN,
+            }
+
+            # 超时的请求在后台完成并写入缓存，下次检查直接命中
+            await asyncio.sleep(0.5)
+            assert await checker.check(links('slow')) == {"https://pan.quark.cn/s/slow": ALIVE}
+            assert requests.count('slow') == 1
+        finally:
+            await checker.close()
+            server.close()
+
+    asyncio.run(scenario())
+
+
+def test_inflight_requests_are_shared():
+    async def scenario():
+        requests = []
+        server, base_url = await start_stub(requests)
+        checker = LinkChecker(deadline=1.0, base_urls={'quark': base_url})
+        try:
+            first, second = await asyncio.gather(
+                checker.check(links('alive', 'alive')),
+                checker.check(links('alive')),
+            )
+            assert first == second == {"https://pan.quark.cn/s/alive": ALIVE}
+            assert requests == ['alive']
+        finally:
+            await checker.close()
+            server.close()
+
+    asyncio.run(scenario())
+
+
+def test_unconfigured_provider_is_skipped():
+    async def scenario():
+        checker = LinkChecker(dead_markers={})
+        assert await checker.check(links('alive')) == {}
+        await checker.close()
+
+    asyncio.run(scenario())
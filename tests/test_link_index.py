@@ -0,0 +1,57 @@
+import asyncio
+
+from link_index import LinkIndex
+
+
+def test_find_existing_after_restart(tmp_path):
+    path = str(tmp_path / "links.db")
+
+    async def scenario():
+        index = LinkIndex(path, capacity=1000)
+        await index.add(["https://pan.quark.cn/s/a", "https://pan.quark.cn/s/b"])
+        assert await index.find_existing(["https://pan.quark.cn/s/a", "https://pan.quark.cn/s/c"]) == {
+            "https://pan.quark.cn/s/a"
+        }
+        await index.close()
+
+        index = LinkIndex(path, capacity=1000)
+        assert await index.find_existing(["https://pan.quark.cn/s/b"]) == {"https://pan.quark.cn/s/b"}
+        await index.close()
+
+    asyncio.run(scenario())
+
+
+def test_shared_file_between_replicas(tmp_path):
+    path = str(tmp_path / "links.db")
+
+    async def scenario():
+        first = LinkIndex(path, capacity=1000)
+        second = LinkIndex(path, capacity=1000)
+        await first.open()
+        await second.open()
+
+        # 另一个副本写入的链接在下一次查询时可见
+        await second.add(["https://pan.quark.cn/s/from-second"])
+        assert await first.find_existing(["https://pan.quark.cn/s/from-second"]) == {
+            "https://pan.quark.cn/s/from-second"
+        }
+
+        # first 重启：快照之前其他副本写入的链接不能丢失
+        await second.add(["https://pan.quark.cn/s/before-restart"])
+        await first.add(["https://pan.quark.cn/s/from-first"])
+        await first.close()
+        await second.add(["https://pan.quark.cn/s/after-snapshot"])
+
+        first = LinkIndex(path, capacity=1000)
+        urls = [
+            "https://pan.quark.cn/s/from-second",
+            "https://pan.quark.cn/s/before-restart",
+            "https://pan.quark.cn/s/from-first",
+            "https://pan.quark.cn/s/after-snapshot",
+        ]
+        assert await first.find_existing(urls + ["https://pan.quark.cn/s/new"]) == set(urls)
+        await first.close()
+        await second.close()
+
+    asyncio.run(scenario())
+
@@ -0,0 +1,105 @@
+import json
+import logging
+import queue
+import random
+
+import pytest
+
+from log_pipeline import (
+    ContextFilter, JsonFormatter, NonBlockingQueueHandler, SamplingFilter, log_context, setup_logging,
+)
+
+
+@pytest.fixture
+def root_logger():
+    """
+    setup_logging 修改根日志记录器，测试结束后恢复
+    """
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    httpx_level = logging.getLogger('httpx').level
+    yield root
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    logging.getLogger('httpx').setLevel(httpx_level)
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_json_lines_with_context_and_exception(tmp_path, root_logger):
+    path = tmp_path / "bot.log"
+    listener = setup_logging(str(path), level="debug", debug_sample_rate=1)
+    logger = logging.getLogger("tests.pipeline")
+    with log_context(update_id=1, user_id=2):
+        logger.info("收到投稿 %s", "第一条")
+        with log_context(channel='@a'):
+            try:
+                raise RuntimeError("boom")
+            except RuntimeError:
+                logger.exception("发送失败")
+    logger.debug("后台任务")
+    listener.stop()
+
+    first, second, third = read_lines(path)
+    assert first['ts'].endswith('+00:00') and len(first['ts']) == len('2024-01-01T00:00:00.000+00:00')
+    assert {key: value for key, value in first.items() if key != 'ts'} == {
+        'level': 'INFO', 'logger': 'tests.pipeline', 'message': '收到投稿 第一条', 'update_id': 1, 'user_id': 2,
+    }
+    assert (second['level'], second['channel'], second['user_id']) == ('ERROR', '@a', 2)
+    assert second['exc'].startswith('Traceback') and 'RuntimeError: boom' in second['exc']
+    # 上下文之外的记录不带上下文字段
+    assert set(third) == {'ts', 'level', 'logger', 'message'}
+    # 中文不转义，每条记录一行
+    assert '收到投稿' in path.read_text(encoding='utf-8')
+
+
+def test_level_and_rotation_options(tmp_path, root_logger):
+    path = tmp_path / "bot.log"
+    listener = setup_logging(str(path), level="WARNING", rotation='time')
+    logging.getLogger("tests.pipeline").info("dropped by level")
+    logging.getLogger("tests.pipeline").warning("kept")
+    listener.stop()
+    assert [line['message'] for line in read_lines(path)] == ['kept']
+    assert logging.getLogger('httpx').level == logging.WARNING
+
+    with pytest.raises(ValueError):
+        setup_logging(str(path), rotation='weekly')
+
+
+def test_stop_flushes_queued_records(tmp_path, root_logger):
+    path = tmp_path / "bot.log"
+    listener = setup_logging(str(path))
+    logger = logging.getLogger("tests.pipeline")
+    for i in range(2000):
+        logger.info("record %d", i)
+    listener.stop()
+    assert [line['message'] for line in read_lines(path)] == [f"record {i}" for i in range(2000)]
+
+
+def test_debug_sampling_rate():
+    sampling = SamplingFilter(0.25)
+    random.seed(1)
+    debug = logging.LogRecord("t", logging.DEBUG, __file__, 1, "debug", None, None)
+    kept = sum(sampling.filter(debug) for _ in range(10000))
+    assert 2200 < kept < 2800
+
+    info = logging.LogRecord("t", logging.INFO, __file__, 1, "info", None, None)
+    assert all(sampling.filter(info) for _ in range(100))
+    assert all(SamplingFilter(1).filter(debug) for _ in range(100))
+    assert not any(SamplingFilter(0).filter(debug) for _ in range(100))
+
+
+def test_full_queue_drops_records():
+    handler = NonBlockingQueueHandler(queue.Queue(1))
+    handler.addFilter(ContextFilter())
+    record = logging.LogRecord("t", logging.INFO, __file__, 1, "value %s", ("x",), None)
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
+    queued = handler.queue.get_nowait()
+    # 参数在产生日志的线程中合并，原记录不受影响
+    assert (queued.msg, queued.args, record.args) == ("value x", None, ("x",))
+    assert json.loads(JsonFormatter().format(queued))['message'] == "value x"
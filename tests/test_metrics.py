@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from metrics import CONTENT_TYPE, Counter, Gauge, Histogram, Registry
+
+
+def render(registry):
+    return asyncio.run(registry.render()).decode()
+
+
+def test_counter_text_format():
+    registry = Registry()
+    sends = Counter('sends', 'Messages sent', ('channel', 'outcome'), registry=registry)
+    plain = Counter('restarts_total', 'Restarts', registry=registry)
+    sends.labels('@a', 'success').inc()
+    sends.labels('@a', 'success').inc(2)
+    sends.labels('@b', 'error').inc(0.5)
+    plain.inc()
+    assert render(registry) == (
+        '# HELP sends_total Messages sent\n'
+        '# TYPE sends_total counter\n'
+        'sends_total{channel="@a",outcome="success"} 3\n'
+        'sends_total{channel="@b",outcome="error"} 0.5\n'
+        '# HELP restarts_total Restarts\n'
+        '# TYPE restarts_total counter\n'
+        'restarts_total 1\n'
+    )
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = Counter('events', 'Events', ('name',), registry=registry)
+    histogram = Histogram('latency', 'Latency', ('name',), buckets=(1,), registry=registry)
+    value = 'a\\b "c"\nd'
+    counter.labels(value).inc()
+    histogram.labels(value).observe(0.5)
+    escaped = 'name="a\\\\b \\"c\\"\\nd"'
+    lines = render(registry).splitlines()
+    assert f'events_total{{{escaped}}} 1' in lines
+    assert f'latency_bucket{{{escaped},le="1.0"}} 1' in lines
+    assert f'latency_sum{{{escaped}}} 0.5' in lines
+    # 每个样本占一行
+    assert len(lines) == 2 + 1 + 2 + 4
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = Histogram('seconds', 'Duration', ('op',), buckets=(0.5, 0.1, 1), registry=registry)
+    for value in (0.05, 0.1, 0.3, 2.0):
+        histogram.labels('send').observe(value)
+    assert render(registry) == (
+        '# HELP seconds Duration\n'
+        '# TYPE seconds histogram\n'
+        'seconds_bucket{op="send",le="0.1"} 2\n'
+        'seconds_bucket{op="send",le="0.5"} 3\n'
+        'seconds_bucket{op="send",le="1.0"} 3\n'
+        'seconds_bucket{op="send",le="+Inf"} 4\n'
+        'seconds_sum{op="send"} 2.45\n'
+        'seconds_count{op="send"} 4\n'
+    )
+
+
+def test_histogram_time_decorator_and_unlabelled():
+    registry = Registry()
+    histogram = Histogram('handler_seconds', 'Handler duration', buckets=(10,), registry=registry)
+
+    @histogram.time()
+    async def handler():
+        return 'done'
+
+    assert asyncio.run(handler()) == 'done'
+    histogram.observe(20)
+    lines = render(registry).splitlines()
+    assert 'handler_seconds_bucket{le="10.0"} 1' in lines
+    assert 'handler_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'handler_seconds_count 2' in lines
+
+
+def test_wrong_label_count_raises():
+    counter = Counter('labelled', 'Labelled', ('a', 'b'), registry=Registry())
+    with pytest.raises(ValueError):
+        counter.labels('x')
+
+
+def test_gauge_callback_and_handle():
+    registry = Registry()
+
+    async def queue_sizes():
+        return {('publish',): 3, ('import',): 0}
+
+    Gauge('queue_size', 'Queued jobs', queue_sizes, ('queue',), registry=registry)
+    Gauge('uptime_seconds', 'Uptime', lambda: {(): 1.5}, registry=registry)
+    status, content_type, body = asyncio.run(registry.handle({}, b''))
+    assert (status, content_type) == (200, CONTENT_TYPE)
+    assert body.decode().splitlines()[2:4] == ['queue_size{queue="publish"} 3', 'queue_size{queue="import"} 0']
+    assert body.decode().endswith('uptime_seconds 1.5\n')
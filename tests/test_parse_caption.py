@@ -0,0 +1,53 @@
+from new_contribute import auto_fix_message, post_manager
+
+
+def test_strict_labels():
+    parsed = post_manager.strict_mode_parse(
+        "资源标题：A\n简介：B\n链接：https://pan.quark.cn/s/a\n📁 大小：1G\n🏷 标签：#x"
+    )
+    assert parsed['name'] == "A"
+    # "简介"只在自动修复时识别
+    assert parsed['description'] == ""
+    assert parsed['links'] == ["https://pan.quark.cn/s/a"]
+    assert parsed['size'] == "1G"
+    assert parsed['tags'] == "#x"
+
+
+def test_auto_fix_labels_and_link_order():
+    fixed = auto_fix_message(
+        "资源标题：A\n简介：B\nhttps://pan.quark.cn/s/bare\n夸克：https://pan.quark.cn/s/prefixed\n"
+        "链接：https://example.com/labeled"
+    )
+    assert fixed == (
+        "名称：未提供\n\n"
+        "描述：B\nhttps://pan.quark.cn/s/bare\n\n"
+        "链接：https://example.com/labeled\n"
+        "链接：https://pan.quark.cn/s/prefixed\n"
+        "链接：https://pan.quark.cn/s/bare\n\n"
+        "📁 大小：NG\n"
+        "🏷 标签：#网盘资源"
+    )
+
+
+def test_first_colon_wins_regardless_of_width():
+    parsed = post_manager.strict_mode_parse(
+        "名称: 复仇者联盟：终局\n描述: 漫威：第三阶段\n链接：https://pan.quark.cn/s/a"
+    )
+    assert parsed['name'] == "复仇者联盟：终局"
+    assert parsed['description'] == "漫威：第三阶段"
+
+
+def test_labels_in_the_middle_of_a_line():
+    parsed = post_manager.strict_mode_parse(
+        "名称：A\n描述：文件大小：3G 标签：#剧集\n链接：https://pan.quark.cn/s/a"
+    )
+    assert parsed['description'] == "文件大小：3G 标签：#剧集"
+    assert parsed['size'] == "3G 标签：#剧集"
+    assert parsed['tags'] == "#剧集"
+
+
+def test_empty_label_does_not_take_the_next_line():
+    # 原来的正则中 \s* 会跨过换行，把下一行当作名称；现在空名称按缺少名称处理
+    parsed = post_manager.strict_mode_parse("名称：\n描述：abc\n链接：https://pan.quark.cn/s/a")
+    assert parsed['name'] == ""
+    assert parsed['description'] == "abc"
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from new_contribute import _parse_history_cursor
+from post_history import PostHistory
+
+
+async def fill(history, user_id, count):
+    await history.add(user_id, [f"{user_id}-{i}" for i in range(count)])
+
+
+def summaries(page):
+    return [entry.summary for entry in page.entries]
+
+
+def test_pages_at_both_ends():
+    async def scenario():
+        history = PostHistory(":memory:")
+        await fill(history, 1, 5)
+
+        newest = await history.page(1, limit=2)
+        assert summaries(newest) == ['1-4', '1-3']
+        assert (newest.has_older, newest.has_newer) == (True, False)
+
+        middle = await history.page(1, before=newest.entries[-1].id, limit=2)
+        assert summaries(middle) == ['1-2', '1-1']
+        assert (middle.has_older, middle.has_newer) == (True, True)
+
+        oldest = await history.page(1, before=middle.entries[-1].id, limit=2)
+        assert summaries(oldest) == ['1-0']
+        assert (oldest.has_older, oldest.has_newer) == (False, True)
+
+        # 向更新翻页时仍按从新到旧排列
+        back = await history.page(1, after=oldest.entries[0].id, limit=2)
+        assert summaries(back) == ['1-2', '1-1']
+        assert (back.has_older, back.has_newer) == (True, True)
+        back = await history.page(1, after=back.entries[0].id, limit=2)
+        assert summaries(back) == ['1-4', '1-3']
+        assert (back.has_older, back.has_newer) == (True, False)
+
+        # 正好一页时两端都没有更多
+        exact = await history.page(1, limit=5)
+        assert len(exact.entries) == 5 and not exact.has_older and not exact.has_newer
+        await history.close()
+
+    asyncio.run(scenario())
+
+
+def test_empty_history_and_users_are_separate():
+    async def scenario():
+        history = PostHistory(":memory:")
+        assert await history.page(1) == ([], False, False)
+        await history.add(1, [])
+        await fill(history, 1, 3)
+        await fill(history, 2, 3)
+
+        page = await history.page(2, limit=2)
+        assert summaries(page) == ['2-2', '2-1']
+        page = await history.page(2, before=page.entries[-1].id, limit=2)
+        assert summaries(page) == ['2-0'] and not page.has_older
+        # 游标越过了另一个用户的记录
+        assert await history.page(3) == ([], False, False)
+        assert await history.page(1, before=1) == ([], False, False)
+        last = (await history.page(1)).entries[0].id
+        assert await history.page(1, after=last) == ([], False, False)
+        await history.close()
+
+    asyncio.run(scenario())
+
+
+def test_large_history_pages_use_index(tmp_path):
+    async def scenario():
+        history = PostHistory(str(tmp_path / "history.db"))
+        await fill(history, 1, 3000)
+        await fill(history, 2, 10)
+
+        seen = []
+        page = await history.page(1, limit=25)
+        while True:
+            assert len(page.entries) == 25
+            seen.extend(summaries(page))
+            if not page.has_older:
+                break
+            page = await history.page(1, before=page.entries[-1].id, limit=25)
+        assert seen == [f"1-{i}" for i in reversed(range(3000))]
+
+        # 每页按 (user_id, id) 索引定位，不扫描整个历史
+        conn = history._conn
+        for sql in ("SELECT id FROM post_history WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT 26",
+                    "SELECT id FROM post_history WHERE user_id = ? AND id > ? ORDER BY id ASC LIMIT 26"):
+            plan = ' '.join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", (1, 100)))
+            assert 'post_history_user' in plan and 'TEMP B-TREE' not in plan
+        await history.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('data, cursor', [
+    ('my_posts', (None, None)),
+    ('my_posts:older:12', (12, None)),
+    ('my_posts:newer:12', (None, 12)),
+    ('my_posts:older:', (None, None)),
+    ('my_posts:older:-1', (None, None)),
+    ('my_posts:older:1.5', (None, None)),
+    ('my_posts:older:²', (None, None)),
+    ('my_posts:sideways:12', (None, None)),
+    ('my_posts:older:12:3', (None, None)),
+    ('my_posts:newer', (None, None)),
+])
+def test_parse_history_cursor(data, cursor):
+    assert _parse_history_cursor(data) == cursor
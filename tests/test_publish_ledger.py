@@ -0,0 +1,122 @@
+import asyncio
+
+from publish_ledger import PublishLedger
+
+CHANNELS = [('@a', 'img', 'caption a'), ('@b', 'img', 'caption b')]
+
+
+def test_concurrent_claims_send_once(tmp_path):
+    path = str(tmp_path / "ledger.db")
+
+    async def scenario():
+        # 同一个台账和共用数据库文件的两个台账都只有一次领取拿到频道
+        for ledgers in ([PublishLedger(path)] * 2, [PublishLedger(path), PublishLedger(path)]):
+            post_id = str(id(ledgers))
+            first, second = await asyncio.gather(*(ledger.claim(post_id, CHANNELS) for ledger in ledgers))
+            assert sorted(len(result.entries) for result in (first, second)) == [0, 2]
+            loser = first if not first.entries else second
+            assert loser.in_progress == 2 and not loser.new
+            for ledger in set(ledgers):
+                await ledger.close()
+
+    asyncio.run(scenario())
+
+
+def test_sent_channels_are_skipped(tmp_path):
+    async def scenario():
+        ledger = PublishLedger(str(tmp_path / "ledger.db"))
+        result = await ledger.claim('p1', CHANNELS + [('@a', 'img', 'duplicate')])
+        assert result.new and [entry.channel_id for entry in result.entries] == ['@a', '@b']
+        await ledger.mark_sent('p1', '@a', 11)
+        await ledger.mark_failed('p1', '@b')
+
+        # 再次确认只重新领取失败的频道，内容为第一次领取时的内容
+        result = await ledger.claim('p1', [('@a', 'img', 'new'), ('@b', 'img', 'new')])
+        assert [(entry.channel_id, entry.caption) for entry in result.entries] == [('@b', 'caption b')]
+        assert result.sent == 1
+        assert await ledger.message_ids('p1') == {'@a': 11}
+        await ledger.close()
+
+    asyncio.run(scenario())
+
+
+def test_claim_stale_only_after_lease(tmp_path):
+    async def scenario():
+        ledger = PublishLedger(str(tmp_path / "ledger.db"), lease=0.1)
+        await ledger.claim('p1', CHANNELS)
+        await ledger.mark_sent('p1', '@a', 11)
+        assert await ledger.claim_stale() == []
+
+        await asyncio.sleep(0.15)
+        stale = await ledger.claim_stale()
+        assert [(entry.post_id, entry.channel_id, entry.caption) for entry in stale] == [('p1', '@b', 'caption b')]
+        # 领取后租约重新计算
+        assert await ledger.claim_stale() == []
+        await ledger.close()
+
+    asyncio.run(scenario())
+
+
+def test_claim_failed_only_takes_failed_rows(tmp_path):
+    async def scenario():
+        ledger = PublishLedger(str(tmp_path / "ledger.db"))
+        channels = CHANNELS + [('@c', 'img', 'caption c')]
+        await ledger.claim('p1', channels, notify_chat_id=1, notify_message_id=100)
+        await ledger.claim('p2', CHANNELS, notify_chat_id=1, notify_message_id=200)
+        await ledger.mark_sent('p1', '@a', 11)
+        await ledger.mark_failed('p1', '@b')
+        await ledger.mark_failed('p2', '@a')
+
+        result = await ledger.claim_failed(1, 100)
+        assert [(entry.post_id, entry.channel_id) for entry in result.entries] == [('p1', '@b')]
+        assert (result.sent, result.in_progress) == (1, 1)
+        # 已经重新领取，再次点击"重试"不会重复发送
+        assert (await ledger.claim_failed(1, 100)).entries == []
+        assert await ledger.claim_failed(1, 999) == ([], 0, 0, False)
+        await ledger.close()
+
+    asyncio.run(scenario())
+
+
+def test_mark_published_returns_post_once(tmp_path):
+    async def scenario():
+        ledger = PublishLedger(str(tmp_path / "ledger.db"))
+        await ledger.claim('p1', CHANNELS, user_id=42, summary='摘要', urls=['https://a', 'https://b'])
+        await ledger.claim('p2', CHANNELS)
+        published = await ledger.mark_published(['p1', 'p2', 'missing'])
+        assert [(post.post_id, post.user_id, post.summary, post.urls) for post in published] == [
+            ('p1', 42, '摘要', ['https://a', 'https://b']),
+            ('p2', None, None, []),
+        ]
+        assert await ledger.mark_published(['p1', 'p2']) == []
+        await ledger.close()
+
+    asyncio.run(scenario())
+
+
+def test_reopen_keeps_records_and_purges_old_sent(tmp_path):
+    path = str(tmp_path / "ledger.db")
+
+    async def scenario():
+        ledger = PublishLedger(path)
+        await ledger.claim('p1', CHANNELS, user_id=42, urls=['https://a'])
+        await ledger.claim('p2', CHANNELS[:1])
+        await ledger.mark_sent('p1', '@a', 11)
+        await ledger.mark_sent('p2', '@a', 21)
+        await ledger.close()
+
+        ledger = PublishLedger(path)
+        assert await ledger.known(['p1', 'p2', 'p3']) == {'p1', 'p2'}
+        assert await ledger.message_ids('p1') == {'@a': 11}
+        assert (await ledger.claim('p1', CHANNELS)).in_progress == 1
+        await ledger.close()
+
+        # 超过保留时间的已发送记录在打开时清理，全部清理的投稿一并删除
+        await asyncio.sleep(0.01)
+        ledger = PublishLedger(path, retention=0)
+        assert await ledger.known(['p1', 'p2']) == {'p1'}
+        assert await ledger.message_ids('p1') == {}
+        assert [post.post_id for post in await ledger.mark_published(['p1', 'p2'])] == ['p1']
+        await ledger.close()
+
+    asyncio.run(scenario())
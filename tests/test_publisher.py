@@ -0,0 +1,168 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter
+
+from bot_pool import BotPool
+from publish_ledger import PublishLedger
+from publisher import Publisher, PublishJob
+from rate_limiter import RateLimiter
+
+
+class FakeBot:
+    """
+    按顺序返回 outcomes 中的结果：异常实例直接抛出，其余视为发送成功；用完后一直成功
+    """
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def send_photo(self, chat_id, photo, caption):
+        self.calls.append((chat_id, time.monotonic()))
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        return SimpleNamespace(message_id=len(self.calls))
+
+
+async def finish(batch):
+    await asyncio.wait_for(batch.reported.wait(), 5)
+
+
+def test_retry_after_waits_requested_time():
+    async def scenario():
+        publisher = Publisher(base_delay=0.01, rate_limiter=RateLimiter(global_rate=100.0, chat_rate=100.0))
+        bot = FakeBot(RetryAfter(0.2))
+        job = PublishJob('@a', 'img', 'caption')
+        batch = publisher.submit(bot, [job])
+        await finish(batch)
+        (_, first), (_, second) = bot.calls
+        assert second - first >= 0.2
+        assert (batch.success_count, job.attempts, job.message_id) == (1, 2, 2)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_network_error_backoff_until_dead_letter():
+    async def scenario():
+        publisher = Publisher(max_attempts=3, base_delay=0.05)
+        bot = FakeBot(*[NetworkError("connection reset")] * 3)
+        job = PublishJob('@a', 'img', 'caption')
+        batch = publisher.submit(bot, [job])
+        await finish(batch)
+        times = [at for _, at in bot.calls]
+        # 第 n 次失败后至少等待 base_delay * 2 ** (n - 1) / 2
+        assert times[1] - times[0] >= 0.025 and times[2] - times[1] >= 0.05
+        assert list(publisher.dead_letters) == [job]
+        assert (batch.fail_count, job.attempts) == (1, 3)
+        assert isinstance(job.last_error, NetworkError)
+        await publisher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_backoff_delay_bounds():
+    publisher = Publisher(base_delay=1.0, max_delay=4.0)
+    for attempts, cap in ((1, 1.0), (2, 2.0), (3, 4.0), (6, 4.0)):
+        for _ in range(20):
+            assert cap / 2 <= publisher.backoff_delay(attempts) <= cap
+
+
+def test_bad_request_is_not_retried(tmp_path):
+    async def scenario():
+        ledger = PublishLedger(str(tmp_path / "ledger.db"))
+        publisher = Publisher(base_delay=0.01, ledger=ledger)
+        channels = [('@ok', 'img', 'caption'), ('@bad', 'img', 'caption')]
+        await ledger.claim('p1', channels)
+        bot = FakeBot(None, BadRequest("Chat not found"))
+        jobs = [PublishJob(channel_id, image, caption, post_id='p1') for channel_id, image, caption in channels]
+        batch = publisher.submit(bot, jobs)
+        await finish(batch)
+        assert len(bot.calls) == 2
+        assert list(publisher.dead_letters) == [jobs[1]]
+        assert (batch.success_count, batch.fail_count, jobs[1].attempts) == (1, 1, 1)
+        # 结果写入台账：成功的频道不再发送，失败的频道可以重新领取
+        assert await ledger.message_ids('p1') == {'@ok': jobs[0].message_id}
+        result = await ledger.claim('p1', channels)
+        assert [entry.channel_id for entry in result.entries] == ['@bad'] and result.sent == 1
+        await publisher.stop()
+        await ledger.close()
+
+    asyncio.run(scenario())
+
+
+def test_forbidden_and_revoked_bots_fail_over():
+    async def scenario():
+        bots = {}
+        pool = BotPool([f"{100 + i}:secret" for i in range(3)], make_bot=lambda token: bots[token.split(':')[0]],
+                       make_rate_limiter=RateLimiter)
+        first, second, third = pool.ranked('@a')
+        bots[first.name] = FakeBot(Forbidden("bot is not a member of the channel chat"))
+        bots[second.name] = FakeBot(InvalidToken())
+        bots[third.name] = FakeBot()
+        fallback = FakeBot()
+        publisher = Publisher(base_delay=0.01, bot_pool=pool)
+
+        job = PublishJob('@a', 'img', 'caption')
+        batch = publisher.submit(fallback, [job])
+        await finish(batch)
+        assert [len(bots[shard.name].calls) for shard in (first, second, third)] == [1, 1, 1]
+        # 换机器人重发不计入尝试次数
+        assert (batch.success_count, job.attempts) == (1, 1)
+        assert '@a' in first.forbidden and second.revoked
+        assert pool.select('@a') is third and fallback.calls == []
+
+        # 池中的机器人都不可用时由发起确认的机器人发送
+        pool.on_revoked(third)
+        batch = publisher.submit(fallback, [PublishJob('@a', 'img', 'caption')])
+        await finish(batch)
+        assert len(fallback.calls) == 1 and len(bots[third.name].calls) == 1
+        await publisher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_forbidden_without_pool_is_dead_letter():
+    async def scenario():
+        publisher = Publisher(base_delay=0.01)
+        job = PublishJob('@a', 'img', 'caption')
+        batch = publisher.submit(FakeBot(Forbidden("bot was kicked")), [job])
+        await finish(batch)
+        assert list(publisher.dead_letters) == [job] and job.attempts == 1
+        await publisher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_batch_events_fire_once():
+    async def scenario():
+        publisher = Publisher(max_attempts=2, base_delay=0.01)
+        reports = []
+
+        async def on_complete(batch):
+            assert batch.done.is_set() and not batch.reported.is_set()
+            reports.append((batch.success_count, batch.fail_count))
+            raise RuntimeError("report failed")
+
+        bot = FakeBot(RetryAfter(0.05), *[NetworkError("reset")] * 3)
+        jobs = [PublishJob(channel, 'img', 'caption') for channel in ('@a', '@b', '@c')]
+        batch = publisher.submit(bot, jobs, on_complete)
+        # 通知失败时 reported 仍然设置
+        await finish(batch)
+        await asyncio.sleep(0.1)
+        assert reports == [(2, 1)]
+
+        # 空批次立即结束
+        empty = publisher.submit(bot, [], on_complete)
+        await finish(empty)
+        assert empty.done.is_set() and reports == [(2, 1), (0, 0)]
+
+        without_report = publisher.submit(bot, [PublishJob('@a', 'img', 'caption')])
+        await asyncio.wait_for(without_report.done.wait(), 5)
+        assert without_report.reported.is_set()
+        await publisher.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+from rate_limiter import RateLimiter, TokenBucket
+
+
+def test_bucket_refill():
+    bucket = TokenBucket(rate=2.0, capacity=2, now=0.0)
+    bucket.take(0.0)
+    bucket.take(0.0)
+    assert bucket.wait_time(0.0) == 0.5
+    assert bucket.wait_time(0.25) == 0.25
+    assert bucket.wait_time(0.5) == 0.0
+    # 补充不超过容量
+    assert bucket.wait_time(100.0) == 0.0
+    assert bucket.tokens == 2
+
+
+def test_pause_halves_rate_down_to_floor():
+    bucket = TokenBucket(rate=8.0, capacity=1, now=0.0)
+    bucket.pause(5, now=0.0)
+    assert bucket.rate == 4.0
+    assert bucket.wait_time(1.0) == 4.0
+    # 暂停结束时令牌为空，按减半后的速率补充
+    assert bucket.wait_time(5.0) == 0.25
+
+    for _ in range(5):
+        bucket.pause(1, now=10.0)
+    assert bucket.rate == 1.0  # max_rate / 8
+
+
+def test_overlapping_pauses_keep_longest():
+    bucket = TokenBucket(rate=1.0, capacity=1, now=0.0)
+    bucket.pause(10, now=0.0)
+    bucket.pause(2, now=1.0)
+    assert bucket.paused_until == 10.0
+
+
+def test_recover_towards_max_rate():
+    bucket = TokenBucket(rate=10.0, capacity=1, now=0.0)
+    bucket.pause(1, now=0.0)
+    assert bucket.rate == 5.0
+    bucket.recover(0.2)
+    assert bucket.rate == 7.0
+    bucket.recover(0.2)
+    bucket.recover(0.2)
+    assert bucket.rate == 10.0
+
+
+def test_limiter_reserve_global_and_per_chat():
+    limiter = RateLimiter(global_rate=2.0, chat_rate=1.0, chat_burst=1)
+    limiter._global.updated = 0.0
+    assert limiter.reserve('@a', now=0.0) == 0.0
+    # 同一频道没有令牌，等待且不消耗全局令牌
+    assert limiter.reserve('@a', now=0.0) == 1.0
+    assert limiter.reserve('@b', now=0.0) == 0.0
+    # 全局令牌用完
+    assert limiter.reserve('@c', now=0.0) == 0.5
+    assert limiter.reserve('@c', now=0.5) == 0.0
+
+
+def test_limiter_retry_after():
+    limiter = RateLimiter(global_rate=100.0, chat_rate=4.0, chat_burst=1)
+    limiter.on_retry_after('@a', 3, now=0.0)
+    assert limiter.paused('@a', now=1.0)
+    assert not limiter.paused('@b', now=1.0)
+    assert limiter.reserve('@a', now=1.0) == 2.0
+    assert limiter.chat_rate_of('@a') == 2.0
+    assert not limiter.paused('@a', now=3.0)
+
+    limiter.on_success('@a')
+    assert limiter.chat_rate_of('@a') == 2.4
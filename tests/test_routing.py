@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from routing import RoutingTable, load_routing
+
+
+def test_routes_follow_provider_order_and_ignore_unknown():
+    table = RoutingTable(['@all'], 'S', {'quark': '@q', 'baidu': '@b', 'uc': '@u'}, 'P', {'uc': 'U'})
+    assert table.channels_for(['uc', 'quark', 'other']) == ('@all', '@q', '@u')
+    assert [route.footer for route in table.routes_for({'uc', 'baidu'})] == ['S', 'P', 'U']
+    assert table.channels_for([]) == ('@all',)
+    assert table.channels_for_provider('baidu') == ('@all', '@b')
+    assert table.channels_for_provider('other') == ('@all',)
+
+
+def test_many_providers():
+    # 组合在用到时才计算，网盘类型很多时也不会预先生成 2^N 项
+    table = RoutingTable([], '', {f'p{i}': f'@c{i}' for i in range(64)}, '')
+    assert table.channels_for({'p60', 'p3'}) == ('@c3', '@c60')
+    assert table.channels_for(frozenset({'p3', 'p60'})) is table.channels_for(['p60', 'p3'])
+
+
+DEFAULTS = {
+    'summary_channels': ['@all'],
+    'summary_footer': 'S',
+    'provider_channels': {'quark': '@q'},
+    'provider_footer': 'P',
+    'provider_footers': {},
+}
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / "routing.json"
+    path.write_text(json.dumps(config), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('config', [
+    {'provider_footers': ['x']},
+    {'provider_footers': {'quark': 5}},
+    {'summary_footer': None},
+    {'provider_footer': 5},
+    {'summary_channels': '@all'},
+    {'provider_channels': {'quark': ['@q']}},
+    {'unknown': 1},
+    ['@all'],
+])
+def test_invalid_config_raises_value_error(tmp_path, config):
+    with pytest.raises(ValueError):
+        load_routing(write_config(tmp_path, config), DEFAULTS)
+
+
+def test_invalid_json_raises_value_error(tmp_path):
+    path = tmp_path / "routing.json"
+    path.write_text("{", encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_routing(str(path), DEFAULTS)
+
+
+def test_valid_config_overrides_defaults(tmp_path):
+    table = load_routing(write_config(tmp_path, {'provider_footers': {'quark': 'Q'}, 'summary_footer': ''}), DEFAULTS)
+    assert [route.footer for route in table.routes_for({'quark'})] == ['', 'Q']
+    assert load_routing(None, DEFAULTS).channels_for({'quark'}) == ('@all', '@q')
+
+
+def test_reload_keeps_previous_table_on_error(tmp_path, monkeypatch):
+    import new_contribute
+
+    previous = new_contribute.routing
+    monkeypatch.setattr(new_contribute, 'ROUTING_FILE', write_config(tmp_path, {'provider_footers': ['x']}))
+    with pytest.raises(ValueError):
+        new_contribute.reload_routing()
+    new_contribute._reload_routing_on_signal()
+    assert new_contribute.routing is previous
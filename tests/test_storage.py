@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+
+from storage import SqliteBackend, open_stores
+
+
+def stored_keys(path, namespace):
+    with sqlite3.connect(path) as conn:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'kv'").fetchone() is None:
+            return set()
+        return {key for (key,) in conn.execute("SELECT key FROM kv WHERE namespace = ?", (namespace,))}
+
+
+def test_lru_eviction_reloads_from_database(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def scenario():
+        backend = SqliteBackend(path, flush_interval=60)
+        store = backend.namespace('posts', cache_size=2)
+        await store.set(1, {'n': 1})
+        await store.set(2, {'n': 2})
+        await store.get(1)
+        await store.set(3, {'n': 3})
+        # 最久未使用的 2 被淘汰
+        assert list(store._cache) == ['1', '3']
+
+        await backend.flush()
+        assert await store.get(2) == {'n': 2}
+        assert list(store._cache) == ['3', '2']
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_writes_are_batched(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def scenario():
+        backend = SqliteBackend(path, flush_interval=60, batch_size=3)
+        store = backend.namespace('posts', cache_size=1)
+        await store.set('a', 1)
+        await store.set('b', 2)
+        await asyncio.sleep(0.05)
+        # 没到 batch_size 也没到 flush_interval，还在待写队列中
+        assert stored_keys(path, 'posts') == set()
+        # 缓存已淘汰，读取时使用待写队列中的值
+        assert await store.get('a') == 1
+
+        await store.set('c', 3)
+        await asyncio.sleep(0.05)
+        assert stored_keys(path, 'posts') == {'a', 'b', 'c'}
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_flush_interval(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def scenario():
+        backend = SqliteBackend(path, flush_interval=0.05, batch_size=100)
+        store = backend.namespace('posts')
+        await store.set('a', 1)
+        await asyncio.sleep(0.2)
+        assert stored_keys(path, 'posts') == {'a'}
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_count_flushes_pending_writes(tmp_path):
+    path = str(tmp_path / "state.db")
+
+    async def scenario():
+        backend = SqliteBackend(path, flush_interval=60)
+        posts = backend.namespace('posts')
+        states = backend.namespace('states')
+        await posts.set('a', 1)
+        await posts.set('b', 2)
+        await states.set('a', 'x')
+        await posts.delete('a')
+        assert await posts.count() == 1
+        assert await states.count() == 1
+        assert stored_keys(path, 'posts') == {'b'}
+        await backend.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_persists_and_codec_round_trip(tmp_path):
+    path = str(tmp_path / "state.db")
+    codecs = {'posts': (lambda value: sorted(value), set)}
+
+    async def scenario():
+        backend, stores = open_stores('sqlite', path, ['posts'], codecs)
+        await stores['posts'].set(1, {'x', 'y'})
+        await backend.close()
+
+        backend, stores = open_stores('sqlite', path, ['posts'], codecs)
+        assert await stores['posts'].get(1) == {'x', 'y'}
+        assert await stores['posts'].get(2, 'missing') == 'missing'
+        await backend.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from dispatcher import PerUserUpdateProcessor
+from webhook import InlineReplyRequest, WebhookProcessor
+
+UPDATE = json.dumps({
+    "update_id": 1,
+    "callback_query": {
+        "id": "42",
+        "chat_instance": "1",
+        "data": "confirm",
+        "from": {"id": 7, "is_bot": False, "first_name": "u"},
+    },
+}).encode()
+
+
+class FakeApplication:
+    """
+    处理 update 时先应答回调，再等待 delay 秒（模拟等待频道发布）
+    """
+
+    def __init__(self, delay):
+        self.bot = Bot("1:secret", request=InlineReplyRequest())
+        self.update_processor = PerUserUpdateProcessor(8)
+        self.delay = delay
+        self.finished = False
+
+    async def process_update(self, update):
+        await self.bot.answer_callback_query(update.callback_query.id, text="处理中")
+        await asyncio.sleep(self.delay)
+        await self.bot.answer_callback_query(update.callback_query.id)
+        self.finished = True
+
+
+def run_webhook(monkeypatch, delay):
+    sent = []
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        sent.append((url.rsplit('/', 1)[-1], asyncio.get_running_loop().time()))
+        return 200, b'{"ok":true,"result":true}'
+
+    monkeypatch.setattr(HTTPXRequest, 'do_request', do_request)
+
+    async def scenario():
+        application = FakeApplication(delay)
+
+        async def get_application():
+            return application
+
+        processor = WebhookProcessor(get_application, inline_reply=True, inline_deadline=0.1)
+        start = asyncio.get_running_loop().time()
+        status, _, body = await processor.handle({}, UPDATE)
+        assert status == 200 and application.finished
+        return body, [(method, at - start) for method, at in sent]
+
+    return asyncio.run(scenario())
+
+
+def test_fast_handler_replies_inline(monkeypatch):
+    body, sent = run_webhook(monkeypatch, 0.0)
+    assert json.loads(body) == {'callback_query_id': '42', 'text': '处理中', 'method': 'answerCallbackQuery'}
+    # 槽位只截获第一个调用
+    assert [method for method, _ in sent] == ['answerCallbackQuery']
+
+
+def test_slow_handler_sends_reply_at_deadline(monkeypatch):
+    body, sent = run_webhook(monkeypatch, 0.5)
+    assert body == b''
+    # 截获的回复在期限到时单独发送，不等处理结束
+    (first, at), (second, _) = sent
+    assert first == second == 'answerCallbackQuery'
+    assert 0.1 <= at < 0.4
@@ -0,0 +1,166 @@
+"""
+Webhook 模式
+
+Telegram 通过 HTTP POST 推送 update，WebhookProcessor 校验 secret token 后交给 Application 处理。
+
+开启 inline_reply 时，处理过程中第一个返回值只是 True 的 Bot API 调用（如 answerCallbackQuery）
+不再单独发请求，而是直接作为这次 webhook 的 HTTP 响应返回给 Telegram，省掉一次往返。
+HTTP 响应要等处理函数返回才发出，处理超过 inline_deadline 秒（如等待频道发布）时
+已截获的调用立即单独发送，之后的调用也照常请求，用户不会一直看到按钮在加载。
+提供 bot_info 时 getMe 在本地应答，冷启动初始化 Bot 时不需要访问 Telegram。
+
+Application 使用 PerUserUpdateProcessor 时，同一用户的 webhook 请求按到达顺序处理，
+每个请求等自己的 update 处理完再返回。两种处理器都受 Application 的并发上限（CONCURRENT_UPDATES）限制。
+"""
+import asyncio
+import contextvars
+import functools
+import hmac
+import json
+import logging
+
+from telegram import Update
+from telegram.request import HTTPXRequest
+
+from dispatcher import PerUserUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'x-telegram-bot-api-secret-token'
+
+# 可以直接放在 webhook 响应里的方法：返回值固定为 True，处理函数不依赖其结果
+INLINE_REPLY_METHODS = frozenset(('answerCallbackQuery', 'sendChatAction', 'deleteMessage'))
+
+# 当前 update 的内联回复槽位，为 None 时表示不收集
+_inline_reply = contextvars.ContextVar('inline_reply', default=None)
+
+_OK_TRUE = b'{"ok":true,"result":true}'
+
+
+class _InlineReply:
+    """
+    一次 webhook 请求的内联回复槽位，最多截获一个调用
+    payload: 截获的调用（参数加上 method），作为 HTTP 响应返回
+    closed: 不再截获，处理超过期限后设置
+    """
+    __slots__ = ('payload', 'closed', '_forward')
+
+    def __init__(self):
+        self.payload = None
+        self.closed = False
+        self._forward = None
+
+    def capture(self, method, parameters, forward):
+        """
+        截获一个调用，forward 为单独发送该调用的协程函数；槽位已占用或已关闭时返回 False
+        """
+        if self.closed or self.payload is not None:
+            return False
+        self.payload = {**parameters, 'method': method}
+        self._forward = forward
+        return True
+
+    async def close(self):
+        """
+        关闭槽位，已截获的调用改为单独发送，不再放在 HTTP 响应中
+        """
+        self.closed = True
+        if self._forward is None:
+            return
+        forward, self._forward = self._forward, None
+        method, self.payload = self.payload['method'], None
+        try:
+            code, payload = await forward()
+            if code != 200:
+                logger.error(f"Deferred {method} failed with HTTP {code}: {payload[:200]!r}")
+        except Exception as e:
+            logger.error(f"Error while sending deferred {method}: {e}")
+
+
+class InlineReplyRequest(HTTPXRequest):
+    """
+    在内联回复槽位为空时截获第一个可内联的 Bot API 调用
+    bot_info: getMe 的结果（{"id", "is_bot", "first_name", "username"}），为空时照常请求
+    """
+
+    def __init__(self, *args, bot_info=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._get_me_reply = json.dumps({'ok': True, 'result': bot_info}).encode() if bot_info else None
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        if self._get_me_reply is not None and url.endswith('/getMe'):
+            return 200, self._get_me_reply
+        slot = _inline_reply.get()
+        if slot is not None and request_data is not None and not request_data.contains_files:
+            api_method = url.rsplit('/', 1)[-1]
+            forward = functools.partial(super().do_request, url, method, request_data, **kwargs)
+            if api_method in INLINE_REPLY_METHODS and slot.capture(api_method, request_data.parameters, forward):
+                return 200, _OK_TRUE
+        return await super().do_request(url, method, request_data, **kwargs)
+
+
+class WebhookProcessor:
+    """
+    处理一次 webhook 请求
+    get_application: 返回已初始化 Application 的协程函数，多次调用应返回同一个实例
+    secret_token: 与 setWebhook 时设置的 secret_token 一致，为空时不校验
+    inline_reply: 是否把简单回复直接放在 HTTP 响应中
+    inline_deadline: 处理超过该秒数时不再等处理结束，截获的回复立即单独发送
+    """
+
+    def __init__(self, get_application, secret_token=None, inline_reply=False, inline_deadline=0.5):
+        self.get_application = get_application
+        self.secret_token = secret_token
+        self.inline_reply = inline_reply
+        self.inline_deadline = inline_deadline
+
+    async def handle(self, headers, body):
+        if self.secret_token:
+            received = headers.get(SECRET_TOKEN_HEADER, '')
+            if not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+                return 403, 'text/plain; charset=utf-8', b'Forbidden'
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return 400, 'text/plain; charset=utf-8', b'Bad Request'
+
+        application = await self.get_application()
+        update = Update.de_json(data, application.bot)
+        if update is None:
+            return 400, 'text/plain; charset=utf-8', b'Bad Request'
+
+        if not self.inline_reply:
+            await self._dispatch(application, update, None)
+            return 200, 'application/json', b''
+
+        slot = _InlineReply()
+        task = asyncio.ensure_future(self._dispatch(application, update, slot))
+        try:
+            done, _ = await asyncio.wait((task,), timeout=self.inline_deadline)
+            if not done:
+                await slot.close()
+            await task
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        if slot.payload is None:
+            return 200, 'application/json', b''
+        return 200, 'application/json', json.dumps(slot.payload, ensure_ascii=False).encode()
+
+    @classmethod
+    async def _dispatch(cls, application, update, slot):
+        processor = application.update_processor
+        if isinstance(processor, PerUserUpdateProcessor):
+            await processor.process_update_and_wait(update, cls._process(application, update, slot))
+        else:
+            await processor.process_update(update, cls._process(application, update, slot))
+
+    @staticmethod
+    async def _process(application, update, slot):
+        # 在协程内部设置槽位，排队后由其他请求的任务执行时也能写入自己的槽位
+        token = _inline_reply.set(slot)
+        try:
+            await application.process_update(update)
+        finally:
+            _inline_reply.reset(token)
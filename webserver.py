@@ -0,0 +1,142 @@
+"""
+轻量 HTTP 服务
+
+路由表为 {(方法, 路径): 处理函数}，处理函数签名为
+    async def handler(headers, body) -> (状态码, Content-Type, 响应内容 bytes)
+headers 的键为小写。同一个路由表既可以在机器人的事件循环里直接监听端口（start_http_server），
+也可以包装成 ASGI 应用交给 Vercel 等平台（make_asgi_app）。
+"""
+import asyncio
+import logging
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 请求体上限，Telegram 的单个 update 远小于此
+MAX_BODY_SIZE = 1024 * 1024
+# 读取请求的超时时间（秒）
+READ_TIMEOUT = 10
+
+
+async def dispatch(routes, method, path, headers, body):
+    """
+    按路由表分发请求
+    """
+    handler = routes.get((method, path))
+    if handler is None:
+        if any(route_path == path for _, route_path in routes):
+            return 405, 'text/plain; charset=utf-8', b'Method Not Allowed'
+        return 404, 'text/plain; charset=utf-8', b'Not Found'
+    try:
+        return await handler(headers, body)
+    except Exception as e:
+        logger.error(f"Error while handling {method} {path}: {e}")
+        return 500, 'text/plain; charset=utf-8', b'Internal Server Error'
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_SIZE:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), urlsplit(target).path, headers, body
+
+
+async def start_http_server(routes, host, port):
+    """
+    在当前事件循环中监听端口，返回 asyncio.Server
+    """
+    async def _handle(reader, writer):
+        try:
+            try:
+                method, path, headers, body = await asyncio.wait_for(_read_request(reader), READ_TIMEOUT)
+            except OverflowError:
+                status, content_type, payload = 413, 'text/plain; charset=utf-8', b'Payload Too Large'
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                status, content_type, payload = 400, 'text/plain; charset=utf-8', b'Bad Request'
+            else:
+                status, content_type, payload = await dispatch(routes, method, path, headers, body)
+
+            reason = HTTPStatus(status).phrase
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode('latin-1') + payload
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(_handle, host, port)
+
+
+def make_asgi_app(routes, on_startup=None, on_shutdown=None):
+    """
+    把路由表包装成 ASGI 应用
+    on_startup: 收到 lifespan 启动事件时调用的协程函数，抛出异常时回复 lifespan.startup.failed
+    on_shutdown: 收到 lifespan 关闭事件时调用的协程函数
+    """
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    try:
+                        if on_startup is not None:
+                            await on_startup()
+                    except Exception as e:
+                        logger.exception(f"Error during startup: {e}")
+                        await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                        return
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    if on_shutdown is not None:
+                        await on_shutdown()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_SIZE:
+                status, content_type, payload = 413, 'text/plain; charset=utf-8', b'Payload Too Large'
+                break
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        else:
+            headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+            status, content_type, payload = await dispatch(
+                routes, scope['method'].upper(), scope['path'], headers, b''.join(chunks)
+            )
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', content_type.encode('latin-1')),
+                (b'content-length', str(len(payload)).encode('latin-1')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': payload})
+
+    return app